@@ -31,8 +31,8 @@ def create_file(filename: str, content: str, tool_context: ToolContext) -> Dict[
   Returns:
     str: The search result displayed in a webpage.
   """
-  # Store filename in the persistent state
-  tool_context.state[f"{tool_context.state.APP_PREFIX}current_filename"] = filename
+  # Store filename in the session state; an app-scoped key would be shared by every session
+  tool_context.state["current_filename"] = filename
   os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
   with open(filename, "w") as f:
       f.write(content)
@@ -64,7 +64,7 @@ def read_file(tool_context: ToolContext) -> Dict[str, Any]:
     str: The content of the file.
   """
 
-  filename = tool_context.state.get(f"{tool_context.state.APP_PREFIX}current_filename")
+  filename = tool_context.state.get("current_filename")
   if filename is None:
     return {
         "status": "error",
@@ -104,7 +104,7 @@ def edit_file(start_line: int, end_line: int, content: str, tool_context: ToolCo
   Returns:
     str: The content of the file.
   """
-  filename = tool_context.state.get(f"{tool_context.state.APP_PREFIX}current_filename")
+  filename = tool_context.state.get("current_filename")
   if filename is None:
     return {
       "status": "error",
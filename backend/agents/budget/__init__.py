@@ -0,0 +1,7 @@
+"""
+Token, render-time and wall-clock budgets shared by every agent.
+
+The ADK model callbacks live in budget.callbacks so this package can be used
+without google-adk installed.
+"""
+from .governor import Budget, BudgetLimits, bind_budget, get_budget, current_budget, use_budget
@@ -0,0 +1,57 @@
+"""
+ADK model callbacks that report every model call into the session's budget.
+
+Pass them as an LlmAgent's before_model_callback and after_model_callback.
+Once the budget is exhausted the model is no longer called: the agent gets a
+final text response instead, so it stops and the run ends with the best
+result so far.
+
+A call is counted when it starts, so a call that raises is counted too; its
+tokens and latency are added when its response arrives. The model and start
+time of the call in flight are kept in the session state under a "temp:" key,
+which lives only as long as the invocation and is never persisted.
+"""
+import time
+from typing import Optional
+
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from .governor import get_budget
+
+# Per agent, as agents of a parallel run share the session state
+_CALL_KEY = "temp:budget_model_call:{agent}"
+
+
+def budget_before_model(callback_context, llm_request: LlmRequest) -> Optional[LlmResponse]:
+    """Skip the model call once the budget is exhausted; otherwise count it and start timing it."""
+    budget = get_budget(callback_context.state)
+    reason = budget.exhausted_reason()
+    if reason:
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(
+            text=f"Stopping: the job's budget is exhausted ({reason}). The latest result is final.")]))
+    budget.record_llm(llm_request.model)
+    callback_context.state[_CALL_KEY.format(agent=callback_context.agent_name)] = {
+        "model": llm_request.model, "started": time.monotonic()}
+    return None
+
+
+def budget_after_model(callback_context, llm_response: LlmResponse) -> Optional[LlmResponse]:
+    """Account the call's tokens and latency. Streamed chunks are counted once, on the final response."""
+    if llm_response.partial:
+        return None
+    budget = get_budget(callback_context.state)
+    key = _CALL_KEY.format(agent=callback_context.agent_name)
+    call = callback_context.state.get(key) or {}
+    callback_context.state[key] = None
+    usage = llm_response.usage_metadata
+    budget.record_llm(
+        call.get("model"),
+        prompt_tokens=(usage.prompt_token_count or 0) if usage else 0,
+        completion_tokens=((usage.candidates_token_count or 0) +
+                           (getattr(usage, "thoughts_token_count", None) or 0)) if usage else 0,
+        latency_seconds=time.monotonic() - call["started"] if call else 0.0,
+        # A response without a recorded start, e.g. when only this callback is installed, is counted here
+        calls=0 if call else 1,
+    )
+    return None
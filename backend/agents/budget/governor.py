@@ -0,0 +1,242 @@
+"""
+Token, render-time and wall-clock budgets for agent runs.
+
+Every agent reports into the Budget of the job it works for: LLM calls with
+their token counts and latency per model, and render seconds. The budget
+enforces the configured caps with graceful degradation instead of failing
+the job:
+
+- Past BUDGET_DEGRADE_AT of any cap, renders drop to low quality.
+- Once a cap is reached, the budget is exhausted: no more model calls or
+  retries are started, and the agents return their best attempt so far.
+
+A budget is found the same way as a workspace, through an id kept in the
+session state (ADK state or a PocketFlow `shared` dict), or through the
+active budget context variable for code that is not handed the state, like
+the PocketFlow LLM client. Worker threads should run their work with
+contextvars.copy_context().run to keep the active budget.
+
+Configuration (unset or 0 means no cap):
+    BUDGET_MAX_TOKENS: Prompt plus completion tokens across all models
+    BUDGET_MAX_LLM_CALLS: Model calls
+    BUDGET_MAX_RENDER_SECONDS: Seconds spent rendering (CPU seconds where the sandbox measures them)
+    BUDGET_MAX_WALL_SECONDS: Elapsed time since the job started
+    BUDGET_DEGRADE_AT: Fraction of a cap at which renders are degraded (default: 0.8)
+    BUDGET_MAX_ACTIVE: Budgets kept before idle ones are dropped (default: 256)
+    BUDGET_IDLE_SECONDS: Seconds without use after which a budget counts as idle (default: 3600)
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Session state key holding the budget id
+STATE_KEY = "budget_id"
+DEFAULT_MAX_ACTIVE = 256
+DEFAULT_IDLE_SECONDS = 3600
+# Render qualities from best to cheapest, as accepted by the render tools
+QUALITIES = ("high", "medium", "low")
+
+
+def _env_number(name: str, cast=float):
+    value = cast(os.getenv(name, "0") or 0)
+    return value if value > 0 else None
+
+
+@dataclass
+class BudgetLimits:
+    """Caps for one job. None means no cap."""
+    max_tokens: Optional[int] = None
+    max_llm_calls: Optional[int] = None
+    max_render_seconds: Optional[float] = None
+    max_wall_seconds: Optional[float] = None
+    degrade_at: float = 0.8
+
+    @classmethod
+    def from_env(cls) -> "BudgetLimits":
+        return cls(
+            max_tokens=_env_number("BUDGET_MAX_TOKENS", int),
+            max_llm_calls=_env_number("BUDGET_MAX_LLM_CALLS", int),
+            max_render_seconds=_env_number("BUDGET_MAX_RENDER_SECONDS"),
+            max_wall_seconds=_env_number("BUDGET_MAX_WALL_SECONDS"),
+            degrade_at=float(os.getenv("BUDGET_DEGRADE_AT", "0.8")),
+        )
+
+
+class Budget:
+    """Usage and caps of one job, shared by every agent working on it."""
+
+    def __init__(self, limits: Optional[BudgetLimits] = None, job_id: Optional[str] = None):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.limits = limits or BudgetLimits.from_env()
+        self.started = time.monotonic()
+        self.last_used = self.started
+        # Per model: calls, prompt_tokens, completion_tokens, latency_seconds
+        self.models: Dict[str, Dict[str, float]] = {}
+        self.render_seconds = 0.0
+        self.renders = 0
+        self._exhausted_logged = False
+        self._lock = threading.Lock()
+
+    def record_llm(self, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+                   latency_seconds: float = 0.0, calls: int = 1) -> None:
+        """Account one model call, or with calls=0 the usage of a call counted when it started."""
+        with self._lock:
+            usage = self.models.setdefault(model or "unknown", {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency_seconds": 0.0})
+            usage["calls"] += calls
+            usage["prompt_tokens"] += prompt_tokens or 0
+            usage["completion_tokens"] += completion_tokens or 0
+            usage["latency_seconds"] += latency_seconds or 0.0
+            self.last_used = time.monotonic()
+
+    def record_render(self, seconds: float) -> None:
+        """Account one render."""
+        with self._lock:
+            self.render_seconds += seconds or 0.0
+            self.renders += 1
+            self.last_used = time.monotonic()
+
+    @property
+    def tokens(self) -> int:
+        with self._lock:
+            return int(sum(usage["prompt_tokens"] + usage["completion_tokens"] for usage in self.models.values()))
+
+    @property
+    def llm_calls(self) -> int:
+        with self._lock:
+            return int(sum(usage["calls"] for usage in self.models.values()))
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.monotonic() - self.started
+
+    def usage_fractions(self) -> Dict[str, float]:
+        """Used fraction of every configured cap."""
+        used = {
+            "tokens": (self.tokens, self.limits.max_tokens),
+            "llm_calls": (self.llm_calls, self.limits.max_llm_calls),
+            "render_seconds": (self.render_seconds, self.limits.max_render_seconds),
+            "wall_seconds": (self.elapsed_seconds, self.limits.max_wall_seconds),
+        }
+        return {name: value / limit for name, (value, limit) in used.items() if limit}
+
+    def exhausted_reason(self) -> Optional[str]:
+        """Which cap was reached, or None while there is budget left."""
+        for name, fraction in self.usage_fractions().items():
+            if fraction >= 1:
+                if not self._exhausted_logged:
+                    self._exhausted_logged = True
+                    logger.warning(f"Budget {self.job_id} exhausted: {name} cap reached")
+                return f"{name} cap reached"
+        return None
+
+    @property
+    def exhausted(self) -> bool:
+        return self.exhausted_reason() is not None
+
+    @property
+    def degraded(self) -> bool:
+        """Whether any cap is close enough to degrade renders."""
+        return any(fraction >= self.limits.degrade_at for fraction in self.usage_fractions().values())
+
+    def render_quality(self, requested: str = "medium") -> str:
+        """The quality to render at: the requested one, or low once the budget runs short."""
+        if self.degraded and requested in QUALITIES:
+            return QUALITIES[-1]
+        return requested
+
+    def allow_retry(self) -> bool:
+        """Whether another fix-and-render attempt may start."""
+        return not self.exhausted
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {model: dict(usage) for model, usage in self.models.items()}
+        return {
+            "job_id": self.job_id,
+            "tokens": self.tokens,
+            "llm_calls": self.llm_calls,
+            "models": models,
+            "render_seconds": round(self.render_seconds, 3),
+            "renders": self.renders,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "usage": {name: round(fraction, 3) for name, fraction in self.usage_fractions().items()},
+            "degraded": self.degraded,
+            "exhausted": self.exhausted_reason(),
+        }
+
+
+_budgets: "OrderedDict[str, Budget]" = OrderedDict()
+_registry_lock = threading.Lock()
+_current_budget = contextvars.ContextVar("agent_budget", default=None)
+
+
+def _evict_idle() -> None:
+    """Drop idle budgets, least recently used first, while there are more than the cap.
+
+    Budgets still in use are never dropped, even above the cap: the job would
+    start counting from zero again and its caps would stop working. Call with
+    _registry_lock held.
+    """
+    max_active = int(os.getenv("BUDGET_MAX_ACTIVE", DEFAULT_MAX_ACTIVE))
+    idle_seconds = float(os.getenv("BUDGET_IDLE_SECONDS", DEFAULT_IDLE_SECONDS))
+    now = time.monotonic()
+    while len(_budgets) > max_active:
+        evicted_id, budget = next(iter(_budgets.items()))
+        if now - budget.last_used < idle_seconds:
+            # The registry is in recency order, so every other budget is in use too
+            logger.warning(f"{len(_budgets)} budgets are in use, more than BUDGET_MAX_ACTIVE={max_active}")
+            return
+        del _budgets[evicted_id]
+        logger.info(f"Dropped idle budget {evicted_id}")
+
+
+def bind_budget(state, budget: Budget) -> Budget:
+    """Make a session report into an existing budget, e.g. a sub-agent run for a larger job."""
+    with _registry_lock:
+        budget.last_used = time.monotonic()
+        _budgets[budget.job_id] = budget
+        _budgets.move_to_end(budget.job_id)
+        _evict_idle()
+    state[STATE_KEY] = budget.job_id
+    return budget
+
+
+def get_budget(state) -> Budget:
+    """The budget bound to a session state, created with the configured caps on first use."""
+    budget_id = state.get(STATE_KEY)
+    if budget_id:
+        with _registry_lock:
+            budget = _budgets.get(budget_id)
+            if budget is not None:
+                budget.last_used = time.monotonic()
+                _budgets.move_to_end(budget_id)
+                return budget
+        # Unknown id (e.g. a resumed checkpoint, or a budget dropped after going idle)
+        logger.warning(f"Budget {budget_id} is not registered; starting a new budget under its id, "
+                       f"earlier usage is not counted")
+    return bind_budget(state, Budget(job_id=budget_id or None))
+
+
+def current_budget() -> Optional[Budget]:
+    """The active budget of this context, if any."""
+    return _current_budget.get()
+
+
+@contextmanager
+def use_budget(budget: Budget):
+    """Make budget the active budget for the enclosed block."""
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
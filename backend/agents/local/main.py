@@ -1,7 +1,9 @@
 import os
 import json
+import uuid
 import asyncio
-from typing import Optional, Dict, Any, List
+from collections import deque
+from typing import Optional, Dict, Any, List, AsyncIterator, Iterable, Union, Tuple
 from pathlib import Path
 
 # Load environment variables from .env file if it exists
@@ -16,7 +18,57 @@ from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types
 
+from budget import Budget, bind_budget, get_budget
+from workspace import release_workspace
 from ..agent import root_agent
+from ..monitoring import TOOL_WORKERS
+
+APP_NAME = "manim-video-generator"
+USER_ID = "manim-user"
+# Jobs generate_batch runs at once. Their renders run off the event loop on the shared tool
+# pool, so more jobs than its workers would only queue renders behind each other
+BATCH_CONCURRENCY = int(os.getenv("MANIM_BATCH_CONCURRENCY", str(TOOL_WORKERS)))
+
+# Events kept by generate_video; older ones are only in the transcript, if one is written
+EVENT_TAIL_SIZE = int(os.getenv("MANIM_EVENT_TAIL_SIZE", "20"))
+# Longest text, tool argument or tool output kept in an event summary
+SUMMARY_TEXT_CHARS = 500
+
+def _truncate(value: Any, limit: int = SUMMARY_TEXT_CHARS) -> Any:
+    """Shorten long strings (e.g. file contents, Manim stdout) for an event summary."""
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}... [{len(value) - limit} more characters]"
+    if isinstance(value, dict):
+        return {key: _truncate(item, limit) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_truncate(item, limit) for item in value]
+    return value
+
+def summarize_event(event) -> Dict[str, Any]:
+    """A small summary of an ADK event: who produced it, its text and its tool calls.
+    
+    Tool arguments and results are truncated, so a summary stays small even when the
+    event carries a whole file or a render's output.
+    """
+    text = "".join(part.text or "" for part in (event.content.parts if event.content and event.content.parts else [])
+                   if not getattr(part, "thought", False))
+    summary = {
+        "author": event.author,
+        "final": event.is_final_response(),
+        "partial": bool(event.partial),
+    }
+    if text:
+        summary["text"] = _truncate(text)
+    calls = event.get_function_calls()
+    if calls:
+        summary["tool_calls"] = [{"name": call.name, "args": _truncate(call.args or {})} for call in calls]
+    responses = event.get_function_responses()
+    if responses:
+        summary["tool_results"] = [{"name": response.name, "result": _truncate(response.response or {})}
+                                   for response in responses]
+    if event.error_message:
+        summary["error"] = event.error_message
+    return summary
 
 class ManimVideoGenerator:
     """Manim video generation agent that can create, debug, and run Manim code."""
@@ -29,57 +81,48 @@ class ManimVideoGenerator:
         self.runner = Runner(
             agent=root_agent,
             session_service=self.session_service,
-            app_name="manim-video-generator"
+            app_name=APP_NAME
         )
     
-    async def generate_video(
-        self,
-        prompt: str,
-        narration_script: str,
-        output_dir: str,
-        python_file_path: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Generate a Manim video based on the given prompt and narration script.
-        
-        Args:
-            prompt: Detailed description of the video to generate
-            narration_script: Script for narration to align the video with
-            output_dir: Directory to save the generated video
-            python_file_path: Optional path for the generated Python file
-                              (default: output_dir/scene.py)
-                              
-        Returns:
-            Dictionary with results of video generation process
-        """
-        # Create output directory if it doesn't exist
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Set default Python file path if not provided
-        if python_file_path is None:
-            python_file_path = os.path.join(output_dir, "scene.py")
-        
-        # Generate a unique user_id and session_id
-        user_id = "manim-user"
-        session_id = f"manim_video_gen_{os.path.basename(output_dir)}"
-        
-        # Create the session explicitly
+    def _create_session(self, user_id: str, session_id: str) -> None:
+        # Every video gets its own budget, kept under the session id
+        state = {}
+        bind_budget(state, Budget(job_id=session_id))
+        # Following the ADK docs, create a session before using it
+        self.session_service.create_session(
+            app_name=APP_NAME,
+            user_id=user_id,
+            session_id=session_id,
+            state=state
+        )
+        print(f"Session created: {session_id}")
+    
+    def _run_report(self, session_id: str) -> Dict[str, Any]:
+        """Budget usage and history compaction savings of a session's run."""
+        session = self.session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+        state = session.state if session is not None else {"budget_id": session_id}
+        return {
+            "budget": get_budget(state).summary(),
+            "compaction": state.get("compaction", {})
+        }
+    
+    def _end_session(self, session_id: str) -> None:
+        """Release a finished session's workspace and delete the session."""
         try:
-            # Following the ADK docs, create a session before using it
-            self.session_service.create_session(
-                app_name="manim-video-generator",
-                user_id=user_id,
-                session_id=session_id
-            )
-            print(f"Session created: {session_id}")
+            session = self.session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+            if session is not None:
+                release_workspace(session.state)
+                self.session_service.delete_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
         except Exception as e:
-            print(f"Error creating session: {e}")
-            return {
-                "status": "error",
-                "error": f"Error creating session: {e}",
-                "output_directory": output_dir,
-                "python_file": python_file_path
-            }
-        
+            print(f"Could not delete session {session_id}: {e}")
+    
+    @staticmethod
+    def new_session_id(output_dir: str) -> str:
+        """A session id that is unique even when several runs share an output directory name."""
+        return f"manim_video_gen_{os.path.basename(os.path.normpath(output_dir))}_{uuid.uuid4().hex[:8]}"
+    
+    @staticmethod
+    def _build_message(prompt: str, narration_script: str, output_dir: str, python_file_path: str) -> types.Content:
         # Prepare the prompt text
         prompt_text = f"""Generate a Manim video based on the following prompt and narration script.
 
@@ -102,24 +145,113 @@ You have full autonomy to decide which actions to take next based on the context
 """
         
         # Prepare initial prompt with all necessary context - use Content instead of dict
-        initial_message = types.Content(
+        return types.Content(
             role="user",
             parts=[types.Part.from_text(text=prompt_text)]
         )
+    
+    async def stream_video(
+        self,
+        prompt: str,
+        narration_script: str,
+        output_dir: str,
+        python_file_path: Optional[str] = None,
+        transcript_path: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Generate a Manim video, yielding a summary of every agent event as it arrives.
+        
+        Events are not kept: each one is summarized (see summarize_event) and dropped, so
+        memory does not grow with the number of edit/render iterations.
+        
+        Args:
+            prompt: Detailed description of the video to generate
+            narration_script: Script for narration to align the video with
+            output_dir: Directory to save the generated video
+            python_file_path: Optional path for the generated Python file
+                              (default: output_dir/scene.py)
+            transcript_path: Optional JSON Lines file the full events are written to
+            session_id: Id of the session to create (default: a new unique id)
+            
+        Yields:
+            Event summaries, in order
+            
+        Raises:
+            Exception: If the session cannot be created or the agent fails
+        """
+        # Create output directory if it doesn't exist
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # Set default Python file path if not provided
+        if python_file_path is None:
+            python_file_path = os.path.join(output_dir, "scene.py")
+        
+        # Generate a unique session_id
+        user_id = USER_ID
+        session_id = session_id or self.new_session_id(output_dir)
         
-        # Start the agent with the initial prompt
-        # We'll collect the responses manually since we're using an async generator
-        responses = []
+        # Create the session explicitly
+        self._create_session(user_id, session_id)
+        initial_message = self._build_message(prompt, narration_script, output_dir, python_file_path)
+        
+        transcript = open(transcript_path, "w") if transcript_path else None
         try:
             print(f"Running agent with user_id={user_id}, session_id={session_id}")
-            async for response in self.runner.run_async(
+            async for event in self.runner.run_async(
                 user_id=user_id,
                 session_id=session_id,
                 new_message=initial_message
             ):
-                responses.append(response)
-                # Print response for debugging
-                print(f"Got response: {type(response)}")
+                if transcript:
+                    transcript.write(event.model_dump_json(exclude_none=True) + "\n")
+                yield summarize_event(event)
+        finally:
+            if transcript:
+                transcript.close()
+    
+    async def generate_video(
+        self,
+        prompt: str,
+        narration_script: str,
+        output_dir: str,
+        python_file_path: Optional[str] = None,
+        transcript_path: Optional[str] = None,
+        tail_size: int = EVENT_TAIL_SIZE
+    ) -> Dict[str, Any]:
+        """Generate a Manim video based on the given prompt and narration script.
+        
+        Args:
+            prompt: Detailed description of the video to generate
+            narration_script: Script for narration to align the video with
+            output_dir: Directory to save the generated video
+            python_file_path: Optional path for the generated Python file
+                              (default: output_dir/scene.py)
+            transcript_path: Optional JSON Lines file to write the full agent events to
+            tail_size: Number of event summaries to return (the most recent ones)
+                              
+        Returns:
+            Dictionary with results of video generation process
+        """
+        # Set default Python file path if not provided
+        if python_file_path is None:
+            python_file_path = os.path.join(output_dir, "scene.py")
+        
+        session_id = self.new_session_id(output_dir)
+        
+        # Only the most recent summaries are kept
+        responses = deque(maxlen=tail_size)
+        event_count = 0
+        try:
+            async for summary in self.stream_video(
+                prompt=prompt,
+                narration_script=narration_script,
+                output_dir=output_dir,
+                python_file_path=python_file_path,
+                transcript_path=transcript_path,
+                session_id=session_id
+            ):
+                responses.append(summary)
+                event_count += 1
         except Exception as e:
             print(f"Error during agent execution: {e}")
             return {
@@ -127,23 +259,85 @@ You have full autonomy to decide which actions to take next based on the context
                 "error": str(e),
                 "output_directory": output_dir,
                 "python_file": python_file_path,
+                "session_id": session_id,
+                "agent_responses": list(responses),
+                "event_count": event_count,
+                "transcript": transcript_path,
+                **self._run_report(session_id),
                 "note": "If you see a PERMISSION_DENIED error about the Generative Language API, please enable it in your Google Cloud console: https://console.developers.google.com/apis/api/generativelanguage.googleapis.com/overview"
             }
         
-        # Return the result with all responses
+        # Return the result with the most recent responses
         return {
             "status": "completed",
             "output_directory": output_dir,
             "python_file": python_file_path,
-            "agent_responses": responses
+            "session_id": session_id,
+            "agent_responses": list(responses),
+            "event_count": event_count,
+            "transcript": transcript_path,
+            **self._run_report(session_id)
         }
+    
+    async def generate_batch(
+        self,
+        jobs: Iterable[Union[Tuple[str, str, str], Dict[str, Any]]],
+        max_concurrency: int = BATCH_CONCURRENCY,
+        transcript_dir: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Generate many videos concurrently with this generator's runner and session service.
+        
+        At most max_concurrency jobs run at once; the rest wait for a free slot. Each job's
+        session is deleted and its workspace released when it finishes, so a long batch does
+        not keep every transcript and edit buffer in memory. A job that fails, e.g. because
+        it is malformed, yields an error result instead of ending the batch.
+        
+        Args:
+            jobs: (prompt, narration_script, output_dir) tuples, or dicts with those keys and
+                  an optional python_file_path
+            max_concurrency: Jobs running at once (default: MANIM_BATCH_CONCURRENCY, or the
+                             size of the render pool)
+            transcript_dir: Optional directory to write each job's full event transcript to
+            
+        Yields:
+            Each job's generate_video result as soon as it finishes, with its job_index; a job
+            that could not run yields {"status": "error", "error": ..., "job_index": ...}
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def run(index: int, job) -> Dict[str, Any]:
+            try:
+                kwargs = dict(job) if isinstance(job, dict) else dict(zip(("prompt", "narration_script", "output_dir"), job))
+                if transcript_dir:
+                    os.makedirs(transcript_dir, exist_ok=True)
+                    kwargs.setdefault("transcript_path", os.path.join(transcript_dir, f"job_{index}.jsonl"))
+                async with semaphore:
+                    result = await self.generate_video(**kwargs)
+            except Exception as e:
+                # A malformed job (e.g. a missing field) fails on its own instead of ending the batch
+                print(f"Job {index} failed: {e}")
+                return {"status": "error", "error": str(e), "job_index": index}
+            self._end_session(result["session_id"])
+            return {**result, "job_index": index}
+        
+        tasks = [asyncio.create_task(run(index, job)) for index, job in enumerate(jobs)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # The caller stopped early: do not leave jobs running in the background
+            for task in tasks:
+                task.cancel()
+            # Wait for the cancelled jobs to unwind, so none is still running when the batch returns
+            await asyncio.gather(*tasks, return_exceptions=True)
 
 # Function for easier use in synchronous contexts
 def generate_manim_video(
     prompt: str,
     narration_script: str,
     output_dir: str,
-    python_file_path: Optional[str] = None
+    python_file_path: Optional[str] = None,
+    transcript_path: Optional[str] = None
 ) -> Dict[str, Any]:
     """Synchronous wrapper for generating Manim videos."""
     generator = ManimVideoGenerator()
@@ -152,22 +346,54 @@ def generate_manim_video(
             prompt=prompt,
             narration_script=narration_script,
             output_dir=output_dir,
-            python_file_path=python_file_path
+            python_file_path=python_file_path,
+            transcript_path=transcript_path
         )
     )
 
+def generate_manim_videos(
+    jobs: Iterable[Union[Tuple[str, str, str], Dict[str, Any]]],
+    max_concurrency: int = BATCH_CONCURRENCY,
+    transcript_dir: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Synchronous wrapper for generating many Manim videos in one process.
+    
+    Returns:
+        The job results in the order the jobs finished (each has its job_index)
+    """
+    generator = ManimVideoGenerator()
+    
+    async def collect():
+        return [result async for result in generator.generate_batch(jobs, max_concurrency, transcript_dir)]
+    
+    return asyncio.run(collect())
+
 if __name__ == "__main__":
     # Example usage when run directly
     import argparse
     
     parser = argparse.ArgumentParser(description="Generate Manim videos using AI")
-    parser.add_argument("--prompt", required=True, help="Prompt describing the video to generate")
-    parser.add_argument("--script", required=True, help="Narration script file path")
-    parser.add_argument("--output-dir", required=True, help="Output directory for video")
+    parser.add_argument("--prompt", help="Prompt describing the video to generate")
+    parser.add_argument("--script", help="Narration script file path")
+    parser.add_argument("--output-dir", help="Output directory for video")
     parser.add_argument("--python-file", help="Path for the generated Python file")
+    parser.add_argument("--transcript", help="Write the full agent events to this JSON Lines file")
+    parser.add_argument("--batch", help="JSON file with a list of jobs (prompt, narration_script, output_dir) "
+                                        "to generate concurrently instead of a single video")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Batch jobs running at once")
     
     args = parser.parse_args()
     
+    if args.batch:
+        with open(args.batch, 'r') as f:
+            jobs = json.load(f)
+        for result in generate_manim_videos(jobs, max_concurrency=args.concurrency):
+            print(json.dumps(result, indent=2))
+        raise SystemExit(0)
+    
+    if not (args.prompt and args.script and args.output_dir):
+        parser.error("--prompt, --script and --output-dir are required without --batch")
+    
     # Read narration script from file
     with open(args.script, 'r') as f:
         narration_script = f.read()
@@ -177,7 +403,8 @@ if __name__ == "__main__":
         prompt=args.prompt,
         narration_script=narration_script,
         output_dir=args.output_dir,
-        python_file_path=args.python_file
+        python_file_path=args.python_file,
+        transcript_path=args.transcript
     )
     
-    print(json.dumps(result, indent=2)) 
\ No newline at end of file
+    print(json.dumps(result, indent=2))
@@ -6,6 +6,8 @@ import json
 from google.adk.agents import Agent, RunConfig
 from google.adk.planners import PlanReActPlanner
 from google.genai import types
+from budget.callbacks import budget_before_model, budget_after_model
+from .compaction import compact_history
 from .tools import file_tools, rag_tools
 
 # Configure logging
@@ -91,6 +93,12 @@ def fix_malformed_function_calls(response):
     return fixed
 
 
+def before_model(callback_context, llm_request):
+    """Skip the call once the budget is spent; otherwise send the compacted history."""
+    return (budget_before_model(callback_context, llm_request) or
+            compact_history(callback_context, llm_request))
+
+
 # Define our root agent
 root_agent = Agent(
     name="manim_video_generation_agent",
@@ -114,11 +122,14 @@ root_agent = Agent(
     - Use the `create_file` tool to create the Python file, which will automatically be set as the active file.
 
     **Step 3: Execute and Debug the Code**
-    - When you create or edit the Python file, it will automatically run with Manim. You'll get the execution results directly in the tool response.
+    - Creating or editing the Python file only runs a quick syntax check (the `preflight` section of the tool response). Fix any syntax error it reports right away.
+    - Call `render_file` (no parameters needed) to run the file with Manim. You'll get the execution results directly in the tool response.
     - If errors occur:
         - First use `rag_query` tool again to find solutions from documentation or relevant examples.
         - Read the file with `read_file` (no parameters needed) to see line numbers.
-        - Fix errors with `edit_file` specifying start_line, end_line, and the new code.
+        - Fix errors with `edit_file` specifying start_line, end_line, and the new code. Make all the edits needed for the error first.
+        - Then call `render_file` once to render all of the edits together.
+        - If a fix made things worse, call `rollback_file` with the `version` from an earlier tool response to restore that version instead of re-editing by hand.
     - Continue editing until the Python code runs successfully.
 
     **Step 4: Validate Alignment with Narration**
@@ -155,7 +166,11 @@ root_agent = Agent(
         # RAG tools
         *rag_tools.get_tools(),
     ],
-    planner=optimized_planner
+    planner=optimized_planner,
+    # Every model call is accounted in the video's budget and skipped once it is spent,
+    # and old file copies and render outputs are compacted before the history is sent
+    before_model_callback=before_model,
+    after_model_callback=budget_after_model
 )
 
 
@@ -0,0 +1,150 @@
+"""
+Compaction of old tool results in the agent's conversation history.
+
+Every model step re-sends the whole conversation, including each earlier
+create_file content, read_file listing and render_file output with Manim's
+full stdout and stderr. Only the newest of these still matter: older file
+versions were replaced by later edits and older errors were already fixed.
+Before each model call the history sent to the model is compacted:
+
+- Only the latest full file version (create_file content or read_file
+  listing) is kept; earlier ones are replaced by a short note with their
+  version and line count.
+- Only the latest failed render is kept in full; the output of other renders
+  is cut to its last MANIM_COMPACTION_KEEP_CHARS characters, where Manim puts
+  the traceback.
+
+The session's events are not changed, only the request built from them. The
+characters left out, and an estimate of the tokens saved, are added up per run
+in the session state under "compaction".
+
+Configuration:
+    MANIM_COMPACTION_KEEP_CHARS: Characters kept of a compacted output (default: 300)
+"""
+import os
+import logging
+from typing import Any, Dict, Optional
+
+from google.genai import types
+
+logger = logging.getLogger("manim_agent.compaction")
+
+KEEP_CHARS = int(os.getenv("MANIM_COMPACTION_KEEP_CHARS", "300"))
+# Rough size of a token in source code and logs, for reporting the savings
+CHARS_PER_TOKEN = 4
+STATE_KEY = "compaction"
+
+# Tool calls whose arguments, and tool results whose fields, hold a full copy of the file
+FILE_CALL_ARGS = {"create_file": "content"}
+FILE_RESPONSE_FIELDS = {"read_file": "content"}
+RENDER_TOOLS = {"render_file"}
+RENDER_OUTPUT_FIELDS = ("stdout", "stderr")
+
+
+def _truncate_tail(text: str) -> str:
+    if len(text) <= KEEP_CHARS:
+        return text
+    return f"[{len(text) - KEEP_CHARS} earlier characters compacted]\n" + text[-KEEP_CHARS:]
+
+
+def _file_note(text: str, version: Any) -> str:
+    lines = text.count("\n") + 1 if text else 0
+    where = f"version {version}, " if version is not None else ""
+    return f"[Older file version compacted ({where}{lines} lines); only the latest version is kept]"
+
+
+def _latest_positions(contents) -> Dict[str, Optional[tuple]]:
+    """Positions (content index, part index) of the latest full file copy and the latest failed render."""
+    latest = {"file": None, "error": None}
+    for i, content in enumerate(contents):
+        for j, part in enumerate(content.parts or []):
+            call, response = part.function_call, part.function_response
+            if call is not None and call.name in FILE_CALL_ARGS:
+                latest["file"] = (i, j)
+            elif response is not None:
+                if response.name in FILE_RESPONSE_FIELDS and (response.response or {}).get(
+                        FILE_RESPONSE_FIELDS[response.name]):
+                    latest["file"] = (i, j)
+                elif response.name in RENDER_TOOLS and (response.response or {}).get("status") == "error":
+                    latest["error"] = (i, j)
+    return latest
+
+
+def _compact_part(part: types.Part, keep: bool) -> Optional[types.Part]:
+    """A compacted copy of part, or None if it is kept as it is."""
+    call, response = part.function_call, part.function_response
+    if call is not None and call.name in FILE_CALL_ARGS and not keep:
+        field = FILE_CALL_ARGS[call.name]
+        args = dict(call.args or {})
+        if not isinstance(args.get(field), str):
+            return None
+        args[field] = _file_note(args[field], None)
+        return types.Part(function_call=types.FunctionCall(id=call.id, name=call.name, args=args))
+
+    if response is None or keep:
+        return None
+    result = dict(response.response or {})
+    if response.name in FILE_RESPONSE_FIELDS:
+        field = FILE_RESPONSE_FIELDS[response.name]
+        if not isinstance(result.get(field), str):
+            return None
+        result[field] = _file_note(result[field], result.get("version"))
+    elif response.name in RENDER_TOOLS:
+        changed = False
+        for field in RENDER_OUTPUT_FIELDS:
+            if isinstance(result.get(field), str) and len(result[field]) > KEEP_CHARS:
+                result[field] = _truncate_tail(result[field])
+                changed = True
+        if not changed:
+            return None
+    else:
+        return None
+    return types.Part(function_response=types.FunctionResponse(id=response.id, name=response.name,
+                                                               response=result))
+
+
+def _part_size(part: types.Part) -> int:
+    return len(part.model_dump_json(exclude_none=True))
+
+
+def compact_history(callback_context, llm_request) -> None:
+    """before_model_callback that compacts old file copies and render outputs in llm_request.
+
+    Returns:
+        None, so the model is always called with the compacted request
+    """
+    contents = llm_request.contents or []
+    latest = _latest_positions(contents)
+    keep = {position for position in latest.values() if position is not None}
+
+    saved = 0
+    compacted_parts = 0
+    for i, content in enumerate(contents):
+        parts = list(content.parts or [])
+        changed = False
+        for j, part in enumerate(parts):
+            compacted = _compact_part(part, (i, j) in keep)
+            if compacted is None:
+                continue
+            part_saved = _part_size(part) - _part_size(compacted)
+            if part_saved <= 0:
+                # Already short, e.g. a file note from an earlier compaction
+                continue
+            saved += part_saved
+            parts[j] = compacted
+            compacted_parts += 1
+            changed = True
+        if changed:
+            # Replace the content rather than editing it, it may be shared with the session's events
+            contents[i] = types.Content(role=content.role, parts=parts)
+
+    stats = dict(callback_context.state.get(STATE_KEY) or {})
+    stats["model_calls"] = stats.get("model_calls", 0) + 1
+    stats["compacted_parts"] = stats.get("compacted_parts", 0) + compacted_parts
+    stats["chars_saved"] = stats.get("chars_saved", 0) + saved
+    stats["tokens_saved"] = stats["chars_saved"] // CHARS_PER_TOKEN
+    callback_context.state[STATE_KEY] = stats
+    if compacted_parts:
+        logger.info(f"Compacted {compacted_parts} old tool results, ~{saved // CHARS_PER_TOKEN} tokens "
+                    f"saved this call, ~{stats['tokens_saved']} this run")
+    return None
@@ -1,70 +1,237 @@
+import os
+import bisect
+import signal
 import logging
 import time
 import threading
-from typing import Any, Dict, Callable
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Callable, Optional
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, 
+logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("manim_agent.monitoring")
 
+# Shared pool for every monitored tool call; calls beyond the limit queue instead of starting threads
+TOOL_WORKERS = int(os.getenv("MANIM_AGENT_TOOL_WORKERS", "4"))
+TOOL_TIMEOUT = float(os.getenv("MANIM_AGENT_TOOL_TIMEOUT", "600"))  # 10 minutes max for any tool
+# How long a cancelled tool gets to stop before its worker is given up on
+CANCEL_GRACE_SECONDS = 5
+
+class ToolCancelled(Exception):
+    """Raised inside a tool that checks its cancellation token after a timeout."""
+
+class CancellationToken:
+    """Cancellation handle for one tool call.
+
+    In-process tools cooperate by calling raise_if_cancelled() at convenient points.
+    Tools that start subprocesses register them, and cancelling kills their whole
+    process group so renders spawned by Manim (ffmpeg, LaTeX) stop too.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._processes = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def event(self) -> threading.Event:
+        """Set when the call is cancelled, for code that polls it, like the render sandbox."""
+        return self._event
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise ToolCancelled("Tool execution was cancelled")
+
+    def register_process(self, process) -> None:
+        """Kill this process's group when the call is cancelled (start it with start_new_session=True)."""
+        with self._lock:
+            self._processes.append(process)
+            cancelled = self._event.is_set()
+        if cancelled:
+            kill_process_group(process)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._event.set()
+            processes = list(self._processes)
+        for process in processes:
+            kill_process_group(process)
+
+def kill_process_group(process, grace_seconds: float = 2) -> None:
+    """Terminate a process and everything in its process group, escalating to SIGKILL."""
+    if process.poll() is not None:
+        return
+    try:
+        pgid = os.getpgid(process.pid)
+    except OSError:
+        return
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(pgid, sig)
+        except OSError:
+            return
+        try:
+            process.wait(timeout=grace_seconds)
+            return
+        except Exception:
+            continue
+
+_local = threading.local()
+
+def current_token() -> CancellationToken:
+    """The cancellation token of the tool call running on this thread (a fresh one outside a call)."""
+    token = getattr(_local, "token", None)
+    return token if token is not None else CancellationToken()
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram for one tool."""
+
+    BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+        self.errors = 0
+        self.timeouts = 0
+
+    def observe(self, seconds: float, status: str = "success") -> None:
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        self.max = max(self.max, seconds)
+        if status == "timeout":
+            self.timeouts += 1
+        elif status != "success":
+            self.errors += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return self.BUCKETS[i] if i < len(self.BUCKETS) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"<={b}s" for b in self.BUCKETS] + [f">{self.BUCKETS[-1]}s"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "mean_seconds": round(self.total / self.count, 3) if self.count else None,
+            "max_seconds": round(self.max, 3),
+            "p50_seconds": self.quantile(0.5),
+            "p95_seconds": self.quantile(0.95),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+def _observe(func_name: str, seconds: float, status: str) -> None:
+    with _histograms_lock:
+        _histograms.setdefault(func_name, LatencyHistogram()).observe(seconds, status)
+
+def get_tool_latency_stats() -> Dict[str, Dict[str, Any]]:
+    """Latency histogram of every monitored tool, keyed by tool name."""
+    with _histograms_lock:
+        return {name: histogram.snapshot() for name, histogram in sorted(_histograms.items())}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """The bounded pool shared by all monitored tool calls."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="manim-tool")
+        return _executor
+
 def monitor_tool_execution(func: Callable, *args, **kwargs) -> Dict[str, Any]:
     """Monitor tool execution with timeouts and logging.
-    
-    This wrapper helps track long-running tools and ensures they return.
-    
+
+    This wrapper helps track long-running tools and ensures they return. The tool
+    runs on the shared bounded pool; on timeout it is cancelled (its subprocesses
+    are killed and in-process work stops at its next cancellation check) rather
+    than left running. Every call is recorded in the tool's latency histogram.
+
     Args:
         func: The function to execute
         *args: Arguments to pass to the function
         **kwargs: Keyword arguments to pass to the function
-        
+
     Returns:
         The result of the function or an error dictionary
     """
     func_name = func.__name__ if hasattr(func, "__name__") else str(func)
     logger.info(f"Starting tool execution: {func_name}")
     start_time = time.time()
-    
+    token = CancellationToken()
+
+    def execute_with_token():
+        _local.token = token
+        try:
+            return func(*args, **kwargs)
+        except ToolCancelled:
+            return {"status": "error", "message": "Execution was cancelled"}
+        except Exception as e:
+            logger.error(f"Error executing {func_name}: {str(e)}")
+            return {"status": "error", "message": f"Error: {str(e)}"}
+        finally:
+            _local.token = None
+
     try:
-        # Execute the tool function
-        result = None
-        execution_timeout = 600  # 10 minutes max for any tool
-        
-        # Function to execute with timeout monitoring
-        def execute_with_timeout():
-            nonlocal result
-            try:
-                result = func(*args, **kwargs)
-            except Exception as e:
-                logger.error(f"Error executing {func_name}: {str(e)}")
-                result = {"status": "error", "message": f"Error: {str(e)}"}
-        
-        # Start execution in a new thread
-        thread = threading.Thread(target=execute_with_timeout)
-        thread.daemon = True  # Allow the thread to be terminated when main program exits
-        thread.start()
-        
-        # Wait for completion with timeout
-        elapsed = 0
-        check_interval = 1  # Check every second
-        while thread.is_alive() and elapsed < execution_timeout:
-            thread.join(timeout=check_interval)
+        future = get_tool_executor().submit(execute_with_token)
+
+        # Wait for completion with timeout, logging progress every 30 seconds
+        while True:
             elapsed = time.time() - start_time
-            if elapsed > 30 and elapsed % 30 < 1:  # Log progress every 30 seconds
-                logger.info(f"Tool {func_name} still running after {elapsed:.1f} seconds")
-        
+            remaining = TOOL_TIMEOUT - elapsed
+            if remaining <= 0:
+                break
+            try:
+                future.result(timeout=min(30, remaining))
+                break
+            except FutureTimeoutError:
+                logger.info(f"Tool {func_name} still running after {time.time() - start_time:.1f} seconds")
+
         # Check if execution timed out
-        if thread.is_alive():
+        if not future.done():
+            elapsed = time.time() - start_time
             logger.error(f"Tool execution timed out after {elapsed:.1f} seconds: {func_name}")
-            return {"status": "error", "message": f"Execution timed out after {execution_timeout} seconds"}
-        
+            if not future.cancel():
+                # Already running: stop its subprocesses and ask it to stop, then give it a moment
+                token.cancel()
+                try:
+                    future.result(timeout=CANCEL_GRACE_SECONDS)
+                except FutureTimeoutError:
+                    logger.error(f"Tool {func_name} did not stop after cancellation; its worker stays busy")
+            _observe(func_name, elapsed, "timeout")
+            return {"status": "error", "message": f"Execution timed out after {TOOL_TIMEOUT:.0f} seconds"}
+
         # Log completion
+        result = future.result()
         duration = time.time() - start_time
         logger.info(f"Tool execution completed: {func_name} in {duration:.2f} seconds")
-        
+        status = result.get("status", "success") if isinstance(result, dict) else "success"
+        _observe(func_name, duration, status)
+
         return result
-    
+
     except Exception as e:
         duration = time.time() - start_time
         logger.error(f"Exception in tool execution: {func_name} after {duration:.2f} seconds: {str(e)}")
-        return {"status": "error", "message": f"Exception: {str(e)}"} 
\ No newline at end of file
+        _observe(func_name, duration, "error")
+        return {"status": "error", "message": f"Exception: {str(e)}"}
@@ -1,14 +1,12 @@
 import os
-import subprocess
 import tempfile
 import shutil
 import logging
-import time
-import signal
 import functools
 from typing import List, Dict, Any, Optional, Callable
 from google.adk.tools import FunctionTool
-from ..monitoring import monitor_tool_execution
+from sandbox import RenderLimits, run_sandboxed, limit_error_analysis
+from ..monitoring import monitor_tool_execution, current_token
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -76,74 +74,9 @@ def run_manim_code(
         
         logger.info(f"Executing command: {' '.join(cmd)}")
         
-        # Execute in a controlled environment with a timeout
+        # Render in the resource-limited sandbox; a monitored call that times out cancels it
         try:
-            # Start process with Popen for better control
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1  # Line buffered
-            )
-            
-            logger.info(f"Process started with PID: {process.pid}")
-            
-            # Set a timeout (5 minutes)
-            max_execution_time = 300  # seconds
-            start_time = time.time()
-            
-            stdout_data = []
-            stderr_data = []
-            
-            # Collect output with polling to avoid blocking
-            while process.poll() is None:
-                # Check for timeout
-                if time.time() - start_time > max_execution_time:
-                    logger.warning(f"Process timed out after {max_execution_time} seconds")
-                    # Send SIGTERM to process group
-                    try:
-                        # Try sending signal to the process
-                        os.kill(process.pid, signal.SIGTERM)
-                        # Give it some time to terminate gracefully
-                        time.sleep(2)
-                        # Force kill if still running
-                        if process.poll() is None:
-                            os.kill(process.pid, signal.SIGKILL)
-                    except OSError as e:
-                        logger.error(f"Error terminating process: {e}")
-                    
-                    break
-                
-                # Read output without blocking
-                stdout_line = process.stdout.readline()
-                if stdout_line:
-                    logger.info(f"Process output: {stdout_line.strip()}")
-                    stdout_data.append(stdout_line)
-                
-                stderr_line = process.stderr.readline()
-                if stderr_line:
-                    logger.warning(f"Process error: {stderr_line.strip()}")
-                    stderr_data.append(stderr_line)
-                
-                # Avoid CPU spinning
-                time.sleep(0.1)
-            
-            # Get any remaining output
-            remaining_stdout, remaining_stderr = process.communicate()
-            if remaining_stdout:
-                stdout_data.append(remaining_stdout)
-            if remaining_stderr:
-                stderr_data.append(remaining_stderr)
-            
-            # Combine collected output
-            stdout = "".join(stdout_data)
-            stderr = "".join(stderr_data)
-            return_code = process.returncode
-            
-            # Log completion
-            logger.info(f"Process completed with return code: {return_code}")
-            
+            render = run_sandboxed(cmd, RenderLimits.from_env(), cancel_event=current_token().event)
         except Exception as e:
             logger.error(f"Error during process execution: {str(e)}")
             return {
@@ -156,6 +89,24 @@ def run_manim_code(
                 ]
             }
         
+        stdout = render["stdout"]
+        stderr = render["stderr"]
+        return_code = render["returncode"]
+        logger.info(f"Process completed with return code: {return_code}")
+        
+        if render["limit_breach"]:
+            error_analysis = limit_error_analysis(render["limit_breach"], render["resource_usage"], render["limits"])
+            logger.error(f"Render stopped: {render['limit_breach']}")
+            return {
+                "status": "error",
+                "message": f"Render stopped: {error_analysis['error_description']}",
+                "stderr": stderr,
+                "stdout": stdout,
+                "returncode": return_code,
+                "error_analysis": error_analysis,
+                "resource_usage": render["resource_usage"]
+            }
+        
         if return_code == 0:
             # Success
             logger.info("Code executed successfully")
@@ -164,7 +115,8 @@ def run_manim_code(
                 "message": "Code executed successfully",
                 "stdout": stdout,
                 "output_dir": output_dir,
-                "scene_name": scene_name or "all scenes"
+                "scene_name": scene_name or "all scenes",
+                "resource_usage": render["resource_usage"]
             }
         else:
             # Error
@@ -175,15 +127,10 @@ def run_manim_code(
                 "stderr": stderr,
                 "stdout": stdout,
                 "returncode": return_code,
-                "error_analysis": analyze_manim_error(stderr)
+                "error_analysis": analyze_manim_error(stderr),
+                "resource_usage": render["resource_usage"]
             }
     
-    except subprocess.TimeoutExpired:
-        logger.error("Execution timed out (exceeded 5 minutes)")
-        return {
-            "status": "error",
-            "message": "Execution timed out (exceeded 5 minutes)"
-        }
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         return {
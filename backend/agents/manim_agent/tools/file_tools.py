@@ -1,44 +1,141 @@
 import os
+import ast
 import json
+import time
+import asyncio
 from typing import List, Optional, Dict, Union
-from google.adk.tools import FunctionTool
+from google.adk.tools import FunctionTool, ToolContext
+from budget import get_budget
+from workspace import get_workspace
 from .code_execution_tools import run_manim_code
+from ..monitoring import monitor_tool_execution
 
-# Global variable to store current file path (automatically set when a file is created)
-_CURRENT_FILE_PATH = None
+# The active file, the render state and the history belong to the session's workspace, so
+# concurrent sessions never touch each other's files. Edits are batched: each one only changes
+# the file's in-memory buffer and gets a syntax check, and render_file writes the file and
+# renders all of them at once.
 
-# Helper function to run Manim automatically after file operations when applicable
-def _auto_run_manim_if_python(filepath: str, result: dict) -> dict:
-    """Automatically run Manim code execution if the file is a Python file.
+def _preflight_check(filepath: str, source: str) -> dict:
+    """Cheap checks run after every edit instead of a full render.
+    
+    Args:
+        filepath: Path of the Python file, for error messages
+        source: The file's current content
+        
+    Returns:
+        A dictionary with the status and any problems found
+    """
+    try:
+        tree = ast.parse(source, filename=filepath)
+    except SyntaxError as e:
+        return {
+            "status": "error",
+            "message": f"SyntaxError: {e.msg}",
+            "line_number": e.lineno,
+            "line": (e.text or "").rstrip()
+        }
+    
+    scenes = [
+        node.name for node in ast.walk(tree)
+        if isinstance(node, ast.ClassDef) and any(
+            (isinstance(base, ast.Name) and base.id.endswith("Scene")) or
+            (isinstance(base, ast.Attribute) and base.attr.endswith("Scene"))
+            for base in node.bases
+        )
+    ]
+    if not scenes:
+        return {
+            "status": "error",
+            "message": "No Scene subclass found; Manim would have nothing to render."
+        }
+    return {
+        "status": "success",
+        "scenes": scenes
+    }
+
+def _check_after_write(filepath: str, source: str, result: dict) -> dict:
+    """Run the pre-flight check on a created or edited Python file.
     
     Args:
         filepath: Path to the file that was created or edited
+        source: The file's content after the change
         result: The result dict from the file operation
         
     Returns:
-        A dictionary with combined file operation and Manim execution results
+        A dictionary with combined file operation and pre-flight check results
     """
-    # Only run Manim for Python files
+    # Only Python files are checked and rendered
     if filepath.endswith('.py') and result["status"] == "success":
-        # Run Manim code execution
-        manim_result = run_manim_code(
-            filepath=filepath,
-            output_dir="auto",  # Use auto-generated directory
-            scene_name="",      # Run all scenes
-            quality="medium"    # Use medium quality
-        )
-        
-        # Combine results
-        combined_result = {
+        return {
             **result,
-            "manim_execution": manim_result
+            "preflight": _preflight_check(filepath, source),
+            "render_pending": True,
+            "next_step": "Make any other edits, then call render_file once to render all of them."
         }
-        return combined_result
     
     # Return original result for non-Python files or failed operations
     return result
 
-def create_file(filepath: str, content: str) -> dict:
+async def render_file(tool_context: ToolContext) -> dict:
+    """Render the current file with Manim after a batch of edits.
+    
+    The file is only rendered if it changed since the last render; otherwise the last
+    result is returned. Syntax errors are reported without starting Manim. Renders drop
+    to low quality when the video's budget runs short, and stop once it is spent.
+    
+    The render runs off the event loop, so other sessions served by the same runner
+    keep going while it is in progress.
+    
+    Returns:
+        A dictionary with the Manim execution results
+    """
+    workspace = get_workspace(tool_context.state)
+    filepath = workspace.current_file
+    
+    if filepath is None:
+        return {
+            "status": "error",
+            "message": "No file has been created yet. Use create_file first."
+        }
+    
+    if not workspace.render_pending and workspace.last_render is not None:
+        return {**workspace.last_render, "cached": True}
+    
+    budget = get_budget(tool_context.state)
+    exhausted = budget.exhausted_reason()
+    if exhausted:
+        # Keep the best attempt so far instead of paying for another render
+        return {
+            **(workspace.last_render or {"status": "error"}),
+            "budget_exhausted": exhausted,
+            "message": f"Budget exhausted ({exhausted}); the last render is final. Stop editing."
+        }
+    
+    buffer = workspace.buffer()
+    preflight = _preflight_check(filepath, buffer.text())
+    if preflight["status"] == "error":
+        return {**preflight, "filepath": filepath, "rendered": False, "version": buffer.version}
+    
+    # Edits so far only changed the buffer; Manim reads the file
+    workspace.flush(filepath)
+    started = time.monotonic()
+    # Monitored: the render runs on the shared tool pool, is killed on timeout and lands in
+    # the run_manim_code latency histogram
+    result = await asyncio.to_thread(
+        monitor_tool_execution,
+        run_manim_code,
+        filepath=filepath,
+        output_dir=workspace.media_dir,  # Each session renders into its own media directory
+        scene_name="",      # Run all scenes
+        quality=budget.render_quality("medium")  # Medium quality unless the budget runs short
+    )
+    budget.record_render(time.monotonic() - started)
+    workspace.render_finished(result)
+    buffer.snapshot(f"render_{result.get('status')}")
+    return {**result, "version": buffer.version}
+render_file_tool = FunctionTool(func=render_file)
+
+def create_file(filepath: str, content: str, tool_context: ToolContext) -> dict:
     """Create a new file with the given content.
     
     Args:
@@ -48,59 +145,55 @@ def create_file(filepath: str, content: str) -> dict:
     Returns:
         A dictionary with a status message and the file path created
     """
-    global _CURRENT_FILE_PATH
+    workspace = get_workspace(tool_context.state)
     
     # Ensure the directory exists
     os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
     
-    # Create the file
-    with open(filepath, 'w') as f:
-        f.write(content)
+    # Create the file; later edits stay in its buffer until it is rendered
+    buffer = workspace.open_buffer(filepath, content)
+    buffer.flush()
     
     # Automatically set as current file
-    _CURRENT_FILE_PATH = filepath
+    workspace.file_created(filepath)
     
     result = {
         "status": "success",
         "message": f"File created at {filepath}",
-        "filepath": filepath
+        "filepath": filepath,
+        "version": buffer.version
     }
     
-    # Automatically run Manim if it's a Python file
-    return _auto_run_manim_if_python(filepath, result)
+    # Check the file and mark it for rendering if it's a Python file
+    return _check_after_write(filepath, content, result)
     
 create_file_tool = FunctionTool(func=create_file)
 
-def read_file() -> dict:
+def read_file(tool_context: ToolContext) -> dict:
     """Read the current file with line numbers.
     
     Returns:
         A dictionary with the file content formatted with line numbers or an error message
     """
-    global _CURRENT_FILE_PATH
+    workspace = get_workspace(tool_context.state)
+    filepath = workspace.current_file
     
-    if _CURRENT_FILE_PATH is None:
+    if filepath is None:
         return {
             "status": "error",
             "message": "No file has been created yet. Use create_file first."
         }
-        
-    filepath = _CURRENT_FILE_PATH
     
     try:
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
-        
-        # Format content with line numbers
-        numbered_content = ""
-        for i, line in enumerate(lines, 1):
-            numbered_content += f"{i:4d} | {line}"
+        # The buffer holds the edits that are not rendered (and written) yet
+        buffer = workspace.buffer()
         
         return {
             "status": "success",
-            "content": numbered_content,
-            "line_count": len(lines),
-            "filepath": filepath
+            "content": buffer.numbered(),
+            "line_count": buffer.line_count,
+            "filepath": filepath,
+            "version": buffer.version
         }
     except FileNotFoundError as e:
         return {
@@ -138,7 +231,7 @@ def list_files(directory: str) -> dict:
         }
 list_files_tool = FunctionTool(func=list_files)
 
-def edit_file(start_line: int, end_line: int, new_content: str) -> dict:
+def edit_file(start_line: int, end_line: int, new_content: str, tool_context: ToolContext) -> dict:
     """Edit specific lines in the current file.
     
     This function makes it easy to edit a specific part of the current file by replacing 
@@ -152,26 +245,17 @@ def edit_file(start_line: int, end_line: int, new_content: str) -> dict:
     Returns:
         A dictionary with a status message
     """
-    global _CURRENT_FILE_PATH
+    workspace = get_workspace(tool_context.state)
+    filepath = workspace.current_file
     
-    if _CURRENT_FILE_PATH is None:
+    if filepath is None:
         return {
             "status": "error",
             "message": "No file has been created yet. Use create_file first."
         }
     
-    filepath = _CURRENT_FILE_PATH
-    
     try:
-        if not os.path.exists(filepath):
-            return {
-                "status": "error",
-                "message": f"File not found: {filepath}"
-            }
-            
-        # Read the file to check line count
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
+        buffer = workspace.buffer()
             
         # Validate line numbers
         if start_line < 1:
@@ -180,10 +264,10 @@ def edit_file(start_line: int, end_line: int, new_content: str) -> dict:
                 "message": f"Invalid start_line: {start_line}. Line numbers start at 1."
             }
             
-        if end_line > len(lines):
+        if end_line > buffer.line_count:
             return {
                 "status": "error", 
-                "message": f"Invalid end_line: {end_line}. File only has {len(lines)} lines."
+                "message": f"Invalid end_line: {end_line}. File only has {buffer.line_count} lines."
             }
             
         if start_line > end_line:
@@ -191,31 +275,25 @@ def edit_file(start_line: int, end_line: int, new_content: str) -> dict:
                 "status": "error",
                 "message": f"start_line ({start_line}) cannot be greater than end_line ({end_line})."
             }
-            
-        # Convert to 0-indexed for internal processing
-        start_idx = start_line - 1
-        end_idx = end_line
-        
-        # Ensure new content ends with newline
-        if new_content and not new_content.endswith('\n'):
-            new_content = new_content + '\n'
         
-        # Replace the lines
-        new_lines = new_content.splitlines(True)
-        lines[start_idx:end_idx] = new_lines
-        
-        # Write the file back
-        with open(filepath, 'w') as f:
-            f.writelines(lines)
+        # Replace the lines in memory; the file is written when it is rendered
+        version = buffer.replace(start_line, end_line, new_content)
+        workspace.file_edited(filepath, start_line=start_line, end_line=end_line, version=version)
         
         result = {
             "status": "success", 
-            "message": f"Made line edits to {filepath} from line {start_line} to {end_line}"
+            "message": f"Made line edits to {filepath} from line {start_line} to {end_line}",
+            "version": version
         }
         
-        # Automatically run Manim if it's a Python file
-        return _auto_run_manim_if_python(filepath, result)
+        # Check the file and mark it for rendering if it's a Python file
+        return _check_after_write(filepath, buffer.text(), result)
         
+    except FileNotFoundError as e:
+        return {
+            "status": "error",
+            "message": f"File not found: {filepath}\nError: {e}"
+        }
     except Exception as e:
         return {
             "status": "error",
@@ -223,11 +301,54 @@ def edit_file(start_line: int, end_line: int, new_content: str) -> dict:
         }
 edit_file_tool = FunctionTool(func=edit_file)
 
+def rollback_file(version: int, tool_context: ToolContext) -> dict:
+    """Restore the current file to an earlier version.
+    
+    Every create, edit and render result includes the file's version. Rolling back is
+    itself a new version, so it can be undone the same way.
+    
+    Args:
+        version: The version to restore
+        
+    Returns:
+        A dictionary with the new version and a diff of what the rollback changed
+    """
+    workspace = get_workspace(tool_context.state)
+    filepath = workspace.current_file
+    
+    if filepath is None:
+        return {
+            "status": "error",
+            "message": "No file has been created yet. Use create_file first."
+        }
+    
+    try:
+        buffer = workspace.buffer()
+        previous = buffer.version
+        new_version = buffer.rollback(version)
+        workspace.file_edited(filepath, rollback_to=version, version=new_version)
+        
+        result = {
+            "status": "success",
+            "message": f"Restored {filepath} to version {version}",
+            "version": new_version,
+            "diff": buffer.diff(previous)
+        }
+        return _check_after_write(filepath, buffer.text(), result)
+    except ValueError as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+rollback_file_tool = FunctionTool(func=rollback_file)
+
 def get_tools() -> List[FunctionTool]:
     """Get all file operation tools."""
     return [
         create_file_tool, 
         read_file_tool, 
         edit_file_tool, 
+        rollback_file_tool,
+        render_file_tool,
         list_files_tool
     ] 
\ No newline at end of file
@@ -0,0 +1,247 @@
+"""
+Build the benchmark fixtures from the scenes checked into the repository.
+
+Each fixture replays the LLM responses that would produce one of the existing
+animations: the plan lists its scenes, every PlanScene gets a short plan and
+CreateCode returns the scene's source. The cnn and transformer mock videos
+share a voiceover base scene from their utils module; their first CreateCode
+response is the original file (which fails to render standalone) and the
+recorded FixErrors response is a self-contained version with the base scene's
+helpers folded in and the voiceover calls removed. That keeps one fix round
+trip per scene in the benchmark, like a typical real run.
+
+Usage (from the pocketflow_manim directory):
+    python benchmark/build_fixtures.py
+"""
+import os
+import ast
+import sys
+import json
+
+import yaml
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCHMARK_DIR, "fixtures")
+BACKEND_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, "..", "..", ".."))
+
+RAG_DEFAULT = {
+    "status": "success",
+    "response": "Manim scenes subclass Scene (or ThreeDScene for 3D) and build the animation in construct() "
+                "with self.play(...) and self.wait(...).",
+    "retrieved_files": [],
+}
+
+# name, prompt, scene sources (relative to backend/), base scene in utils.py for the mock videos
+FIXTURE_SPECS = [
+    {
+        "name": "rolling_ball_energy",
+        "prompt": "Create an animation of a ball rolling down a hill that shows how potential energy "
+                  "turns into kinetic energy while the total energy stays constant",
+        "sources": ["agents/rolling_ball_energy.py"],
+    },
+    {
+        "name": "cool_3d_graphics",
+        "prompt": "Create a cool 3D animation of a rotating dodecahedron with axes, zooming into it",
+        "sources": ["agents/cool_3d_graphics_final.py"],
+    },
+    {
+        "name": "fields_waves_3d",
+        "prompt": "Create a 3D animation of fields and waves: a vector field and a travelling wave surface",
+        "sources": ["agents/fields_waves_3d_final.py"],
+    },
+    {
+        "name": "cnn_video",
+        "prompt": "Create an explainer video on convolutional neural networks: the title, how an image "
+                  "becomes a matrix of pixels, and how a convolution filter slides over it",
+        "sources": ["mock/cnn_video/scene1_title.py",
+                    "mock/cnn_video/scene2_image_to_matrix.py",
+                    "mock/cnn_video/scene3_convolution.py"],
+        "base_scene": ("mock/cnn_video/utils.py", "CNNBaseScene"),
+    },
+    {
+        "name": "transformer_video",
+        "prompt": "Create an explainer video on transformers and attention: the title, sequences as "
+                  "vectors, and the query, key and value projections",
+        "sources": ["mock1/transformer_video/scene1_title.py",
+                    "mock1/transformer_video/scene2_sequence_vectors.py",
+                    "mock1/transformer_video/scene3_query_key_value.py"],
+        "base_scene": ("mock1/transformer_video/utils.py", "TransformerBaseScene"),
+    },
+]
+
+
+class _BlockDumper(yaml.SafeDumper):
+    """Dumps multi-line strings (code) as literal blocks so fixtures stay readable."""
+
+
+def _str_presenter(dumper, data):
+    style = "|" if "\n" in data else None
+    return dumper.represent_scalar("tag:yaml.org,2002:str", data, style=style)
+
+
+_BlockDumper.add_representer(str, _str_presenter)
+
+
+def yaml_response(data: dict) -> str:
+    """Format data the way LLM.call returns responses."""
+    return f"```yaml\n{yaml.dump(data, Dumper=_BlockDumper, sort_keys=False, width=1000)}```"
+
+
+def read_source(relative_path: str) -> str:
+    with open(os.path.join(BACKEND_DIR, relative_path), "r") as f:
+        return f.read()
+
+
+def scene_class(tree: ast.Module) -> ast.ClassDef:
+    return next(node for node in tree.body if isinstance(node, ast.ClassDef))
+
+
+def strip_output_config(code: str) -> str:
+    """Drop config.output_file assignments so renders land in the project's media dir."""
+    return "\n".join(line for line in code.split("\n") if not line.startswith("config.output_file"))
+
+
+class _RemoveVoiceover(ast.NodeTransformer):
+    """Inline `with self.voiceover(...)` bodies and drop set_speech_service calls."""
+
+    def __init__(self):
+        self.narration = []
+        self.assigned = {}
+
+    def visit_Assign(self, node):
+        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) and isinstance(node.value, ast.Constant):
+            self.assigned[node.targets[0].id] = node.value.value
+        return node
+
+    def visit_Expr(self, node):
+        call = node.value
+        if isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute) and call.func.attr == "set_speech_service":
+            return None
+        return self.generic_visit(node)
+
+    def visit_With(self, node):
+        self.generic_visit(node)
+        call = node.items[0].context_expr
+        if isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute) and call.func.attr == "voiceover":
+            if call.args:
+                text = call.args[0]
+                if isinstance(text, ast.Constant):
+                    self.narration.append(text.value)
+                elif isinstance(text, ast.Name) and text.id in self.assigned:
+                    self.narration.append(self.assigned[text.id])
+            return node.body
+        return node
+
+
+def standalone_scene(source: str, base_source: str, base_name: str):
+    """Fold the base scene into the scene class and remove the voiceover calls.
+
+    Returns:
+        Tuple of (standalone code, narration text)
+    """
+    base = next(node for node in ast.parse(base_source).body
+                if isinstance(node, ast.ClassDef) and node.name == base_name)
+    base_body = [stmt for stmt in base.body if not (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant))]
+    for stmt in base_body:
+        if isinstance(stmt, ast.FunctionDef) and stmt.name == "__init__":
+            # The speech service is the only thing the base scene needs manim_voiceover for
+            stmt.body = [s for s in stmt.body if "gtts_service" not in ast.unparse(s)]
+
+    tree = ast.parse(source)
+    tree.body = [node for node in tree.body
+                 if not (isinstance(node, ast.ImportFrom) and node.module == "utils")]
+    cls = scene_class(tree)
+    cls.bases = [ast.Name(id="Scene", ctx=ast.Load())]
+    docstring = cls.body[:1] if ast.get_docstring(cls) else []
+    cls.body = docstring + base_body + cls.body[len(docstring):]
+
+    remover = _RemoveVoiceover()
+    tree = ast.fix_missing_locations(remover.visit(tree))
+    narration = "\n".join(" ".join(text.split()) for text in remover.narration)
+    return ast.unparse(tree) + "\n", narration
+
+
+def describe(cls: ast.ClassDef) -> str:
+    docstring = ast.get_docstring(cls)
+    return " ".join(docstring.split()) if docstring else f"The {cls.name} animation"
+
+
+def build_fixture(spec: dict) -> dict:
+    base_source = read_source(spec["base_scene"][0]) if "base_scene" in spec else None
+    scenes, plans, creates, fixes = [], [], [], []
+
+    for relative_path in spec["sources"]:
+        source = strip_output_config(read_source(relative_path))
+        cls = scene_class(ast.parse(source))
+        description = describe(cls)
+        scenes.append({"name": cls.name, "description": description})
+
+        if base_source is not None:
+            code, narration = standalone_scene(source, base_source, spec["base_scene"][1])
+        else:
+            code, narration = source, ""
+
+        plans.append(yaml_response({
+            "thinking": f"Implement {cls.name} as a single Manim scene.",
+            "scene_plan": description,
+            "code_structure": f"One {cls.bases[0].id if isinstance(cls.bases[0], ast.Name) else 'Scene'} "
+                              f"subclass named {cls.name} with a construct method.",
+            "narration": narration,
+            "requires_research": False,
+            "research_query": "",
+            "next_step": "create_code",
+        }))
+
+        if base_source is not None:
+            # First attempt depends on the mock's utils module; the recorded fix is self-contained
+            creates.append(yaml_response({
+                "thinking": f"Build {cls.name} on the shared base scene.",
+                "code": source,
+                "narration": narration,
+            }))
+            fixes.append(yaml_response({
+                "thinking": "The utils module is not available next to the scene file; inline the base scene.",
+                "fixed_code": code,
+                "changes": "Folded the base scene helpers into the scene class and removed the voiceover calls.",
+            }))
+        else:
+            creates.append(yaml_response({
+                "thinking": f"Implement {cls.name}.",
+                "code": code,
+                "narration": narration,
+            }))
+
+    initialize = yaml_response({
+        "thinking": f"The prompt breaks down into {len(scenes)} scene(s).",
+        "approach": "One Manim scene per part of the prompt, rendered and stitched in order.",
+        "scenes": scenes,
+        "next_step": "plan_first_scene",
+    })
+
+    return {
+        "name": spec["name"],
+        "prompt": spec["prompt"],
+        "sources": spec["sources"],
+        "llm": {
+            "InitializeAgent": [initialize],
+            "PlanScene": plans,
+            "CreateCode": creates,
+            "FixErrors": fixes,
+        },
+        "rag": {"default": RAG_DEFAULT},
+    }
+
+
+def main():
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for spec in FIXTURE_SPECS:
+        path = os.path.join(FIXTURES_DIR, f"{spec['name']}.json")
+        with open(path, "w") as f:
+            json.dump(build_fixture(spec), f, indent=2)
+            f.write("\n")
+        print(f"Wrote {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Replay and recording backends for the LLM and RAG calls of the flow.
+
+A fixture holds, per node, the ordered list of LLM responses that node
+received, plus the RAG responses keyed by query. Replaying a fixture makes a
+run fully deterministic and offline: only the renders and ffmpeg really run,
+which is exactly what the benchmark wants to measure.
+
+Fixture format:
+
+    {
+        "name": "rolling_ball_energy",
+        "prompt": "<prompt given to InitializeAgent>",
+        "sources": ["agents/rolling_ball_energy.py"],
+        "llm": {
+            "InitializeAgent": ["```yaml ...```"],
+            "PlanScene": ["```yaml ...```", ...],
+            "CreateCode": ["```yaml ...```", ...],
+            "FixErrors": []
+        },
+        "rag": {
+            "default": {"status": "success", "response": "...", "retrieved_files": []},
+            "<exact query>": {...}
+        }
+    }
+"""
+import json
+import threading
+from typing import Dict, Any, List
+
+from services.llm import LLM, LLMParams
+from tools.rag_tools import query_manim_corpus
+from tracing import enclosing_span
+
+
+class FixtureExhausted(Exception):
+    """A node asked for more LLM responses than the fixture recorded."""
+
+
+def load_fixture(path: str) -> Dict[str, Any]:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_fixture(fixture: Dict[str, Any], path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(fixture, f, indent=2)
+        f.write("\n")
+
+
+def calling_node() -> str:
+    """Name of the flow node the current call is made from."""
+    node_span = enclosing_span("node")
+    return node_span.name if node_span is not None else "unknown"
+
+
+class ReplayLLM:
+    """LLM backend that returns each node's recorded responses in order."""
+
+    def __init__(self, responses: Dict[str, List[str]]):
+        self.responses = {node: list(items) for node, items in responses.items()}
+        self.served = {node: 0 for node in responses}
+        self._lock = threading.Lock()
+
+    def __call__(self, params: LLMParams) -> str:
+        node = calling_node()
+        # Speculative candidates ask from several threads at once
+        with self._lock:
+            index = self.served.get(node, 0)
+            recorded = self.responses.get(node, [])
+            if index >= len(recorded):
+                raise FixtureExhausted(f"No recorded LLM response #{index + 1} for {node}")
+            self.served[node] = index + 1
+            return recorded[index]
+
+    def unused(self) -> Dict[str, int]:
+        """Recorded responses that the run never asked for, per node."""
+        return {node: len(items) - self.served.get(node, 0)
+                for node, items in self.responses.items()
+                if len(items) > self.served.get(node, 0)}
+
+
+class ReplayRAG:
+    """RAG backend that returns the recorded response for a query, or the default one."""
+
+    def __init__(self, responses: Dict[str, Dict[str, Any]]):
+        self.responses = responses
+        self.queries = []
+
+    def __call__(self, query: str) -> Dict[str, Any]:
+        self.queries.append(query)
+        recorded = self.responses.get(query) or self.responses.get("default")
+        if recorded is None:
+            return {"status": "error", "message": "No recorded RAG response", "query": query}
+        return dict(recorded, query=query)
+
+
+class RecordingLLM:
+    """LLM backend that calls the real API and keeps every response per node."""
+
+    def __init__(self):
+        self.responses: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, params: LLMParams) -> str:
+        node = calling_node()
+        response = LLM(params.model).complete(params)
+        with self._lock:
+            self.responses.setdefault(node, []).append(response)
+        return response
+
+
+class RecordingRAG:
+    """RAG backend that queries the real corpus and keeps every response by query."""
+
+    def __init__(self):
+        self.responses: Dict[str, Dict[str, Any]] = {}
+
+    def __call__(self, query: str) -> Dict[str, Any]:
+        result = query_manim_corpus(query)
+        self.responses[query] = {k: v for k, v in result.items() if k not in ("query", "traceback")}
+        return result
@@ -0,0 +1,249 @@
+"""
+Offline end-to-end benchmark of the generation pipeline.
+
+Runs create_manim_agent_flow() once per fixture with the LLM and RAG calls
+replayed from benchmark/fixtures, so the only real work is rendering and
+stitching. For every fixture it reports per-node time, render time,
+attempts-to-success per scene and total wall time, and appends the numbers
+to benchmark/results/results.jsonl tagged with the current git commit so
+runs can be compared across commits.
+
+Usage (from the pocketflow_manim directory):
+    python benchmark/run_benchmark.py
+    python benchmark/run_benchmark.py --fixture cnn_video --compare
+    python benchmark/run_benchmark.py --record my_prompt --prompt "..."   # record a new fixture
+"""
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import argparse
+import logging
+import subprocess
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from flow import create_manim_agent_flow
+from services.llm import set_llm_backend
+from tools.rag_tools import set_rag_backend
+from tracing import Tracer, use_tracer
+from benchmark.replay import (
+    ReplayLLM, ReplayRAG, RecordingLLM, RecordingRAG, FixtureExhausted, load_fixture, save_fixture
+)
+
+logger = logging.getLogger("manim_agent")
+
+FIXTURES_DIR = os.path.join(BENCHMARK_DIR, "fixtures")
+RESULTS_FILE = os.path.join(BENCHMARK_DIR, "results", "results.jsonl")
+
+
+def git_revision() -> Dict[str, Any]:
+    """Commit the benchmark runs against, and whether the tree has local changes."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD", "--", "."],
+                               cwd=os.path.dirname(BENCHMARK_DIR)).returncode != 0
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def summarize(fixture: Dict[str, Any], shared: Dict[str, Any], tracer: Tracer,
+              wall_seconds: float, error: Optional[str]) -> Dict[str, Any]:
+    """Turn the spans of one run into the benchmark metrics."""
+    node_seconds = defaultdict(float)
+    node_calls = defaultdict(int)
+    attempts = defaultdict(int)
+    render_seconds = 0.0
+    renders = 0
+    llm_calls = 0
+
+    for s in tracer.spans:
+        if s.category == "node":
+            node_seconds[s.name] += s.duration_ms / 1000
+            node_calls[s.name] += 1
+            if s.name == "ExecuteCode":
+                attempts[s.attributes.get("scene_index", 0)] += 1
+        elif s.name == "subprocess.render":
+            render_seconds += s.duration_ms / 1000
+            renders += 1
+        elif s.category == "llm":
+            llm_calls += 1
+
+    completed = {scene["index"] for scene in shared.get("completed_scenes", [])}
+    scenes = [
+        {"index": index, "attempts": attempts.get(index, 0), "success": index in completed}
+        for index in range(len(shared.get("scenes", [])))
+    ]
+    successful_attempts = [scene["attempts"] for scene in scenes if scene["success"]]
+    final_result = shared.get("final_result", {})
+
+    return {
+        "fixture": fixture["name"],
+        "success": error is None and final_result.get("status") == "success",
+        "error": error,
+        "wall_seconds": round(wall_seconds, 3),
+        "render_seconds": round(render_seconds, 3),
+        "renders": renders,
+        "llm_calls": llm_calls,
+        "scenes": scenes,
+        "scenes_completed": len(completed),
+        "mean_attempts_to_success": round(sum(successful_attempts) / len(successful_attempts), 2)
+                                    if successful_attempts else None,
+        "node_seconds": {name: round(seconds, 3) for name, seconds in sorted(node_seconds.items())},
+        "node_calls": dict(sorted(node_calls.items())),
+    }
+
+
+def run_fixture(fixture: Dict[str, Any], output_dir: str) -> Dict[str, Any]:
+    """Run the flow once against a fixture's recorded responses."""
+    llm = ReplayLLM(fixture["llm"])
+    rag = ReplayRAG(fixture.get("rag", {}))
+    shared = {
+        "prompt": fixture["prompt"],
+        "output_directory": output_dir,
+        "file_name": fixture["name"],
+    }
+
+    tracer = Tracer()
+    error = None
+    set_llm_backend(llm)
+    set_rag_backend(rag)
+    started = time.time()
+    try:
+        with use_tracer(tracer):
+            create_manim_agent_flow().run(shared)
+    except FixtureExhausted as e:
+        # The run needed more LLM round trips than were recorded (e.g. a fix that no longer works)
+        error = str(e)
+    except Exception as e:
+        logger.exception(f"Benchmark run of {fixture['name']} failed")
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        set_llm_backend(None)
+        set_rag_backend(None)
+    wall_seconds = time.time() - started
+
+    result = summarize(fixture, shared, tracer, wall_seconds, error)
+    result["unused_responses"] = llm.unused()
+    return result
+
+
+def record_fixture(name: str, prompt: str, output_dir: str) -> str:
+    """Run the flow against the real LLM and RAG and save what they returned as a fixture."""
+    llm = RecordingLLM()
+    rag = RecordingRAG()
+    set_llm_backend(llm)
+    set_rag_backend(rag)
+    try:
+        with use_tracer(Tracer()):
+            create_manim_agent_flow().run({"prompt": prompt, "output_directory": output_dir, "file_name": name})
+    finally:
+        set_llm_backend(None)
+        set_rag_backend(None)
+
+    path = os.path.join(FIXTURES_DIR, f"{name}.json")
+    save_fixture({"name": name, "prompt": prompt, "sources": [], "llm": llm.responses, "rag": rag.responses}, path)
+    return path
+
+
+def previous_result(fixture_name: str, commit: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Latest recorded result for the fixture from a different commit."""
+    if not os.path.exists(RESULTS_FILE):
+        return None
+    previous = None
+    with open(RESULTS_FILE, "r") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["fixture"] == fixture_name and record.get("commit") != commit:
+                previous = record
+    return previous
+
+
+def append_results(results: List[Dict[str, Any]], revision: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+    timestamp = datetime.now().isoformat()
+    with open(RESULTS_FILE, "a") as f:
+        for result in results:
+            f.write(json.dumps(dict(result, timestamp=timestamp, **revision)) + "\n")
+
+
+def _delta(current, previous, unit="s"):
+    if current is None or previous is None:
+        return ""
+    change = current - previous
+    return f" ({'+' if change >= 0 else ''}{change:.2f}{unit})"
+
+
+def print_report(results: List[Dict[str, Any]], baselines: Dict[str, Optional[Dict[str, Any]]]) -> None:
+    for result in results:
+        baseline = baselines.get(result["fixture"]) or {}
+        status = "ok" if result["success"] else f"FAILED ({result['error'] or 'incomplete'})"
+        print(f"\n{result['fixture']}: {status}")
+        if baseline:
+            print(f"  compared to {baseline.get('commit')}{' (dirty)' if baseline.get('dirty') else ''}")
+        print(f"  wall time:      {result['wall_seconds']:.2f}s"
+              f"{_delta(result['wall_seconds'], baseline.get('wall_seconds'))}")
+        print(f"  render time:    {result['render_seconds']:.2f}s in {result['renders']} renders"
+              f"{_delta(result['render_seconds'], baseline.get('render_seconds'))}")
+        print(f"  scenes:         {result['scenes_completed']}/{len(result['scenes'])} completed")
+        print(f"  attempts:       {[scene['attempts'] for scene in result['scenes']]}"
+              f" (mean to success {result['mean_attempts_to_success']})")
+        for name, seconds in result["node_seconds"].items():
+            print(f"    {name:<16} {seconds:8.2f}s x{result['node_calls'][name]}"
+                  f"{_delta(seconds, baseline.get('node_seconds', {}).get(name))}")
+        if result.get("unused_responses"):
+            print(f"  unused recorded responses: {result['unused_responses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the Manim generation pipeline")
+    parser.add_argument("--fixture", action="append", help="Fixture name to run (repeatable, default: all)")
+    parser.add_argument("--output-dir", help="Where projects are written (default: a temp dir that is removed)")
+    parser.add_argument("--compare", action="store_true", help="Show deltas against the last result from another commit")
+    parser.add_argument("--no-save", action="store_true", help="Do not append the results to results.jsonl")
+    parser.add_argument("--record", metavar="NAME", help="Record a new fixture from the real LLM and RAG")
+    parser.add_argument("--prompt", help="Prompt for --record")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log_level),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    output_dir = args.output_dir or tempfile.mkdtemp(prefix="manim-benchmark-")
+    try:
+        if args.record:
+            if not args.prompt:
+                parser.error("--record needs --prompt")
+            print(f"Recorded fixture: {record_fixture(args.record, args.prompt, output_dir)}")
+            return 0
+
+        names = args.fixture or sorted(os.path.basename(p)[:-5] for p in glob.glob(os.path.join(FIXTURES_DIR, "*.json")))
+        revision = git_revision()
+        results = []
+        for name in names:
+            print(f"Running {name}...")
+            results.append(run_fixture(load_fixture(os.path.join(FIXTURES_DIR, f"{name}.json")), output_dir))
+
+        baselines = {r["fixture"]: previous_result(r["fixture"], revision["commit"]) for r in results} if args.compare else {}
+        print_report(results, baselines)
+        if not args.no_save:
+            append_results(results, revision)
+            print(f"\nResults appended to {RESULTS_FILE}")
+
+        return 0 if all(r["success"] for r in results) else 1
+    finally:
+        if not args.output_dir:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Checkpointing of the flow's shared state.
+
+After every node's post the flow writes the shared dict, the node that just
+finished and the node that runs next to <project_dir>/checkpoint.json. A crashed
+or killed job can then be resumed at the exact node and scene index instead of
+starting over from InitializeAgent.
+"""
+import os
+import json
+import logging
+import tempfile
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger("manim_agent")
+
+CHECKPOINT_FILE = "checkpoint.json"
+CHECKPOINT_VERSION = 1
+
+# Marker for values that are left out of the checkpoint
+_SKIP = object()
+
+
+def _compact(value):
+    """Drop anything that cannot be stored as JSON (clients, events, ...)."""
+    if isinstance(value, dict):
+        compacted = {}
+        for key, item in value.items():
+            item = _compact(item)
+            if item is not _SKIP:
+                compacted[str(key)] = item
+        return compacted
+    if isinstance(value, (list, tuple)):
+        return [item for item in (_compact(v) for v in value) if item is not _SKIP]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return _SKIP
+
+
+def checkpoint_path(project_dir: str) -> str:
+    return os.path.join(project_dir, CHECKPOINT_FILE)
+
+
+def save_checkpoint(shared: Dict[str, Any], completed_node: str, next_node: Optional[str], action: Optional[str]) -> Optional[str]:
+    """Atomically write a checkpoint of shared state to the project directory.
+
+    Nothing is written until InitializeAgent has created the project directory.
+
+    Returns:
+        Path of the checkpoint file, or None if there is no project directory yet
+    """
+    project_dir = shared.get("project_dir")
+    if not project_dir:
+        return None
+
+    checkpoint = {
+        "version": CHECKPOINT_VERSION,
+        "saved_at": datetime.now().isoformat(),
+        "completed_node": completed_node,
+        "next_node": next_node,
+        "action": action,
+        "scene_index": shared.get("current_scene_index"),
+        "shared": _compact(shared),
+    }
+
+    path = checkpoint_path(project_dir)
+    # Write to a temp file in the same directory and rename so a crash never leaves a torn checkpoint
+    fd, tmp_path = tempfile.mkstemp(dir=project_dir, prefix=".checkpoint-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(checkpoint, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    logger.debug(f"Checkpoint saved after {completed_node} (next: {next_node}, scene index: {checkpoint['scene_index']})")
+    return path
+
+
+def load_checkpoint(project_dir: str) -> Optional[Dict[str, Any]]:
+    """Load the checkpoint for a project directory, or None if there is none."""
+    path = checkpoint_path(project_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        logger.warning(f"Checkpoint version {checkpoint.get('version')} does not match {CHECKPOINT_VERSION}")
+    return checkpoint
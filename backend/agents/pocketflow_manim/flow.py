@@ -1,3 +1,5 @@
+import os
+import logging
 from minLLM.minllm import Flow
 from nodes import (
     InitializeAgent, 
@@ -8,8 +10,67 @@ from nodes import (
     FixErrors,
     StitchScenes
 )
+from checkpoint import save_checkpoint, load_checkpoint
+from budget import get_budget, use_budget
+from workspace import release_workspace
+from tracing import Tracer, current_tracer, use_tracer, span
 
-def create_manim_agent_flow():
+logger = logging.getLogger("manim_agent")
+
+class CheckpointedFlow(Flow):
+    """Flow that checkpoints shared state after every node and can start at any node.
+    
+    Each run is traced; the trace files are written to the project directory.
+    The run's workspace is released when it finishes, successfully or not.
+    """
+    
+    def __init__(self, start, nodes):
+        super().__init__(start=start)
+        self.entry_node = start
+        self.nodes = nodes
+        
+    def node_name(self, node):
+        return type(node).__name__ if node is not None else None
+        
+    def run(self, shared):
+        """Run nodes from the entry node, saving a checkpoint after each post."""
+        node = self.entry_node
+        action = None
+        tracer = current_tracer() or Tracer()
+        
+        # The budget is active for code that is not given shared, like the LLM client
+        with use_tracer(tracer), use_budget(get_budget(shared)):
+            try:
+                with span("flow.run", "flow", start_node=self.node_name(node)):
+                    while node is not None:
+                        action = self._run_node(node, shared)
+                        next_node = node.successors.get(action or "default")
+                        save_checkpoint(shared, self.node_name(node), self.node_name(next_node), action)
+                        node = next_node
+            finally:
+                # Keep the trace even when the run fails, that is when it is most useful
+                if shared.get("project_dir"):
+                    shared["trace_files"] = tracer.write(shared["project_dir"])
+                # The run is over: its edit buffers are written to disk and dropped. A resumed run
+                # gets a fresh workspace under the same id that reads the files back
+                release_workspace(shared)
+            
+        return action
+        
+    def _run_node(self, node, shared):
+        """Run one node with a span around each of its phases."""
+        name = self.node_name(node)
+        with span(name, "node", scene_index=shared.get("current_scene_index", 0)):
+            with span(f"{name}.prep", "node.prep"):
+                prep_res = node.prep(shared)
+            with span(f"{name}.exec", "node.exec"):
+                exec_res = node._exec(prep_res)
+            with span(f"{name}.post", "node.post") as post_span:
+                action = node.post(shared, prep_res, exec_res)
+                post_span.set(action=str(action))
+        return action
+
+def create_manim_agent_flow(start_node=None):
     """
     Create and connect nodes to form the complete Manim animation agent flow.
     
@@ -23,6 +84,9 @@ def create_manim_agent_flow():
        e. Fix any errors
     3. Once all scenes are complete, stitch them together
     
+    Args:
+        start_node: Optional node class name to start from (used when resuming)
+    
     Returns:
         Flow: A complete Manim animation agent flow
     """
@@ -57,5 +121,40 @@ def create_manim_agent_flow():
     execute_code - "stitch_scenes" >> stitch_scenes
     plan_scene - "stitch_scenes" >> stitch_scenes
     
+    nodes = {type(node).__name__: node for node in (
+        initialize, plan_scene, research, create_code, execute_code, fix_errors, stitch_scenes
+    )}
+    start = nodes[start_node] if start_node else initialize
+    
     # Create the flow
-    return Flow(start=initialize) 
\ No newline at end of file
+    return CheckpointedFlow(start=start, nodes=nodes)
+
+def resume(project_id, output_directory="output"):
+    """
+    Resume a previously started job from its last checkpoint.
+    
+    Args:
+        project_id: The project ID created by InitializeAgent
+        output_directory: Base output directory the project lives under
+        
+    Returns:
+        dict: The restored and updated shared state
+    """
+    project_dir = os.path.join(output_directory, project_id)
+    checkpoint = load_checkpoint(project_dir)
+    if checkpoint is None:
+        raise FileNotFoundError(f"No checkpoint found for project {project_id} in {project_dir}")
+    
+    shared = checkpoint["shared"]
+    next_node = checkpoint["next_node"]
+    
+    if next_node is None:
+        logger.info(f"Project {project_id} already completed, nothing to resume")
+        return shared
+    
+    logger.info(f"Resuming project {project_id} at {next_node} (scene index {checkpoint.get('scene_index')}, "
+                f"last completed node: {checkpoint['completed_node']})")
+    
+    agent_flow = create_manim_agent_flow(start_node=next_node)
+    agent_flow.run(shared)
+    return shared
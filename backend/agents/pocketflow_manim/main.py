@@ -2,7 +2,7 @@ import logging
 import os
 import sys
 import dotenv
-from flow import create_manim_agent_flow
+from flow import create_manim_agent_flow, resume
 
 # Load environment variables from .env file
 dotenv.load_dotenv()
@@ -52,6 +52,8 @@ def main():
     output_dir = "output"
     file_name = "animation"
     log_level = "DEBUG"  # Set default to DEBUG to capture all messages
+    speculative = None
+    resume_project_id = None
     
     # Override defaults with command-line args if provided
     args = sys.argv[1:]
@@ -64,6 +66,10 @@ def main():
             file_name = args[i+1]
         elif arg == "--log-level" and i+1 < len(args):
             log_level = args[i+1]
+        elif arg == "--speculative" and i+1 < len(args):
+            speculative = int(args[i+1])
+        elif arg == "--resume" and i+1 < len(args):
+            resume_project_id = args[i+1]
     
     # Setup logging
     logger = setup_logging(log_level, output_dir)
@@ -78,11 +84,17 @@ def main():
         "output_directory": output_dir,
         "file_name": file_name
     }
+    if speculative:
+        shared["speculative"] = {"candidates": speculative}
     
     # Execute the flow
     try:
-        logger.info("Running animation generation flow")
-        agent_flow.run(shared)
+        if resume_project_id:
+            logger.info(f"Resuming animation generation flow for project {resume_project_id}")
+            shared = resume(resume_project_id, output_dir)
+        else:
+            logger.info("Running animation generation flow")
+            agent_flow.run(shared)
         
         # Log the final result
         if "final_result" in shared:
@@ -90,6 +102,9 @@ def main():
             print(f"\nAnimation generation complete!")
             print(f"Scenes created: {shared['final_result']['scene_count']}")
             print(f"Stitching script: {shared['final_result']['stitch_file']}")
+            if "speculative_stats" in shared:
+                stats = shared["speculative_stats"]
+                print(f"Speculative acceptance: {stats['accepted']}/{stats['scenes']} scenes")
         else:
             logger.warning("Flow completed but no final result was found")
         
@@ -9,12 +9,25 @@ import glob
 
 # Import our tools
 from tools.rag_tools import rag_query
-from tools.file_tools import create_file, read_file, edit_file
+from tools.file_tools import create_file, read_file, edit_file, get_workspace
+from budget import get_budget
 from tools.code_execution_tools import run_python_linter, run_manim_code
+from tools.sandbox import RenderLimits, run_sandboxed, limit_error_analysis
+from services.speculative import SpeculativeConfig, generate_first_success, record_stats
+from services.narration import timing_settings, measure_narration, timing_prompt
+from tracing import span
 
 # Setup logger
 logger = logging.getLogger("manim_agent")
 
+# Fix guidance for renders that were stopped by the sandbox
+RESOURCE_LIMIT_INSTRUCTIONS = {
+    "CPUTimeLimitExceeded": "Reduce the rendering work: lower Surface/ParametricFunction resolution, use fewer objects, and shorten run_time and wait calls.",
+    "WallClockTimeout": "Make sure the scene terminates: remove unbounded loops and updaters (always_redraw, add_updater) that never stop, and keep the total animation short.",
+    "MemoryLimitExceeded": "Reduce memory use: lower Surface resolution and mesh density, avoid creating large numbers of mobjects, and remove objects that are no longer shown.",
+    "OutputSizeLimitExceeded": "Reduce output size: shorten the scene, avoid very long waits, and do not write extra files.",
+}
+
 class InitializeAgent(Node):
     """Initialize the agent and parse the initial prompt."""
     
@@ -264,24 +277,19 @@ class CreateCode(Node):
             "research": research_results.get("response", ""),
             "file_path": file_path,
             "scene_dir": scene_dir,
-            "media_dir": media_dir
+            "media_dir": media_dir,
+            "speculative": SpeculativeConfig.from_shared(shared),
+            "render_limits": RenderLimits.from_dict(shared.get("render_limits")),
+            "narration_timing": timing_settings(shared),
+            "workspace": get_workspace(shared)
         }
-        
-    def exec(self, context):
-        """Generate the Manim code."""
-        scene = context["scene"]
-        research = context["research"]
-        file_path = context["file_path"]
-        media_dir = context["media_dir"]
-        
-        logger.info(f"Creating code for scene: {scene.get('name', '')}")
-        
+    
+    def build_prompt(self, scene, research, timing=None):
+        """Build the code generation prompt for a scene."""
         # Get the detailed plan
         detailed_plan = scene.get("detailed_plan", {})
         
-        llm = LLM()
-        params = LLMParams(
-            prompt=f"""
+        return f"""
 ### TASK
 Create a complete, executable Manim animation code.
 
@@ -292,7 +300,7 @@ Detailed plan: {detailed_plan.get('scene_plan', '')}
 
 ### RESEARCH INFORMATION
 {research}
-
+{timing_prompt(timing)}
 ### INSTRUCTIONS
 Write complete, working Manim animation code that implements the described scene. Include all necessary imports and make sure the code is fully executable.
 The code should be self-contained and define a single Manim scene class.
@@ -321,27 +329,59 @@ code: |
 narration: |
     <narration script for this scene>
 ```
-""",
-            temperature=0.2,  # Lower temperature for more precise code generation
-            max_tokens=2048   # Allow more tokens for code generation
-        )
+"""
         
-        response = llm.call(params)
+    def exec(self, context):
+        """Generate the Manim code."""
+        scene = context["scene"]
+        file_path = context["file_path"]
+        media_dir = context["media_dir"]
         
-        # Extract YAML content
-        yaml_str = response.split("```yaml")[1].split("```")[0].strip()
-        code_result = yaml.safe_load(yaml_str)
+        logger.info(f"Creating code for scene: {scene.get('name', '')}")
+        
+        # Measure the planned narration so the animation can be timed to it
+        timing = None
+        if context["narration_timing"]:
+            narration = scene.get("detailed_plan", {}).get("narration", "")
+            timing = measure_narration(narration, context["narration_timing"])
+        
+        prompt = self.build_prompt(scene, context["research"], timing)
+        code_result = None
+        speculative_stats = None
+        
+        if context["speculative"]:
+            # Race several candidates and keep the first one that renders
+            outcome = generate_first_success(prompt, file_path, context["speculative"], context["render_limits"])
+            speculative_stats = outcome["stats"]
+            if outcome["candidate"]:
+                code_result = outcome["candidate"]
+            else:
+                logger.warning("No usable speculative candidate, falling back to a single generation")
+        
+        if code_result is None:
+            llm = LLM()
+            params = LLMParams(
+                prompt=prompt,
+                temperature=0.2,  # Lower temperature for more precise code generation
+                max_tokens=2048   # Allow more tokens for code generation
+            )
+            
+            response = llm.call(params)
+            
+            # Extract YAML content
+            yaml_str = response.split("```yaml")[1].split("```")[0].strip()
+            code_result = yaml.safe_load(yaml_str)
         
         # Get code and narration
         code = code_result.get("code", "")
         narration = code_result.get("narration", "")
         
         # Create the file
-        file_result = create_file(file_path, code)
+        file_result = create_file(file_path, code, workspace=context["workspace"])
         
         # Create a narration file
         narration_path = file_path.replace(".py", "_narration.txt")
-        create_file(narration_path, narration)
+        create_file(narration_path, narration, workspace=context["workspace"])
         
         return {
             "file_path": file_path,
@@ -349,7 +389,9 @@ narration: |
             "file_result": file_result,
             "code": code,
             "narration": narration,
-            "media_dir": media_dir
+            "media_dir": media_dir,
+            "speculative_stats": speculative_stats,
+            "narration_timing": timing
         }
     
     def post(self, shared, prep_res, exec_res):
@@ -358,6 +400,17 @@ narration: |
         shared["current_scene_file"] = exec_res["file_path"]
         shared["current_scene_narration"] = exec_res["narration_path"]
         
+        # Keep the narration timing with the scene for voicing and stitching
+        if exec_res.get("narration_timing"):
+            shared["current_scene"]["narration_timing"] = exec_res["narration_timing"]
+            scene_index = shared.get("current_scene_index", 0)
+            if scene_index < len(shared.get("scenes", [])):
+                shared["scenes"][scene_index]["narration_timing"] = exec_res["narration_timing"]
+        
+        # Track how often speculative candidates are accepted
+        if exec_res.get("speculative_stats"):
+            record_stats(shared, exec_res["speculative_stats"])
+        
         logger.info(f"Created code file: {exec_res['file_path']}")
         logger.info(f"Created narration file: {exec_res['narration_path']}")
         
@@ -376,19 +429,23 @@ class ExecuteCode(Node):
         """Prepare the execution context."""
         return {
             "file_path": shared.get("current_scene_file", ""),
-            "media_dir": shared.get("media_dir", "")
+            "media_dir": shared.get("media_dir", ""),
+            "render_limits": RenderLimits.from_dict(shared.get("render_limits")),
+            "workspace": get_workspace(shared),
+            "budget": get_budget(shared)
         }
         
     def exec(self, context):
         """Run the Manim code."""
         file_path = context["file_path"]
         media_dir = context["media_dir"]
+        render_limits = context["render_limits"]
         
         logger.info(f"Executing Manim code: {file_path}")
         logger.info(f"Using media directory: {media_dir}")
         
         # First, read the file for context
-        file_content = read_file(file_path)
+        file_content = read_file(file_path, workspace=context["workspace"])
         
         # Validate the file before execution
         if not os.path.exists(file_path):
@@ -445,8 +502,10 @@ class ExecuteCode(Node):
         # Run manim with explicit media directory and quality settings
         cmd = ["python", "-m", "manim", "render"]
         
-        # Add quality flag (medium quality)
-        cmd.extend(["-qm"])
+        # Add quality flag (medium quality, low once the budget runs short)
+        budget = context["budget"]
+        low_quality = budget.render_quality("medium") == "low"
+        cmd.extend(["-ql" if low_quality else "-qm"])
         
         # Add media directory flag
         cmd.extend(["--media_dir", media_dir])
@@ -461,19 +520,22 @@ class ExecuteCode(Node):
         cmd_str = " ".join(cmd)
         logger.info(f"Executing command: {cmd_str}")
             
-        try:
-            # Run the command and capture output
-            process = subprocess.run(cmd, check=True, capture_output=True, text=True)
-            stdout = process.stdout
-            stderr = process.stderr
-            
+        # Run the render inside the resource-limited sandbox
+        render = run_sandboxed(cmd, render_limits)
+        stdout = render["stdout"]
+        stderr = render["stderr"]
+        resource_usage = render["resource_usage"]
+        # The sandbox measures the render's CPU time; wall time where rusage is unavailable
+        budget.record_render(resource_usage.get("cpu_seconds", resource_usage["wall_seconds"]))
+        
+        if render["returncode"] == 0 and not render["limit_breach"]:
             logger.info(f"STDOUT: {stdout}")
             if stderr:
                 logger.info(f"STDERR: {stderr}")
                 
             # Look for the generated video file
             video_file = None
-            video_quality = "720p30"  # This matches the medium quality (-qm flag)
+            video_quality = "480p15" if low_quality else "720p30"  # This matches the -ql/-qm flag
             
             # Construct the expected video path pattern
             if class_name:
@@ -502,44 +564,53 @@ class ExecuteCode(Node):
                     "status": "success",
                     "message": "Code executed successfully",
                     "stdout": stdout,
-                    "stderr": stderr
+                    "stderr": stderr,
+                    "resource_usage": resource_usage
                 },
                 "video_file": video_file
             }
-        except subprocess.CalledProcessError as e:
-            # Execution failed
-            logger.error(f"Execution failed: {e}")
-            logger.error(f"STDOUT: {e.stdout}")
-            logger.error(f"STDERR: {e.stderr}")
-            
+        
+        # Execution failed
+        logger.error(f"Execution failed with return code {render['returncode']}")
+        logger.error(f"STDOUT: {stdout}")
+        logger.error(f"STDERR: {stderr}")
+        
+        if render["limit_breach"]:
+            # The render hit one of its resource limits rather than raising an error
+            error_analysis = limit_error_analysis(render["limit_breach"], resource_usage, render["limits"])
+            error_analysis["error_details"] = stderr
+            message = f"Render stopped: {error_analysis['error_description']}"
+        else:
             # Analyze the error
             error_analysis = {
                 "error_type": "ExecutionError",
                 "error_description": "Failed to execute Manim code",
                 "line_number": None,
-                "error_details": e.stderr
-            }
-            
-            # Try to extract line number from error
-            error_lines = e.stderr.split("\n")
-            for line in error_lines:
-                if file_path in line and ", line " in line:
-                    try:
-                        line_num = line.split(", line ")[1].split(",")[0]
-                        error_analysis["line_number"] = int(line_num)
-                    except (IndexError, ValueError):
-                        pass
-            
-            return {
-                "file_path": file_path,
-                "execution_result": {
-                    "status": "error",
-                    "message": f"Execution failed: {e}",
-                    "raw_error": f"{e.stdout}\n{e.stderr}",
-                    "error_analysis": error_analysis
-                },
-                "file_content": content
+                "error_details": stderr
             }
+            message = f"Execution failed with return code {render['returncode']}"
+        
+        # Try to extract line number from error
+        error_lines = stderr.split("\n")
+        for line in error_lines:
+            if file_path in line and ", line " in line:
+                try:
+                    line_num = line.split(", line ")[1].split(",")[0]
+                    error_analysis["line_number"] = int(line_num)
+                except (IndexError, ValueError):
+                    pass
+        
+        return {
+            "file_path": file_path,
+            "execution_result": {
+                "status": "error",
+                "message": message,
+                "raw_error": f"{stdout}\n{stderr}",
+                "error_analysis": error_analysis,
+                "resource_usage": resource_usage
+            },
+            "file_content": content
+        }
     
     def post(self, shared, prep_res, exec_res):
         """Process execution results and determine next steps."""
@@ -581,6 +652,9 @@ class ExecuteCode(Node):
             if shared["current_scene_index"] >= len(shared["scenes"]):
                 logger.info("All scenes completed")
                 return "stitch_scenes"
+            elif prep_res["budget"].exhausted:
+                logger.warning("Budget exhausted; stitching the scenes completed so far")
+                return "stitch_scenes"
             else:
                 logger.info(f"Moving to scene {shared['current_scene_index']+1}")
                 return "plan_next_scene"
@@ -592,6 +666,20 @@ class ExecuteCode(Node):
             shared["execution_error"] = execution_result
             shared["file_content"] = exec_res.get("file_content", "")
             
+            exhausted = prep_res["budget"].exhausted_reason()
+            if exhausted:
+                # No budget left for another fix: keep the best attempt and finish with what rendered
+                logger.warning(f"Budget exhausted ({exhausted}); giving up on scene "
+                               f"{shared.get('current_scene_index', 0) + 1}")
+                shared.setdefault("failed_scenes", []).append({
+                    "index": shared.get("current_scene_index", 0),
+                    "scene": shared.get("current_scene", {}),
+                    "file_path": exec_res.get("file_path", ""),
+                    "error": execution_result.get("message", ""),
+                    "budget_exhausted": exhausted
+                })
+                return "stitch_scenes"
+            
             return "fix_errors"
 
 class FixErrors(Node):
@@ -603,7 +691,8 @@ class FixErrors(Node):
             "file_path": shared.get("current_scene_file", ""),
             "error": shared.get("execution_error", {}),
             "file_content": shared.get("file_content", ""),
-            "scene": shared.get("current_scene", {})
+            "scene": shared.get("current_scene", {}),
+            "workspace": get_workspace(shared)
         }
         
     def exec(self, context):
@@ -630,7 +719,15 @@ class FixErrors(Node):
         
         # Special handling for common errors
         special_instructions = ""
-        if error_type == "FileTypeError":
+        if error_type in RESOURCE_LIMIT_INSTRUCTIONS:
+            # The code ran but blew through its resource budget; steer the fix toward cheaper rendering
+            usage = error_analysis.get("resource_usage", {})
+            limits = error_analysis.get("limits", {})
+            special_instructions = (
+                f"Note: The render was stopped because it exceeded its resource budget "
+                f"(usage: {usage}, limits: {limits}). {RESOURCE_LIMIT_INSTRUCTIONS[error_type]}"
+            )
+        elif error_type == "FileTypeError":
             # Handle attempt to execute non-Python file
             logger.error("Detected attempt to execute non-Python file")
             if "narration" in file_path:
@@ -641,7 +738,7 @@ class FixErrors(Node):
                     logger.info(f"Switching to fix the Python file instead: {py_file_path}")
                     file_path = py_file_path
                     # Read the Python file content
-                    py_file_content = read_file(py_file_path)
+                    py_file_content = read_file(py_file_path, workspace=context["workspace"])
                     file_content = py_file_content.get("content", "")
                     special_instructions = "Note: The system mistakenly tried to execute the narration file instead of the Python file. Please ensure your code is complete and valid."
         
@@ -700,20 +797,27 @@ changes: |
         # Update the file with fixed code
         fixed_code = fix_result.get("fixed_code", "")
         
-        # Create or update the file with the fixed code
-        file_result = create_file(file_path, fixed_code)
+        # Create or update the file with the fixed code; the buffer keeps the failed attempt as
+        # the previous version, so the fix can be diffed against it without re-reading anything
+        workspace = context["workspace"]
+        previous_version = workspace.buffers[file_path].version if file_path in workspace.buffers else None
+        file_result = create_file(file_path, fixed_code, workspace=workspace)
+        diff = workspace.buffer(file_path).diff(previous_version) if previous_version is not None else ""
         
         return {
             "file_path": file_path,
             "file_result": file_result,
             "changes": fix_result.get("changes", ""),
-            "fixed_code": fixed_code
+            "fixed_code": fixed_code,
+            "diff": diff
         }
     
     def post(self, shared, prep_res, exec_res):
         """Save the fixed code and retry execution."""
         logger.info(f"Applied fixes to: {exec_res['file_path']}")
         logger.info(f"Changes made: {exec_res['changes']}")
+        if exec_res.get("diff"):
+            logger.debug(f"Fix diff:\n{exec_res['diff']}")
         
         # Reset the execution error
         shared.pop("execution_error", None)
@@ -799,7 +903,8 @@ class StitchScenes(Node):
             ]
             logger.info(f"Running ffmpeg concat command: {' '.join(concat_cmd)}")
             
-            subprocess.run(concat_cmd, check=True, capture_output=True, text=True)
+            with span("subprocess.ffmpeg", "subprocess", command=" ".join(concat_cmd)):
+                subprocess.run(concat_cmd, check=True, capture_output=True, text=True)
             logger.info(f"Successfully concatenated videos to: {final_video_path}")
             
             return {
@@ -823,7 +928,8 @@ class StitchScenes(Node):
                 ]
                 logger.info(f"Running ffmpeg re-encode command: {' '.join(reecode_cmd)}")
                 
-                subprocess.run(reecode_cmd, check=True, capture_output=True, text=True)
+                with span("subprocess.ffmpeg", "subprocess", command=" ".join(reecode_cmd)):
+                    subprocess.run(reecode_cmd, check=True, capture_output=True, text=True)
                 logger.info(f"Successfully re-encoded and concatenated videos to: {final_video_path}")
                 
                 return {
@@ -856,7 +962,9 @@ class StitchScenes(Node):
                 "status": "success",
                 "final_video_path": exec_res.get("final_video_path"),
                 "scene_count": exec_res.get("scene_count"),
-                "completed_scenes": shared.get("completed_scenes", [])
+                "completed_scenes": shared.get("completed_scenes", []),
+                "failed_scenes": shared.get("failed_scenes", []),
+                "budget": get_budget(shared).summary()
             }
         else:
             logger.warning(f"Stitching completed with status: {status}")
@@ -867,7 +975,9 @@ class StitchScenes(Node):
                 "status": status,
                 "message": exec_res.get("message"),
                 "scene_count": len(shared.get("completed_scenes", [])),
-                "completed_scenes": shared.get("completed_scenes", [])
+                "completed_scenes": shared.get("completed_scenes", []),
+                "failed_scenes": shared.get("failed_scenes", []),
+                "budget": get_budget(shared).summary()
             }
             
         return "complete" 
\ No newline at end of file
@@ -2,21 +2,41 @@ from openai import OpenAI
 import os
 import dotenv
 import logging
+import sys
+import time
 import yaml
 import re
+from tracing import span
+
+# The shared budget package lives next to this agent in backend/agents
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from budget import current_budget
 
 dotenv.load_dotenv()
 
 logger = logging.getLogger("manim_agent")
 
+# Optional replacement for the API call, used by the benchmark to replay recorded responses
+_backend = None
+
+def set_llm_backend(backend):
+    """Route every LLM.call through backend(params) -> str instead of the API.
+    
+    Pass None to go back to the real API.
+    """
+    global _backend
+    _backend = backend
+
 class LLMParams:
     def __init__(self, prompt: str, model: str = "gemini-2.5-pro-preview-03-25",
                  temperature: float = 0.5,
-                 max_tokens: int = 1024):
+                 max_tokens: int = 1024,
+                 seed: int = None):
         self.prompt = prompt
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.seed = seed
 
 class LLM:
     def __init__(self, model: str = "gemini-2.5-pro-preview-03-25"):
@@ -83,6 +103,19 @@ class LLM:
 
     def call(self, params: LLMParams) -> str:
         """Call the LLM with the given prompt."""
+        if _backend is not None:
+            with span("llm.call", "llm", model=params.model, temperature=params.temperature,
+                      max_tokens=params.max_tokens, prompt_chars=len(params.prompt),
+                      backend=type(_backend).__name__):
+                budget = current_budget()
+                if budget is not None:
+                    # Replayed responses have no usage; count the call only
+                    budget.record_llm(params.model)
+                return _backend(params)
+        return self.complete(params)
+
+    def complete(self, params: LLMParams) -> str:
+        """Send the prompt to the API and normalize the response to a YAML block."""
         try:
             # Modify the original prompt to specifically request YAML formatting
             system_message = "You MUST respond using the exact YAML format specified in the user's prompt. Never include any text outside the YAML structure. Start your response with ```yaml and end with ```."
@@ -94,16 +127,39 @@ class LLM:
                 yaml_example = yaml_format_match.group(0)
                 system_message = f"You MUST respond using the exact YAML format shown below. Your entire response should be valid YAML, starting with ```yaml and ending with ```.\n\nExample format: {yaml_example}"
             
+            # Only send a seed when one was requested
+            extra_args = {"seed": params.seed} if params.seed is not None else {}
+            
             # Format the prompt as a user message
-            response = self.client.chat.completions.create(
-                model=params.model,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": params.prompt}
-                ],
-                temperature=params.temperature,
-                max_tokens=params.max_tokens
-            )
+            with span("llm.call", "llm", model=params.model, temperature=params.temperature,
+                      max_tokens=params.max_tokens, prompt_chars=len(params.prompt)) as llm_span:
+                budget = current_budget()
+                started = time.monotonic()
+                try:
+                    response = self.client.chat.completions.create(
+                        model=params.model,
+                        messages=[
+                            {"role": "system", "content": system_message},
+                            {"role": "user", "content": params.prompt}
+                        ],
+                        temperature=params.temperature,
+                        max_tokens=params.max_tokens,
+                        **extra_args
+                    )
+                except Exception:
+                    # A failed call still counts against the budget
+                    if budget is not None:
+                        budget.record_llm(params.model, latency_seconds=time.monotonic() - started)
+                    raise
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    llm_span.set(prompt_tokens=usage.prompt_tokens or 0,
+                                 completion_tokens=usage.completion_tokens or 0)
+                if budget is not None:
+                    budget.record_llm(params.model,
+                                      prompt_tokens=(usage.prompt_tokens or 0) if usage is not None else 0,
+                                      completion_tokens=(usage.completion_tokens or 0) if usage is not None else 0,
+                                      latency_seconds=time.monotonic() - started)
             
             # Extract the response text
             response_text = response.choices[0].message.content
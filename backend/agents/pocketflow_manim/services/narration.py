@@ -0,0 +1,64 @@
+"""
+Narration timing for code generation.
+
+When enabled, the planned narration of a scene is synthesized sentence by
+sentence and the exact duration of each sentence is given to CreateCode, so
+the generated run_time and wait calls match the narration on the first render.
+The audio goes through the shared TTS cache, so it is not synthesized again
+when the narration is voiced later.
+
+Enable with shared["narration_timing"] = True (or a dict with language_code,
+voice_name, voice_gender) or MANIM_NARRATION_TIMING=1. Needs Google Cloud TTS
+credentials.
+"""
+import os
+import sys
+import logging
+from typing import Dict, Any, Optional
+
+# The shared TTS package lives next to this agent in backend/agents
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from tts import synthesize_speech, narration_timing, timing_instructions
+
+from tracing import span
+
+logger = logging.getLogger("manim_agent")
+
+
+def timing_settings(shared) -> Optional[Dict[str, Any]]:
+    """Voice settings for narration timing, or None when it is off."""
+    setting = shared.get("narration_timing")
+    if setting is None:
+        setting = os.getenv("MANIM_NARRATION_TIMING", "").lower() in ("1", "true", "yes")
+    if not setting:
+        return None
+    settings = {"language_code": "en-US", "voice_name": None, "voice_gender": "NEUTRAL"}
+    if isinstance(setting, dict):
+        settings.update({k: v for k, v in setting.items() if k in settings})
+    return settings
+
+
+def measure_narration(narration: str, settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Per-sentence durations of the narration, or None if it could not be synthesized."""
+    if not narration or not narration.strip():
+        return None
+    with span("tts.narration_timing", "tts", narration_chars=len(narration)) as timing_span:
+        try:
+            timing = narration_timing(narration, lambda sentence: synthesize_speech(sentence, **settings))
+        except Exception as e:
+            # Timing is an optimization; generate the code without it rather than fail the scene
+            logger.warning(f"Could not measure narration timing: {e}")
+            return None
+        timing_span.set(sentences=len(timing["sentences"]), total_seconds=timing["total_seconds"])
+    logger.info(f"Narration timing: {len(timing['sentences'])} sentences, {timing['total_seconds']:.2f}s")
+    return timing
+
+
+def timing_prompt(timing: Optional[Dict[str, Any]]) -> str:
+    """The NARRATION TIMING prompt section, or an empty string without timing."""
+    if not timing:
+        return ""
+    return f"""
+### NARRATION TIMING
+{timing_instructions(timing)}
+"""
@@ -0,0 +1,284 @@
+"""
+Speculative code generation for CreateCode.
+
+Instead of producing one candidate and paying a full LLM + render round trip in
+FixErrors for every failure, K candidates are requested concurrently at
+different temperatures/seeds. Each one is pre-flight checked and validated
+with a low-quality dry run in the sandbox: the scene is constructed and played,
+so its errors surface, but no video is written or encoded. The first candidate
+that passes is taken and rendered once, by ExecuteCode.
+
+When a candidate wins, candidates that have not made their LLM call are
+cancelled and running dry runs are stopped, but an LLM call already in flight
+cannot be interrupted: it runs to completion and its candidate is discarded.
+The statistics count candidates stopped before their LLM call as "cancelled"
+and those stopped after it, whose tokens are spent, as "abandoned". A candidate
+checks the cancel event under the same lock the race ends with, so both counts
+are exact.
+"""
+import os
+import re
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Set
+
+import yaml
+
+from services.llm import LLM, LLMParams
+from tools.code_execution_tools import run_python_linter
+from tools.sandbox import RenderLimits, run_sandboxed
+
+logger = logging.getLogger("manim_agent")
+
+
+@dataclass
+class SpeculativeConfig:
+    """Settings for speculative code generation."""
+    candidates: int = 3
+    budget_seconds: float = 240
+    temperatures: List[float] = field(default_factory=lambda: [0.2, 0.5, 0.8])
+    render_quality: str = "-ql"
+
+    @classmethod
+    def from_shared(cls, shared) -> Optional["SpeculativeConfig"]:
+        """Read the config from shared["speculative"] or MANIM_SPECULATIVE_CANDIDATES.
+
+        Returns None when speculative mode is off (fewer than two candidates).
+        """
+        setting = shared.get("speculative")
+        if setting is None:
+            env_candidates = os.getenv("MANIM_SPECULATIVE_CANDIDATES")
+            setting = {"candidates": int(env_candidates)} if env_candidates else None
+            if setting and os.getenv("MANIM_SPECULATIVE_BUDGET_SECONDS"):
+                setting["budget_seconds"] = float(os.getenv("MANIM_SPECULATIVE_BUDGET_SECONDS"))
+        if not setting:
+            return None
+        if setting is True:
+            setting = {}
+        elif isinstance(setting, int):
+            setting = {"candidates": setting}
+
+        config = cls(**{k: v for k, v in setting.items() if k in cls.__dataclass_fields__})
+        return config if config.candidates > 1 else None
+
+
+def _find_scene_class(code: str) -> Optional[str]:
+    """Return the first Scene subclass defined in the code, if any."""
+    match = re.search(r"^class\s+(\w+)\s*\([^)]*Scene[^)]*\)\s*:", code, re.MULTILINE)
+    return match.group(1) if match else None
+
+
+class _Race:
+    """The cancel event of a race and the candidates that made their LLM call before it ended."""
+
+    def __init__(self):
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._started: Set[int] = set()
+
+    def start(self, index: int) -> bool:
+        """Whether candidate index may make its LLM call; False once the race is over."""
+        with self._lock:
+            if self.cancel_event.is_set():
+                return False
+            self._started.add(index)
+            return True
+
+    def stop(self) -> Set[int]:
+        """End the race and return the candidates that started, i.e. spent tokens."""
+        with self._lock:
+            self.cancel_event.set()
+            return set(self._started)
+
+
+def _generate_candidate(index: int,
+                        prompt: str,
+                        config: SpeculativeConfig,
+                        candidates_dir: str,
+                        file_name: str,
+                        limits: RenderLimits,
+                        race: _Race) -> Dict[str, Any]:
+    """Generate, pre-flight and dry-run a single candidate."""
+    started = time.time()
+    temperature = config.temperatures[index % len(config.temperatures)]
+    result = {"index": index, "temperature": temperature, "status": "cancelled"}
+    cancel_event = race.cancel_event
+
+    if not race.start(index):
+        return result
+
+    response = LLM().call(LLMParams(
+        prompt=prompt,
+        temperature=temperature,
+        max_tokens=2048,
+        seed=index
+    ))
+    # From here on a stopped candidate has spent its tokens
+    result["status"] = "abandoned"
+    if cancel_event.is_set():
+        # Another candidate won while this call was in flight; skip the checks and the dry run
+        return result
+
+    try:
+        yaml_str = response.split("```yaml")[1].split("```")[0].strip()
+        code_result = yaml.safe_load(yaml_str) or {}
+    except (IndexError, yaml.YAMLError) as e:
+        result.update({"status": "rejected", "stage": "parse", "error": str(e)})
+        return result
+
+    code = code_result.get("code", "")
+    result.update({"code": code, "narration": code_result.get("narration", "")})
+    if not code:
+        result.update({"status": "rejected", "stage": "parse", "error": "No code in response"})
+        return result
+
+    candidate_dir = os.path.join(candidates_dir, f"candidate_{index}")
+    os.makedirs(candidate_dir, exist_ok=True)
+    candidate_path = os.path.join(candidate_dir, file_name)
+    with open(candidate_path, "w") as f:
+        f.write(code)
+    result["file_path"] = candidate_path
+
+    # Cheap pre-flight check before spending a render on the candidate
+    lint_result = run_python_linter(candidate_path)
+    if lint_result.get("lint_passed", True) is False:
+        result.update({"status": "rejected", "stage": "preflight", "error": lint_result.get("lint_errors", [])})
+        return result
+
+    scene_class = _find_scene_class(code)
+    if not scene_class:
+        result.update({"status": "rejected", "stage": "preflight", "error": "No Scene subclass found"})
+        return result
+
+    if cancel_event.is_set():
+        return result
+
+    # A dry run plays the scene without writing or encoding frames; ExecuteCode renders the winner
+    cmd = ["python", "-m", "manim", "render", config.render_quality, "--dry_run",
+           "--media_dir", os.path.join(candidate_dir, "media"), candidate_path, scene_class]
+    render = run_sandboxed(cmd, limits, cancel_event=cancel_event)
+    result["resource_usage"] = render["resource_usage"]
+    result["elapsed_seconds"] = round(time.time() - started, 3)
+
+    if render["cancelled"]:
+        return result
+    if render["returncode"] == 0 and not render["limit_breach"]:
+        result["status"] = "success"
+    else:
+        result.update({
+            "status": "rejected",
+            "stage": "render",
+            "error": render["limit_breach"] or render["stderr"][-2000:]
+        })
+    return result
+
+
+def generate_first_success(prompt: str,
+                           file_path: str,
+                           config: SpeculativeConfig,
+                           limits: Optional[RenderLimits] = None) -> Dict[str, Any]:
+    """Run K candidates concurrently and return the first one whose dry run succeeds.
+
+    Args:
+        prompt: The CreateCode prompt shared by every candidate
+        file_path: Final path of the scene file; candidates are written next to it
+        config: Speculative generation settings
+        limits: Sandbox limits for the dry runs
+
+    Returns:
+        Dict with the chosen candidate (or None) and the per-scene statistics
+    """
+    limits = limits or RenderLimits.from_env()
+    candidates_dir = os.path.join(os.path.dirname(file_path), "candidates")
+    file_name = os.path.basename(file_path)
+    race = _Race()
+    started = time.time()
+
+    logger.info(f"Speculatively generating {config.candidates} candidates (budget {config.budget_seconds}s)")
+
+    finished: List[Dict[str, Any]] = []
+    errors = 0
+    winner = None
+    executor = ThreadPoolExecutor(max_workers=config.candidates, thread_name_prefix="speculative")
+    # Each candidate runs in a copy of this context so its spans stay attached to the trace
+    futures = [
+        executor.submit(contextvars.copy_context().run, _generate_candidate,
+                        i, prompt, config, candidates_dir, file_name, limits, race)
+        for i in range(config.candidates)
+    ]
+    try:
+        for future in as_completed(futures, timeout=config.budget_seconds):
+            try:
+                candidate = future.result()
+            except Exception as e:
+                logger.error(f"Speculative candidate failed: {e}")
+                errors += 1
+                continue
+            finished.append(candidate)
+            logger.info(f"Candidate {candidate['index']} finished with status {candidate['status']}"
+                        f"{' at ' + candidate['stage'] if candidate.get('stage') else ''}")
+            if candidate["status"] == "success":
+                winner = candidate
+                break
+    except FuturesTimeout:
+        logger.warning(f"Speculative budget of {config.budget_seconds}s exhausted")
+    finally:
+        # Stop running dry runs and drop candidates that have not made their LLM call
+        llm_called = race.stop()
+        executor.shutdown(wait=False, cancel_futures=True)
+    # Every unfinished candidate that made its LLM call is discarded; the others never spend tokens
+    abandoned = len(llm_called) - len(finished) - errors
+
+    if winner is None:
+        # Nothing rendered cleanly; hand the most promising candidate to the normal fix loop
+        for stage in ("render", "preflight"):
+            fallback = [c for c in finished if c.get("stage") == stage and c.get("code")]
+            if fallback:
+                winner = fallback[0]
+                break
+
+    stats = {
+        "candidates": config.candidates,
+        "finished": len(finished),
+        "accepted": bool(winner and winner["status"] == "success"),
+        "accepted_index": winner["index"] if winner and winner["status"] == "success" else None,
+        "accepted_temperature": winner["temperature"] if winner and winner["status"] == "success" else None,
+        "preflight_rejections": sum(1 for c in finished if c.get("stage") in ("parse", "preflight")),
+        "render_failures": sum(1 for c in finished if c.get("stage") == "render"),
+        "cancelled": config.candidates - len(llm_called),
+        "abandoned": abandoned,
+        "errors": errors,
+        "elapsed_seconds": round(time.time() - started, 3),
+    }
+    logger.info(f"Speculative generation stats: {stats}")
+
+    return {"candidate": winner, "stats": stats}
+
+
+def record_stats(shared, scene_stats: Dict[str, Any]) -> None:
+    """Fold one scene's speculative statistics into shared["speculative_stats"]."""
+    totals = shared.setdefault("speculative_stats", {
+        "scenes": 0,
+        "accepted": 0,
+        "candidates": 0,
+        "preflight_rejections": 0,
+        "render_failures": 0,
+        "cancelled": 0,
+        "abandoned": 0,
+        "errors": 0,
+        "accepted_by_temperature": {},
+        "per_scene": []
+    })
+    totals["scenes"] += 1
+    totals["accepted"] += int(scene_stats["accepted"])
+    for key in ("candidates", "preflight_rejections", "render_failures", "cancelled", "abandoned", "errors"):
+        totals[key] += scene_stats[key]
+    if scene_stats["accepted_temperature"] is not None:
+        temperature = str(scene_stats["accepted_temperature"])
+        totals["accepted_by_temperature"][temperature] = totals["accepted_by_temperature"].get(temperature, 0) + 1
+    totals["acceptance_rate"] = round(totals["accepted"] / totals["scenes"], 3)
+    totals["per_scene"].append(scene_stats)
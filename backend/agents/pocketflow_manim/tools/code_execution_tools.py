@@ -3,11 +3,11 @@ Code execution tools for running Manim animations.
 """
 import os
 import subprocess
-import time
-import signal
 import re
 from typing import List, Dict, Any
 
+from tools.sandbox import RenderLimits, run_sandboxed, limit_error_analysis
+
 def run_python_linter(filepath: str) -> Dict[str, Any]:
     """Run a Python linter (flake8) on the given file."""
     if not os.path.exists(filepath):
@@ -149,20 +149,22 @@ def run_python_linter(filepath: str) -> Dict[str, Any]:
             "exception": str(e)
         }
 
-def run_manim_code(file_path: str = None, quality: str = "medium") -> Dict[str, Any]:
+def run_manim_code(file_path: str = None, quality: str = "medium", limits=None, workspace=None) -> Dict[str, Any]:
     """Run the specified Python file with Manim.
     
     Args:
-        file_path: Path to the Python file to execute. If None, uses the last file from file_tools
+        file_path: Path to the Python file to execute. If None, uses the workspace's current file
         quality: Quality setting for Manim rendering ("low", "medium", or "high")
+        limits: Optional RenderLimits for the sandbox (defaults to the MANIM_RENDER_* environment)
+        workspace: The flow's workspace (default: the process-wide default workspace)
         
     Returns:
         Dict with execution results and status
     """
-    # Get the current file path from the file_tools module if not provided
+    # Get the current file path from the flow's workspace if not provided
     if file_path is None:
-        from tools.file_tools import _CURRENT_FILE_PATH
-        file_path = _CURRENT_FILE_PATH
+        from workspace import get_workspace
+        file_path = (workspace or get_workspace()).current_file
     
     if file_path is None:
         return {
@@ -229,62 +231,26 @@ def run_manim_code(file_path: str = None, quality: str = "medium") -> Dict[str,
     print(f"Executing command: {' '.join(cmd)}")
     
     try:
-        # Execute command with timeout
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
-        
-        # Set timeout (2 minutes)
-        max_execution_time = 120
-        start_time = time.time()
-        
-        stdout_data = []
-        stderr_data = []
+        # Execute command inside the resource-limited sandbox
+        render = run_sandboxed(cmd, limits or RenderLimits.from_env())
         
-        while process.poll() is None:
-            # Check for timeout
-            if time.time() - start_time > max_execution_time:
-                try:
-                    os.kill(process.pid, signal.SIGTERM)
-                    time.sleep(2)
-                    if process.poll() is None:
-                        os.kill(process.pid, signal.SIGKILL)
-                except OSError:
-                    pass
-                
-                return {
-                    "status": "error",
-                    "message": f"Execution timed out after {max_execution_time} seconds",
-                    "command": " ".join(cmd)
-                }
-            
-            # Read output without blocking
-            stdout_line = process.stdout.readline()
-            if stdout_line:
-                stdout_data.append(stdout_line)
-                print(f"STDOUT: {stdout_line.strip()}")
-            
-            stderr_line = process.stderr.readline()
-            if stderr_line:
-                stderr_data.append(stderr_line)
-                print(f"STDERR: {stderr_line.strip()}")
-            
-            time.sleep(0.1)
+        stdout = render["stdout"]
+        stderr = render["stderr"]
+        return_code = render["returncode"]
         
-        # Get any remaining output
-        remaining_stdout, remaining_stderr = process.communicate()
-        if remaining_stdout:
-            stdout_data.append(remaining_stdout)
-        if remaining_stderr:
-            stderr_data.append(remaining_stderr)
-        
-        stdout = "".join(stdout_data)
-        stderr = "".join(stderr_data)
-        return_code = process.returncode
+        if render["limit_breach"]:
+            error_analysis = limit_error_analysis(render["limit_breach"], render["resource_usage"], render["limits"])
+            return {
+                "status": "error",
+                "message": f"Render stopped: {error_analysis['error_description']}",
+                "stderr": stderr,
+                "stdout": stdout,
+                "returncode": return_code,
+                "command": " ".join(cmd),
+                "raw_error": stderr,
+                "error_analysis": error_analysis,
+                "resource_usage": render["resource_usage"]
+            }
         
         # First check if the command mistakenly tried to execute a non-Python file
         if "Only Python files can be executed with Manim:" in stderr:
@@ -317,7 +283,8 @@ def run_manim_code(file_path: str = None, quality: str = "medium") -> Dict[str,
                 "message": "Code executed successfully",
                 "stdout": stdout,
                 "output_dir": output_dir,
-                "command": " ".join(cmd)
+                "command": " ".join(cmd),
+                "resource_usage": render["resource_usage"]
             }
         else:
             error_analysis = analyze_manim_error(stderr)
@@ -329,7 +296,8 @@ def run_manim_code(file_path: str = None, quality: str = "medium") -> Dict[str,
                 "returncode": return_code,
                 "error_analysis": error_analysis,
                 "command": " ".join(cmd),
-                "raw_error": stderr
+                "raw_error": stderr,
+                "resource_usage": render["resource_usage"]
             }
     
     except Exception as e:
@@ -2,29 +2,35 @@
 File tools for the robust manim agent.
 """
 import os
-from typing import List, Dict, Any
+import sys
+from typing import List, Dict, Any, Optional
 
-# Global variable to store current file path
-_CURRENT_FILE_PATH = None
+# The shared workspace package lives next to this agent in backend/agents
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from workspace import Workspace, get_workspace
 
-def create_file(filepath: str, content: str) -> Dict[str, Any]:
+# The current file belongs to the flow's workspace (get_workspace(shared)), so flows running
+# in one process never pick up each other's files. Without one, the default workspace is used.
+# File contents are kept in the workspace's line buffers: reads are served from memory and every
+# change is a version that can be diffed or rolled back. Changes are written through right away
+# because the flow renders after each one.
+
+def create_file(filepath: str, content: str, workspace: Optional[Workspace] = None) -> Dict[str, Any]:
     """Create a new file with the given content."""
-    global _CURRENT_FILE_PATH
-    
-    # Ensure the directory exists
-    os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+    workspace = workspace or get_workspace()
     
-    # Create the file
-    with open(filepath, 'w') as f:
-        f.write(content)
+    # Create the file (the buffer creates its directory)
+    buffer = workspace.open_buffer(filepath, content)
+    buffer.flush()
     
     # Set as current file
-    _CURRENT_FILE_PATH = filepath
+    workspace.file_created(filepath)
     
     result = {
         "status": "success",
         "message": f"File created at {filepath}",
-        "filepath": filepath
+        "filepath": filepath,
+        "version": buffer.version
     }
     
     # Run linter if it's a Python file
@@ -44,19 +50,19 @@ def create_file(filepath: str, content: str) -> Dict[str, Any]:
     # Return success message with optional lint results
     return result
 
-def read_file(file_path: str = None) -> Dict[str, Any]:
+def read_file(file_path: str = None, workspace: Optional[Workspace] = None) -> Dict[str, Any]:
     """Read a file with line numbers.
     
     Args:
-        file_path: Optional path to the file to read. If None, uses the last created file
+        file_path: Optional path to the file to read. If None, uses the workspace's last created file
+        workspace: The flow's workspace (default: the process-wide default workspace)
         
     Returns:
         Dict with file content and status
     """
-    global _CURRENT_FILE_PATH
-    
     # Use provided path or fall back to current path
-    filepath = file_path if file_path is not None else _CURRENT_FILE_PATH
+    workspace = workspace or get_workspace()
+    filepath = workspace.resolve(file_path)
     
     if filepath is None:
         return {
@@ -65,26 +71,20 @@ def read_file(file_path: str = None) -> Dict[str, Any]:
         }
         
     try:
-        if not os.path.exists(filepath):
-            return {
-                "status": "error",
-                "message": f"File not found: {filepath}"
-            }
-            
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
-        
-        # Format content with line numbers
-        numbered_content = ""
-        for i, line in enumerate(lines, 1):
-            numbered_content += f"{i:4d} | {line}"
+        buffer = workspace.buffer(filepath)
         
         return {
             "status": "success",
-            "content": numbered_content,
-            "raw_content": "".join(lines),
-            "line_count": len(lines),
-            "filepath": filepath
+            "content": buffer.numbered(),
+            "raw_content": buffer.text(),
+            "line_count": buffer.line_count,
+            "filepath": filepath,
+            "version": buffer.version
+        }
+    except FileNotFoundError:
+        return {
+            "status": "error",
+            "message": f"File not found: {filepath}"
         }
     except Exception as e:
         return {
@@ -92,55 +92,44 @@ def read_file(file_path: str = None) -> Dict[str, Any]:
             "message": f"Error reading file: {str(e)}"
         }
 
-def edit_file(start_line: int, end_line: int, new_content: str) -> Dict[str, Any]:
-    """Edit specific lines in the current file."""
-    global _CURRENT_FILE_PATH
+def edit_file(start_line: int, end_line: int, new_content: str,
+              workspace: Optional[Workspace] = None) -> Dict[str, Any]:
+    """Edit specific lines in the workspace's current file."""
+    workspace = workspace or get_workspace()
+    filepath = workspace.current_file
     
-    if _CURRENT_FILE_PATH is None:
+    if filepath is None:
         return {
             "status": "error",
             "message": "No file has been created yet. Use create_file first."
         }
     
-    filepath = _CURRENT_FILE_PATH
-    
     try:
-        # Read the file
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
+        buffer = workspace.buffer()
+        line_count = buffer.line_count
             
         # Validate line numbers
-        if start_line < 1 or start_line > len(lines) + 1:
+        if start_line < 1 or start_line > line_count + 1:
             return {
                 "status": "error",
-                "message": f"Invalid start_line: {start_line}. Valid range is 1 to {len(lines) + 1}."
+                "message": f"Invalid start_line: {start_line}. Valid range is 1 to {line_count + 1}."
             }
             
-        if end_line < start_line or end_line > len(lines) + 1:
+        if end_line < start_line or end_line > line_count + 1:
             return {
                 "status": "error", 
-                "message": f"Invalid end_line: {end_line}. Must be between {start_line} and {len(lines) + 1}."
+                "message": f"Invalid end_line: {end_line}. Must be between {start_line} and {line_count + 1}."
             }
-            
-        # Convert to 0-indexed
-        start_idx = start_line - 1
-        end_idx = end_line - 1
-        
-        # Ensure new content ends with newline
-        if new_content and not new_content.endswith('\n'):
-            new_content = new_content + '\n'
-        
-        # Replace the lines
-        new_lines = new_content.splitlines(True)
-        lines[start_idx:end_idx+1] = new_lines
         
-        # Write the file back
-        with open(filepath, 'w') as f:
-            f.writelines(lines)
+        # Replace the lines (a range past the last line appends) and write the file back
+        version = buffer.replace(start_line, min(end_line, line_count), new_content)
+        buffer.flush()
+        workspace.file_edited(filepath, start_line=start_line, end_line=end_line, version=version)
         
         result = {
             "status": "success", 
-            "message": f"Edited {filepath} from line {start_line} to {end_line}"
+            "message": f"Edited {filepath} from line {start_line} to {end_line}",
+            "version": version
         }
         
         # Run linter if it's a Python file
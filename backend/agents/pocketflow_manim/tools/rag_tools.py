@@ -6,6 +6,18 @@ from typing import List
 import sys
 sys.path.append("/Users/aidan/Documents/Code/Projects/animind/backend/agents")
 from rag.agent import query_rag_agent
+from tracing import span
+
+# Optional replacement for the RAG agent, used by the benchmark to replay recorded responses
+_backend = None
+
+def set_rag_backend(backend):
+    """Route every rag_query through backend(query) -> dict instead of the RAG agent.
+    
+    Pass None to go back to the RAG agent.
+    """
+    global _backend
+    _backend = backend
 
 def rag_query(query: str) -> dict:
     """Query the RAG system for help with Manim-related questions.
@@ -16,6 +28,13 @@ def rag_query(query: str) -> dict:
     Returns:
         A dictionary with the response and retrieved files from the RAG system
     """
+    if _backend is not None:
+        with span("rag.query", "rag", query=query[:200], backend=type(_backend).__name__):
+            return _backend(query)
+    return query_manim_corpus(query)
+
+def query_manim_corpus(query: str) -> dict:
+    """Query the Manim RAG corpus configured in MANIM_RAG_CORPUS."""
     try:
         # Get the Manim RAG corpus from environment variable
         manim_rag_corpus = os.environ.get("MANIM_RAG_CORPUS")
@@ -28,7 +47,10 @@ def rag_query(query: str) -> dict:
             }
         
         # Query the RAG agent with the Manim corpus
-        result = query_rag_agent(query, manim_rag_corpus)
+        with span("rag.query", "rag", query=query[:200]) as rag_span:
+            result = query_rag_agent(query, manim_rag_corpus)
+            if isinstance(result, dict):
+                rag_span.set(retrieved_files=len(result.get('retrieved_files', [])))
         
         # Check if result contains the expected keys
         if not isinstance(result, dict) or 'response' not in result:
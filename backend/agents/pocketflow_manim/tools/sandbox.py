@@ -0,0 +1,39 @@
+"""
+The shared render sandbox (backend/agents/sandbox) with each render traced
+as a subprocess span.
+"""
+import os
+import sys
+import threading
+from typing import List, Dict, Any, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# Re-exported for the nodes and tools
+from sandbox import (
+    CPU_LIMIT_EXCEEDED,
+    MEMORY_LIMIT_EXCEEDED,
+    FILE_SIZE_LIMIT_EXCEEDED,
+    WALL_TIMEOUT,
+    CANCELLED,
+    LIMIT_ERROR_DESCRIPTIONS,
+    RenderLimits,
+    classify_breach,
+    limit_error_analysis,
+)
+from sandbox import run_sandboxed as _run_sandboxed
+
+from tracing import span
+
+
+def run_sandboxed(cmd: List[str],
+                  limits: Optional[RenderLimits] = None,
+                  cwd: Optional[str] = None,
+                  cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """Run a command under the render sandbox, see sandbox.run_sandboxed."""
+    limits = limits or RenderLimits.from_env()
+    with span("subprocess.render", "subprocess", command=" ".join(cmd)) as render_span:
+        result = _run_sandboxed(cmd, limits, cwd, cancel_event)
+        render_span.set(returncode=result["returncode"],
+                        limit_breach=result["limit_breach"] or "",
+                        **result["resource_usage"])
+    return result
@@ -0,0 +1,204 @@
+"""
+Lightweight tracing for the PocketFlow pipeline.
+
+Spans are recorded for the prep, exec and post phase of every node, every LLM
+call, every RAG query and every subprocess (renders, ffmpeg). When a run ends
+the spans are written to the project directory both as a Chrome trace
+(open in chrome://tracing or https://ui.perfetto.dev) and as OTLP/JSON, which
+OpenTelemetry collectors and viewers can import.
+
+The active tracer and parent span live in context variables, so concurrent
+flows in one process keep separate traces. Code that fans work out to threads
+should run it with contextvars.copy_context().run to keep spans attached.
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger("manim_agent")
+
+SERVICE_NAME = "pocketflow_manim"
+
+_current_tracer = contextvars.ContextVar("manim_tracer", default=None)
+_current_span = contextvars.ContextVar("manim_span", default=None)
+
+
+class Span:
+    """A single timed operation."""
+
+    def __init__(self, name: str, category: str, trace_id: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.thread_id = threading.get_ident()
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        """Add attributes once they are known (token counts, exit codes, ...)."""
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+
+class _NoopSpan:
+    """Returned when tracing is not active so call sites never need to check."""
+
+    def set(self, **attributes):
+        pass
+
+
+class Tracer:
+    """Collects the spans of one flow run."""
+
+    def __init__(self, service_name: str = SERVICE_NAME):
+        self.service_name = service_name
+        self.trace_id = uuid.uuid4().hex
+        self.started_at = time.time()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def _record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Spans in the Chrome trace event format (complete "X" events)."""
+        pid = os.getpid()
+        events = []
+        for s in self.spans:
+            args = dict(s.attributes)
+            if s.error:
+                args["error"] = s.error
+            events.append({
+                "name": s.name,
+                "cat": s.category,
+                "ph": "X",
+                "ts": s.start_ns / 1000,
+                "dur": ((s.end_ns or s.start_ns) - s.start_ns) / 1000,
+                "pid": pid,
+                "tid": s.thread_id,
+                "args": args,
+            })
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"service": self.service_name, "trace_id": self.trace_id},
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Spans in the OTLP/JSON export format."""
+        spans = []
+        for s in self.spans:
+            otlp_span = {
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                "attributes": [_otlp_attribute("category", s.category)] +
+                              [_otlp_attribute(k, v) for k, v in s.attributes.items()],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            }
+            if s.parent_id:
+                otlp_span["parentSpanId"] = s.parent_id
+            spans.append(otlp_span)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{"scope": {"name": f"{self.service_name}.tracing"}, "spans": spans}],
+            }]
+        }
+
+    def write(self, directory: str) -> Dict[str, str]:
+        """Write the Chrome and OTLP trace files for this run under directory/traces."""
+        traces_dir = os.path.join(directory, "traces")
+        os.makedirs(traces_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        paths = {
+            "chrome": os.path.join(traces_dir, f"trace-{stamp}-{self.trace_id[:8]}.json"),
+            "otlp": os.path.join(traces_dir, f"trace-{stamp}-{self.trace_id[:8]}.otlp.json"),
+        }
+        with self._lock:
+            chrome, otlp = self.to_chrome_trace(), self.to_otlp()
+        with open(paths["chrome"], "w") as f:
+            json.dump(chrome, f)
+        with open(paths["otlp"], "w") as f:
+            json.dump(otlp, f)
+        logger.info(f"Wrote {len(chrome['traceEvents'])} trace spans to {traces_dir}")
+        return paths
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _current_tracer.get()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def enclosing_span(category: str) -> Optional[Span]:
+    """The innermost active span of the given category (e.g. the running node)."""
+    s = _current_span.get()
+    while s is not None and s.category != category:
+        s = s.parent
+    return s
+
+
+@contextmanager
+def use_tracer(tracer: Tracer):
+    """Make tracer the active tracer for the enclosed block."""
+    token = _current_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current_tracer.reset(token)
+
+
+@contextmanager
+def span(name: str, category: str = "internal", **attributes):
+    """Time the enclosed block as a span of the active tracer (no-op without one)."""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        yield _NoopSpan()
+        return
+
+    parent = _current_span.get()
+    s = Span(name, category, tracer.trace_id, parent, attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current_span.reset(token)
+        tracer._record(s)
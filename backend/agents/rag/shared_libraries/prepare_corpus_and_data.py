@@ -17,7 +17,7 @@ import vertexai
 from vertexai.preview import rag
 import os
 from dotenv import load_dotenv, set_key
-import requests
+import httpx
 import tempfile
 
 # Load environment variables from .env file
@@ -75,12 +75,13 @@ def create_or_get_corpus():
 def download_pdf_from_url(url, output_path):
   """Downloads a PDF file from the specified URL."""
   print(f"Downloading PDF from {url}...")
-  response = requests.get(url, stream=True)
-  response.raise_for_status()  # Raise an exception for HTTP errors
-  
-  with open(output_path, 'wb') as f:
-    for chunk in response.iter_content(chunk_size=8192):
-      f.write(chunk)
+  # httpx does not follow redirects by default, unlike requests
+  with httpx.stream("GET", url, follow_redirects=True, timeout=60) as response:
+    response.raise_for_status()  # Raise an exception for HTTP errors
+    
+    with open(output_path, 'wb') as f:
+      for chunk in response.iter_bytes(chunk_size=8192):
+        f.write(chunk)
   
   print(f"PDF downloaded successfully to {output_path}")
   return output_path
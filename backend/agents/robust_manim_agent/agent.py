@@ -5,10 +5,12 @@ This agent focuses on generating high-quality Manim animations through an iterat
 improvement loop that continues until the code is working correctly.
 """
 import os
-from typing import Dict, Any
-from google.adk.tools import FunctionTool
+from typing import Dict, Any, Optional
 from google.adk.agents import LlmAgent, SequentialAgent, LoopAgent
+from budget import bind_budget, current_budget
+from budget.callbacks import budget_before_model, budget_after_model
 from .tools import get_all_tools
+from .stages import ExecutionStage, SuccessGate
 
 # --- Constants ---
 APP_NAME = "robust_manim_agent"
@@ -20,18 +22,6 @@ GEMINI_MODEL = "gemini-2.5-pro-preview-03-25"  # Using a high-capability model
 STATE_CURRENT_CODE = "current_code"
 STATE_EXECUTION_RESULT = "execution_result"
 STATE_CRITICISM = "criticism"
-# Define the exact phrase the Critic should use to signal completion
-COMPLETION_PHRASE = "The Manim animation is working correctly."
-
-# --- Tool Definition ---
-def exit_loop():
-    """Call this function ONLY when the code is working correctly, signaling the iterative process should end."""
-    print(f"  [Tool Call] exit_loop triggered")
-    # Create a result with escalate flag that the agent can interpret
-    return {"escalate": True}
-
-# Create the exit loop tool
-exit_loop_tool = FunctionTool(func=exit_loop)
 
 # --- Agent Definitions ---
 
@@ -51,35 +41,27 @@ initial_generator_agent = LlmAgent(
     The code should be complete and ready to run with the Manim library.
     """,
     description="Generates the initial Manim code based on the user's prompt.",
-    output_key=STATE_CURRENT_CODE
+    output_key=STATE_CURRENT_CODE,
+    # Every model call is accounted in the job's budget and skipped once it is spent
+    before_model_callback=budget_before_model,
+    after_model_callback=budget_after_model
 )
 
-# STEP 2a: Execution Agent (Inside the Refinement Loop)
-execution_agent = LlmAgent(
+# STEP 2a: Execution Stage (Inside the Refinement Loop)
+# Writing and rendering the code is mechanical, so no model call is made for it
+execution_agent = ExecutionStage(
     name="ExecutionAgent",
-    model=GEMINI_MODEL,
-    instruction="""You are a Manim Code Executor responsible for setting up and running Manim code.
-
-    Your current Manim code is:
-    ```python
-    {{current_code}}
-    ```
-
-    Execute the following steps:
-    1. Create a Python file with this code using the create_file tool. Use a suitable filename (e.g., 'animation.py').
-    2. The file_tools will automatically execute the code and include the execution results in its response.
-    3. Return the complete tool response, especially the execution_result section.
+    description="Writes the current code to a file, renders it with Manim and stores the execution result."
+)
 
-    Note: You DO NOT need to call the run_manim_code tool separately as execution happens automatically.
-    
-    Output ONLY the execution results from the create_file tool response. Do not add explanations.
-    """,
-    description="Creates a file with the current code, which triggers automatic execution, and outputs the results.",
-    tools=get_all_tools(),
-    output_key=STATE_EXECUTION_RESULT
+# STEP 2b: Success Gate (Inside the Refinement Loop)
+# A successful render ends the loop without asking the critic and refiner models
+success_gate = SuccessGate(
+    name="SuccessGate",
+    description="Exits the refinement loop when the execution result reports success."
 )
 
-# STEP 2b: Critic Agent (Inside the Refinement Loop)
+# STEP 2c: Critic Agent (Inside the Refinement Loop)
 critic_agent = LlmAgent(
     name="CriticAgent",
     model=GEMINI_MODEL,
@@ -95,28 +77,26 @@ critic_agent = LlmAgent(
     {{{{execution_result}}}}
     ```
     
-    Analyze the execution results:
-    
-    IF the execution_result shows successful execution (contains "status": "success" in the execution_result section):
-    Respond *exactly* with the phrase "{COMPLETION_PHRASE}" and nothing else.
-    
-    ELSE IF there were errors or issues:
-    Provide specific, actionable feedback on what needs to be fixed. Be precise about:
+    The code failed to render. Analyze the execution results and provide specific, actionable
+    feedback on what needs to be fixed. Be precise about:
     - Line numbers with errors
     - What specifically is wrong
     - How to fix the issues
     
-    Output ONLY your critique OR the exact completion phrase. No introductions or explanations.
+    Output ONLY your critique. No introductions or explanations.
     """,
-    description="Reviews the execution results, providing critique if there are errors, otherwise signals completion.",
-    output_key=STATE_CRITICISM
+    description="Reviews failed execution results and provides a critique of the errors.",
+    output_key=STATE_CRITICISM,
+    # Every model call is accounted in the job's budget and skipped once it is spent
+    before_model_callback=budget_before_model,
+    after_model_callback=budget_after_model
 )
 
-# STEP 2c: Refiner/Exiter Agent (Inside the Refinement Loop)
+# STEP 2d: Refiner Agent (Inside the Refinement Loop)
 refiner_agent = LlmAgent(
     name="RefinerAgent",
     model=GEMINI_MODEL,
-    instruction=f"""You are a Manim Code Refiner responsible for improving code based on feedback OR exiting the process.
+    instruction=f"""You are a Manim Code Refiner responsible for improving code based on feedback.
     
     Current Manim Code:
     ```python
@@ -128,10 +108,6 @@ refiner_agent = LlmAgent(
     {{{{criticism}}}}
     ```
     
-    IF the critique is *exactly* "{COMPLETION_PHRASE}":
-    You MUST call the 'exit_loop' function. Do not output any text.
-    
-    ELSE (the critique contains actionable feedback):
     Improve the code by applying the suggestions. Output ONLY the complete, improved code.
     
     For improvements:
@@ -139,20 +115,22 @@ refiner_agent = LlmAgent(
     2. Fix all identified issues
     3. Keep the original intent and structure of the animation
     4. Ensure the code is complete and runnable
-    
-    Either output the complete improved code OR call the exit_loop function.
     """,
-    description="Refines the code based on critique, or calls exit_loop if execution was successful.",
-    tools=[exit_loop_tool, *get_all_tools()],
-    output_key=STATE_CURRENT_CODE
+    description="Refines the code based on the critique.",
+    tools=get_all_tools(),
+    output_key=STATE_CURRENT_CODE,
+    # Every model call is accounted in the job's budget and skipped once it is spent
+    before_model_callback=budget_before_model,
+    after_model_callback=budget_after_model
 )
 
 # STEP 2: Refinement Loop Agent
 refinement_loop = LoopAgent(
     name="RefinementLoop",
-    # Agent order: 1. Execute Code, 2. Critique Results, 3. Refine/Exit
+    # Agent order: 1. Execute Code, 2. Exit on success, 3. Critique Results, 4. Refine
     sub_agents=[
         execution_agent,
+        success_gate,
         critic_agent,
         refiner_agent,
     ],
@@ -171,28 +149,37 @@ root_agent = SequentialAgent(
 )
 
 # Helper function to run the agent with a user prompt
-def generate_manim_animation(prompt: str) -> Dict[str, Any]:
+def generate_manim_animation(prompt: str, output_dir: Optional[str] = None) -> Dict[str, Any]:
     """Generate a Manim animation from a user prompt.
     
     Args:
         prompt: User's description of the desired animation
+        output_dir: Directory for the scene file and its renders (default: a per-session directory under ROBUST_MANIM_OUTPUT_DIR)
+        
+    The run reports into the active budget (see budget.use_budget), e.g. the one of the
+    video this animation is a scene of, or into a new budget with the configured caps.
         
     Returns:
-        Dictionary with the final code and execution results
+        Dictionary with the final code, execution results, rendered video path and budget usage
     """
     from google.adk import Runner
     from google.adk.sessions import InMemorySessionService
+    from google.genai import types
     
     # Create session service and session
     session_service = InMemorySessionService()
     session_id = f"{SESSION_ID_BASE}_{hash(prompt)}"
-    session = session_service.create_session(
+    # The execution stage writes and renders the code here
+    state = {"output_dir": output_dir} if output_dir else {}
+    if current_budget() is not None:
+        bind_budget(state, current_budget())
+    session_service.create_session(
         app_name=APP_NAME,
         user_id=USER_ID,
-        session_id=session_id
+        session_id=session_id,
+        state=state or None
     )
     
-    
     # Create runner and run the agent
     runner = Runner(
         agent=root_agent,
@@ -200,12 +187,26 @@ def generate_manim_animation(prompt: str) -> Dict[str, Any]:
         session_service=session_service
     )
     
-    # Run the agent
-    runner.run(user_id=USER_ID, session_id=session_id, new_message={"text": prompt})
+    # Run the agent; the pipeline only advances while its events are consumed
+    message = types.Content(role="user", parts=[types.Part(text=prompt)])
+    try:
+        for _ in runner.run(user_id=USER_ID, session_id=session_id, new_message=message):
+            pass
+    finally:
+        # create_session returns a copy, the stages' state deltas (workspace_id included)
+        # are only in the stored session
+        session = session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+        
+        # The session is over, also when it failed; its files stay on disk
+        from workspace import release_workspace
+        release_workspace(session.state)
     
     # Return the final state
+    execution_result = session.state.get(STATE_EXECUTION_RESULT) or {}
     return {
         "code": session.state.get(STATE_CURRENT_CODE, ""),
-        "execution_result": session.state.get(STATE_EXECUTION_RESULT, ""),
-        "iterations": session.state.get("iterations", 0)
+        "execution_result": execution_result,
+        "video_path": execution_result.get("video_path") if isinstance(execution_result, dict) else None,
+        "iterations": session.state.get("iterations", 0),
+        "budget": session.state.get("budget")
     } 
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Non-LLM steps of the robust manim agent's refinement loop.
+
+Writing the current code to a file and rendering it is mechanical, so it runs
+as a plain ADK agent instead of an LlmAgent that re-sends the whole code just
+to call create_file: the code is written, rendered with Manim, and the
+structured execution result is stored in the session state directly. The
+success gate reads that result and ends the loop on a successful render, so
+the critic and refiner models only run when there is an error to analyze.
+
+Both stages also end the loop when the job's budget is exhausted, keeping the
+last rendered attempt as the result; renders drop to low quality as the
+budget runs short.
+"""
+import os
+import re
+import time
+import asyncio
+import logging
+from typing import AsyncGenerator, Dict, Any
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from budget import get_budget
+from workspace import get_workspace
+from .tools import render_manim_file
+
+logger = logging.getLogger(__name__)
+
+# Without an output_dir in the state, each session writes to its own workspace under this directory
+DEFAULT_OUTPUT_DIR = os.getenv("ROBUST_MANIM_OUTPUT_DIR", "robust_manim_output")
+MAX_OUTPUT_CHARS = 4000
+_CODE_FENCE = re.compile(r"```(?:python|py)?\s*\n(.*?)```", re.DOTALL)
+
+
+def extract_code(text: str) -> str:
+    """The Python code in a model response, without Markdown fences."""
+    match = _CODE_FENCE.search(text)
+    return (match.group(1) if match else text).strip() + "\n"
+
+
+def _summary(result: Dict[str, Any]) -> str:
+    if result["status"] == "success":
+        return f"Execution succeeded: {result.get('video_path') or result.get('output_dir')}"
+    lines = [f"Execution failed: {result['message']}"]
+    analysis = result.get("error_analysis") or {}
+    if analysis.get("error_type"):
+        lines.append(f"{analysis['error_type']} at line {analysis.get('line_number')}")
+    if result.get("stderr"):
+        lines.append(result["stderr"])
+    return "\n".join(lines)
+
+
+class ExecutionStage(BaseAgent):
+    """Writes the current code to the session's scene file, renders it and stores the result."""
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        state = ctx.session.state
+        budget = get_budget(state)
+        reason = budget.exhausted_reason()
+        if reason:
+            # No more attempts: keep the last rendered code (the refiner may have been cut off) and stop
+            logger.warning(f"Budget exhausted ({reason}), returning the last rendered attempt")
+            yield Event(
+                author=self.name,
+                invocation_id=ctx.invocation_id,
+                content=types.Content(role="model", parts=[types.Part(text=f"Stopped: budget exhausted ({reason})")]),
+                actions=EventActions(
+                    state_delta={"current_code": state.get("rendered_code", state.get("current_code", "")),
+                                 "budget": budget.summary()},
+                    escalate=True,
+                ),
+            )
+            return
+
+        iteration = state.get("iterations", 0) + 1
+        workspace = get_workspace(state)
+        filepath = os.path.join(state.get("output_dir") or os.path.join(DEFAULT_OUTPUT_DIR, workspace.id),
+                                "animation.py")
+
+        # Each iteration is a new version of the file's buffer, so attempts can be diffed and rolled back
+        code = state.get("current_code", "")
+        buffer = workspace.open_buffer(filepath, extract_code(code))
+        buffer.flush()
+        workspace.file_created(filepath)
+
+        # The render blocks for up to its wall clock limit, keep the event loop free meanwhile
+        quality = budget.render_quality("medium")
+        started = time.monotonic()
+        result = await asyncio.to_thread(render_manim_file, filepath, quality)
+        budget.record_render(time.monotonic() - started)
+        result["filepath"] = filepath
+        result["quality"] = quality
+        result["version"] = buffer.version
+        workspace.render_finished(result)
+        # Only the end of Manim's output matters to the critic, and it is sent with every prompt
+        for stream in ("stdout", "stderr"):
+            if len(result.get(stream, "")) > MAX_OUTPUT_CHARS:
+                result[stream] = result[stream][-MAX_OUTPUT_CHARS:]
+        logger.info(f"Iteration {iteration}: {result['status']} ({filepath})")
+
+        yield Event(
+            author=self.name,
+            invocation_id=ctx.invocation_id,
+            content=types.Content(role="model", parts=[types.Part(text=_summary(result))]),
+            actions=EventActions(state_delta={
+                "execution_result": result,
+                "iterations": iteration,
+                "rendered_code": code,
+                "workspace_id": workspace.id,
+                "budget_id": budget.job_id,
+                "budget": budget.summary(),
+            }),
+        )
+
+
+class SuccessGate(BaseAgent):
+    """Ends the refinement loop when the last execution succeeded or the budget is spent, without calling a model."""
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        result = ctx.session.state.get("execution_result")
+        succeeded = isinstance(result, dict) and result.get("status") == "success"
+        exhausted = get_budget(ctx.session.state).exhausted_reason()
+        if succeeded or exhausted:
+            if succeeded:
+                logger.info(f"Execution succeeded after {ctx.session.state.get('iterations', 0)} iteration(s)")
+            else:
+                logger.warning(f"Budget exhausted ({exhausted}), not retrying")
+            # Escalating stops the LoopAgent before the critic and refiner run
+            yield Event(
+                author=self.name,
+                invocation_id=ctx.invocation_id,
+                actions=EventActions(escalate=True),
+            )
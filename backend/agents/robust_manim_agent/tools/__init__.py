@@ -6,7 +6,7 @@ from typing import List
 from google.adk.tools import FunctionTool
 
 from .file_tools import get_tools as get_file_tools
-from .code_execution_tools import get_tools as get_code_execution_tools, run_manim_code
+from .code_execution_tools import get_tools as get_code_execution_tools, run_manim_code, render_manim_file
 from .rag_tools import get_tools as get_rag_tools
 
 def get_all_tools() -> List[FunctionTool]:
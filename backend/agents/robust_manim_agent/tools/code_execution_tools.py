@@ -2,26 +2,44 @@
 Code execution tools for running Manim animations.
 """
 import os
-import subprocess
+import glob
 import time
-import signal
 import re
-from typing import List, Dict, Any
-from google.adk.tools import FunctionTool
+from typing import List, Dict, Any, Optional
+from google.adk.tools import FunctionTool, ToolContext
+from budget import get_budget
+from sandbox import RenderLimits, run_sandboxed, limit_error_analysis
+from workspace import get_workspace
 
-def run_manim_code(quality: str = "medium") -> Dict[str, Any]:
-    """Run the current Python file with Manim."""
-    # Get the current file path from the file_tools module
-    from .file_tools import _CURRENT_FILE_PATH
+def run_manim_code(tool_context: ToolContext, quality: str = "medium") -> Dict[str, Any]:
+    """Run the session's current Python file with Manim."""
+    workspace = get_workspace(tool_context.state)
     
-    if _CURRENT_FILE_PATH is None:
+    if workspace.current_file is None:
         return {
             "status": "error",
             "message": "No file has been created yet. Use create_file first."
         }
-        
-    filepath = _CURRENT_FILE_PATH
     
+    budget = get_budget(tool_context.state)
+    started = time.monotonic()
+    result = render_manim_file(workspace.current_file, budget.render_quality(quality), media_dir=workspace.media_dir)
+    budget.record_render(time.monotonic() - started)
+    workspace.render_finished(result)
+    return result
+
+def find_rendered_video(output_dir: str) -> Optional[str]:
+    """Return the most recently rendered video under a Manim media directory."""
+    videos = glob.glob(os.path.join(output_dir, "videos", "**", "*.mp4"), recursive=True)
+    # Partial movie files are the per-animation pieces, not the scene video
+    videos = [v for v in videos if "partial_movie_files" not in v]
+    return max(videos, key=os.path.getmtime) if videos else None
+
+def render_manim_file(filepath: str, quality: str = "medium", media_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Render a Python file with Manim and return the structured execution result.
+    
+    The media goes to media_dir, or to a media directory next to the file by default.
+    """
     if not os.path.exists(filepath):
         return {
             "status": "error",
@@ -35,7 +53,7 @@ def run_manim_code(quality: str = "medium") -> Dict[str, Any]:
         }
     
     # Prepare the output directory
-    output_dir = os.path.join(os.path.dirname(os.path.abspath(filepath)), "media")
+    output_dir = media_dir or os.path.join(os.path.dirname(os.path.abspath(filepath)), "media")
     os.makedirs(output_dir, exist_ok=True)
     
     # Build the command
@@ -58,66 +76,33 @@ def run_manim_code(quality: str = "medium") -> Dict[str, Any]:
     cmd.append(filepath)
     
     try:
-        # Execute command with timeout
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
-        
-        # Set timeout (2 minutes)
-        max_execution_time = 120
-        start_time = time.time()
-        
-        stdout_data = []
-        stderr_data = []
-        
-        while process.poll() is None:
-            # Check for timeout
-            if time.time() - start_time > max_execution_time:
-                try:
-                    os.kill(process.pid, signal.SIGTERM)
-                    time.sleep(2)
-                    if process.poll() is None:
-                        os.kill(process.pid, signal.SIGKILL)
-                except OSError:
-                    pass
-                
-                return {
-                    "status": "error",
-                    "message": f"Execution timed out after {max_execution_time} seconds"
-                }
-            
-            # Read output without blocking
-            stdout_line = process.stdout.readline()
-            if stdout_line:
-                stdout_data.append(stdout_line)
-            
-            stderr_line = process.stderr.readline()
-            if stderr_line:
-                stderr_data.append(stderr_line)
-            
-            time.sleep(0.1)
+        # Render in the resource-limited sandbox
+        render = run_sandboxed(cmd, RenderLimits.from_env())
         
-        # Get any remaining output
-        remaining_stdout, remaining_stderr = process.communicate()
-        if remaining_stdout:
-            stdout_data.append(remaining_stdout)
-        if remaining_stderr:
-            stderr_data.append(remaining_stderr)
+        stdout = render["stdout"]
+        stderr = render["stderr"]
+        return_code = render["returncode"]
         
-        stdout = "".join(stdout_data)
-        stderr = "".join(stderr_data)
-        return_code = process.returncode
+        if render["limit_breach"]:
+            error_analysis = limit_error_analysis(render["limit_breach"], render["resource_usage"], render["limits"])
+            return {
+                "status": "error",
+                "message": f"Render stopped: {error_analysis['error_description']}",
+                "stderr": stderr,
+                "stdout": stdout,
+                "returncode": return_code,
+                "error_analysis": error_analysis,
+                "resource_usage": render["resource_usage"]
+            }
         
         if return_code == 0:
             return {
                 "status": "success",
                 "message": "Code executed successfully",
                 "stdout": stdout,
-                "output_dir": output_dir
+                "output_dir": output_dir,
+                "video_path": find_rendered_video(output_dir),
+                "resource_usage": render["resource_usage"]
             }
         else:
             error_analysis = analyze_manim_error(stderr)
@@ -127,7 +112,8 @@ def run_manim_code(quality: str = "medium") -> Dict[str, Any]:
                 "stderr": stderr,
                 "stdout": stdout,
                 "returncode": return_code,
-                "error_analysis": error_analysis
+                "error_analysis": error_analysis,
+                "resource_usage": render["resource_usage"]
             }
     
     except Exception as e:
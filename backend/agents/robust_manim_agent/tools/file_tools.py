@@ -3,30 +3,27 @@ File tools for the robust manim agent.
 """
 import os
 from typing import List, Dict, Any
-from google.adk.tools import FunctionTool
+from google.adk.tools import FunctionTool, ToolContext
+from workspace import get_workspace
 
-# Global variable to store current file path
-_CURRENT_FILE_PATH = None
+# The current file lives in the session's workspace, so concurrent sessions keep their own.
+# Its content is kept in the workspace's line buffer and written to disk before each render.
 
-def create_file(filepath: str, content: str) -> Dict[str, Any]:
+def create_file(filepath: str, content: str, tool_context: ToolContext) -> Dict[str, Any]:
     """Create a new file with the given content."""
-    global _CURRENT_FILE_PATH
+    workspace = get_workspace(tool_context.state)
     
-    # Ensure the directory exists
-    os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
-    
-    # Create the file
-    with open(filepath, 'w') as f:
-        f.write(content)
+    # Create the file (the buffer creates its directory)
+    workspace.open_buffer(filepath, content).flush()
     
     # Set as current file
-    _CURRENT_FILE_PATH = filepath
+    workspace.file_created(filepath)
     
     # Automatically run Manim code if it's a Python file
     execution_result = {}
     if filepath.endswith('.py'):
         from .code_execution_tools import run_manim_code
-        execution_result = run_manim_code()
+        execution_result = run_manim_code(tool_context)
     
     # Return success message with execution results if available
     result = {
@@ -41,32 +38,26 @@ def create_file(filepath: str, content: str) -> Dict[str, Any]:
     
     return result
 
-def read_file() -> Dict[str, Any]:
+def read_file(tool_context: ToolContext) -> Dict[str, Any]:
     """Read the current file with line numbers."""
-    global _CURRENT_FILE_PATH
+    workspace = get_workspace(tool_context.state)
+    filepath = workspace.current_file
     
-    if _CURRENT_FILE_PATH is None:
+    if filepath is None:
         return {
             "status": "error",
             "message": "No file has been created yet. Use create_file first."
         }
-        
-    filepath = _CURRENT_FILE_PATH
     
     try:
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
-        
-        # Format content with line numbers
-        numbered_content = ""
-        for i, line in enumerate(lines, 1):
-            numbered_content += f"{i:4d} | {line}"
+        buffer = workspace.buffer()
         
         return {
             "status": "success",
-            "content": numbered_content,
-            "line_count": len(lines),
-            "filepath": filepath
+            "content": buffer.numbered(),
+            "line_count": buffer.line_count,
+            "filepath": filepath,
+            "version": buffer.version
         }
     except Exception as e:
         return {
@@ -74,62 +65,50 @@ def read_file() -> Dict[str, Any]:
             "message": f"Error reading file: {str(e)}"
         }
 
-def edit_file(start_line: int, end_line: int, new_content: str) -> Dict[str, Any]:
+def edit_file(start_line: int, end_line: int, new_content: str, tool_context: ToolContext) -> Dict[str, Any]:
     """Edit specific lines in the current file."""
-    global _CURRENT_FILE_PATH
+    workspace = get_workspace(tool_context.state)
+    filepath = workspace.current_file
     
-    if _CURRENT_FILE_PATH is None:
+    if filepath is None:
         return {
             "status": "error",
             "message": "No file has been created yet. Use create_file first."
         }
     
-    filepath = _CURRENT_FILE_PATH
-    
     try:
-        # Read the file
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
+        buffer = workspace.buffer()
+        line_count = buffer.line_count
             
         # Validate line numbers
-        if start_line < 1 or start_line > len(lines) + 1:
+        if start_line < 1 or start_line > line_count + 1:
             return {
                 "status": "error",
-                "message": f"Invalid start_line: {start_line}. Valid range is 1 to {len(lines) + 1}."
+                "message": f"Invalid start_line: {start_line}. Valid range is 1 to {line_count + 1}."
             }
             
-        if end_line < start_line or end_line > len(lines) + 1:
+        if end_line < start_line or end_line > line_count + 1:
             return {
                 "status": "error", 
-                "message": f"Invalid end_line: {end_line}. Must be between {start_line} and {len(lines) + 1}."
+                "message": f"Invalid end_line: {end_line}. Must be between {start_line} and {line_count + 1}."
             }
-            
-        # Convert to 0-indexed
-        start_idx = start_line - 1
-        end_idx = end_line - 1
-        
-        # Ensure new content ends with newline
-        if new_content and not new_content.endswith('\n'):
-            new_content = new_content + '\n'
-        
-        # Replace the lines
-        new_lines = new_content.splitlines(True)
-        lines[start_idx:end_idx+1] = new_lines
         
-        # Write the file back
-        with open(filepath, 'w') as f:
-            f.writelines(lines)
+        # Replace the lines (a range past the last line appends) and write the file for the render
+        version = buffer.replace(start_line, min(end_line, line_count), new_content)
+        buffer.flush()
+        workspace.file_edited(filepath, start_line=start_line, end_line=end_line, version=version)
         
         # Automatically run Manim code if it's a Python file
         execution_result = {}
         if filepath.endswith('.py'):
             from .code_execution_tools import run_manim_code
-            execution_result = run_manim_code()
+            execution_result = run_manim_code(tool_context)
         
         # Prepare the result
         result = {
             "status": "success", 
-            "message": f"Edited {filepath} from line {start_line} to {end_line}"
+            "message": f"Edited {filepath} from line {start_line} to {end_line}",
+            "version": version
         }
         
         # Include execution results if available
@@ -0,0 +1,15 @@
+"""
+Resource-limited sandbox shared by the agents' Manim renders.
+"""
+from .sandbox import (
+    CPU_LIMIT_EXCEEDED,
+    MEMORY_LIMIT_EXCEEDED,
+    FILE_SIZE_LIMIT_EXCEEDED,
+    WALL_TIMEOUT,
+    CANCELLED,
+    LIMIT_ERROR_DESCRIPTIONS,
+    RenderLimits,
+    classify_breach,
+    limit_error_analysis,
+    run_sandboxed,
+)
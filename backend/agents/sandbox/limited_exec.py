@@ -0,0 +1,49 @@
+"""
+Apply render rlimits to this process, then exec the render in its place.
+
+The sandbox starts renders through this wrapper instead of a preexec_fn: the
+renders are started from thread pools, and preexec_fn is not safe to use in
+a multithreaded parent. The limits are applied to the wrapper before exec,
+so the render never runs without them.
+
+Usage:
+    python limited_exec.py [--cpu-seconds N] [--memory-mb N] [--file-size-mb N] -- command [args...]
+"""
+import os
+import sys
+import argparse
+import resource
+
+
+def set_limit(kind, soft, hard=None):
+    try:
+        resource.setrlimit(kind, (soft, soft if hard is None else hard))
+    except (ValueError, OSError):
+        # Some platforms (macOS for RLIMIT_AS) refuse certain limits; keep going
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a command under rlimits")
+    parser.add_argument("--cpu-seconds", type=int)
+    parser.add_argument("--memory-mb", type=int)
+    parser.add_argument("--file-size-mb", type=int)
+    parser.add_argument("command", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        parser.error("no command given")
+
+    if args.cpu_seconds:
+        # Soft limit sends SIGXCPU, hard limit a few seconds later sends SIGKILL
+        set_limit(resource.RLIMIT_CPU, args.cpu_seconds, args.cpu_seconds + 5)
+    if args.memory_mb:
+        set_limit(resource.RLIMIT_AS, args.memory_mb * 1024 * 1024)
+    if args.file_size_mb:
+        set_limit(resource.RLIMIT_FSIZE, args.file_size_mb * 1024 * 1024)
+
+    os.execvp(command[0], command)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Resource-limited sandbox for running Manim renders.
+
+Every render runs in its own process group with rlimits applied before exec:
+CPU seconds, address space and largest writable file. The limits are set by a
+small exec wrapper (limited_exec.py) rather than a preexec_fn, since renders
+are started from thread pools. There is no process count limit: RLIMIT_NPROC
+counts every process of the user, so concurrent renders and the server itself
+would use up each other's allowance. A wall clock budget is enforced from the
+parent: a render over it is sent SIGTERM, and SIGKILL if it has not exited
+within a second. Resource usage of the render (and everything it spawned) is
+collected with wait4 so concurrent renders do not pollute each other's numbers.
+Without process groups and rlimits (Windows) only the render process itself is
+stopped, and only the wall clock budget applies.
+"""
+import os
+import signal
+import sys
+import subprocess
+import tempfile
+import threading
+import time
+import logging
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional
+
+try:
+    import resource
+except ImportError:  # Windows has no rlimits, renders run with the wall timeout only
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Error types reported in error_analysis when a render breaches a limit
+CPU_LIMIT_EXCEEDED = "CPUTimeLimitExceeded"
+MEMORY_LIMIT_EXCEEDED = "MemoryLimitExceeded"
+FILE_SIZE_LIMIT_EXCEEDED = "OutputSizeLimitExceeded"
+WALL_TIMEOUT = "WallClockTimeout"
+CANCELLED = "RenderCancelled"
+
+LIMIT_ERROR_DESCRIPTIONS = {
+    CPU_LIMIT_EXCEEDED: "Render used more CPU time than allowed",
+    MEMORY_LIMIT_EXCEEDED: "Render tried to allocate more memory than allowed",
+    FILE_SIZE_LIMIT_EXCEEDED: "Render tried to write a file larger than allowed",
+    WALL_TIMEOUT: "Render did not finish within the wall clock budget",
+    CANCELLED: "Render was cancelled before it finished",
+}
+
+_MEMORY_MARKERS = ("MemoryError", "Cannot allocate memory", "std::bad_alloc", "out of memory")
+_LIMITED_EXEC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "limited_exec.py")
+
+
+@dataclass
+class RenderLimits:
+    """Per-render resource budget. A value of None disables that limit."""
+    cpu_seconds: Optional[int] = 180
+    memory_mb: Optional[int] = 4096
+    file_size_mb: Optional[int] = 1024
+    wall_seconds: Optional[float] = 300
+
+    @classmethod
+    def from_env(cls) -> "RenderLimits":
+        """Build limits from MANIM_RENDER_* environment variables, falling back to the defaults."""
+        limits = cls()
+        for field, env_name, cast in (
+            ("cpu_seconds", "MANIM_RENDER_CPU_SECONDS", int),
+            ("memory_mb", "MANIM_RENDER_MEMORY_MB", int),
+            ("file_size_mb", "MANIM_RENDER_FILE_SIZE_MB", int),
+            ("wall_seconds", "MANIM_RENDER_WALL_SECONDS", float),
+        ):
+            value = os.getenv(env_name)
+            if value is None:
+                continue
+            setattr(limits, field, None if value.lower() in ("", "none", "0") else cast(value))
+        return limits
+
+    @classmethod
+    def from_dict(cls, overrides: Optional[Dict[str, Any]]) -> "RenderLimits":
+        """Environment defaults with any keys in overrides applied on top."""
+        limits = cls.from_env()
+        for key, value in (overrides or {}).items():
+            if hasattr(limits, key):
+                setattr(limits, key, value)
+        return limits
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _limited_command(cmd: List[str], limits: RenderLimits) -> List[str]:
+    """cmd wrapped in limited_exec.py, which applies the limits to itself and execs cmd."""
+    if resource is None:
+        return cmd
+    wrapped = [sys.executable, _LIMITED_EXEC]
+    for flag, value in (("--cpu-seconds", limits.cpu_seconds),
+                        ("--memory-mb", limits.memory_mb),
+                        ("--file-size-mb", limits.file_size_mb)):
+        if value:
+            wrapped += [flag, str(int(value))]
+    return wrapped + ["--"] + list(cmd)
+
+
+# POSIX process groups; elsewhere only the render itself can be stopped
+_PROCESS_GROUPS = hasattr(os, "killpg")
+# Seconds a render gets to exit after SIGTERM before it is killed
+_TERM_GRACE_SECONDS = 1.0
+
+
+class _Render:
+    """A started render: waits for it, stops it and its process group, and reaps it with its rusage.
+
+    Where os.waitid is available the render is left unreaped (a zombie) when it
+    exits, so its pid, which is also its process group id, cannot be reused
+    before the group has been killed. Nothing is signalled once it is reaped.
+    """
+
+    def __init__(self, process: subprocess.Popen):
+        self.process = process
+        self.rusage = None
+
+    @property
+    def reaped(self) -> bool:
+        return self.process.returncode is not None
+
+    def exited(self) -> bool:
+        if self.reaped:
+            return True
+        if hasattr(os, "waitid"):
+            return os.waitid(os.P_PID, self.process.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None
+        if hasattr(os, "wait4"):
+            pid, status, rusage = os.wait4(self.process.pid, os.WNOHANG)
+            if pid:
+                self._reaped(status, rusage)
+            return bool(pid)
+        return self.process.poll() is not None
+
+    def reap(self) -> None:
+        if self.reaped:
+            return
+        if hasattr(os, "wait4"):
+            _, status, rusage = os.wait4(self.process.pid, 0)
+            self._reaped(status, rusage)
+        else:
+            self.process.wait()
+
+    def _reaped(self, status: int, rusage) -> None:
+        self.rusage = rusage
+        self.process.returncode = os.waitstatus_to_exitcode(status)
+
+    def signal(self, force: bool) -> None:
+        """SIGTERM (or SIGKILL when force) the render's process group, or the render alone without groups."""
+        if self.reaped:
+            return
+        if not _PROCESS_GROUPS:
+            self.process.kill() if force else self.process.terminate()
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL if force else signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def stop(self) -> None:
+        """Terminate the render, escalating to a kill if it has not exited after a short grace period."""
+        self.signal(force=False)
+        deadline = time.monotonic() + _TERM_GRACE_SECONDS
+        while not self.exited() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if not self.exited():
+            self.signal(force=True)
+
+
+def classify_breach(returncode: int, stderr: str, timed_out: bool, cancelled: bool = False,
+                    cpu_seconds: Optional[float] = None, cpu_limit: Optional[int] = None) -> Optional[str]:
+    """Map how a render ended to one of the limit error types, or None if no limit was hit.
+
+    cpu_seconds (the render's measured CPU time) and cpu_limit tell a kill by the
+    hard RLIMIT_CPU apart from other SIGKILLs, like the kernel's OOM killer.
+    """
+    if cancelled:
+        return CANCELLED
+    if timed_out:
+        return WALL_TIMEOUT
+    if returncode == 0:
+        # A render that succeeded hit no limit, whatever its warnings (ffmpeg, LaTeX) mention
+        return None
+    if returncode is None or returncode > 0:
+        if any(marker in stderr for marker in _MEMORY_MARKERS):
+            return MEMORY_LIMIT_EXCEEDED
+        return None
+    sig = -returncode
+    if sig == getattr(signal, "SIGXCPU", None):
+        return CPU_LIMIT_EXCEEDED
+    if sig == signal.SIGKILL and cpu_limit and cpu_seconds is not None and cpu_seconds >= cpu_limit:
+        # The hard RLIMIT_CPU kills with SIGKILL once the soft limit's SIGXCPU was ignored
+        return CPU_LIMIT_EXCEEDED
+    if sig == getattr(signal, "SIGXFSZ", None):
+        return FILE_SIZE_LIMIT_EXCEEDED
+    if any(marker in stderr for marker in _MEMORY_MARKERS):
+        return MEMORY_LIMIT_EXCEEDED
+    return None
+
+
+def run_sandboxed(cmd: List[str],
+                  limits: Optional[RenderLimits] = None,
+                  cwd: Optional[str] = None,
+                  cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """Run a command under the render sandbox.
+
+    Args:
+        cmd: Command to run
+        limits: Resource budget, defaults to RenderLimits.from_env()
+        cwd: Working directory for the command
+        cancel_event: Optional event; when set the render's process group is killed
+
+    Returns:
+        Dict with returncode, stdout, stderr, resource usage and the limit breach (if any)
+    """
+    limits = limits or RenderLimits.from_env()
+    start_time = time.time()
+    timed_out = False
+    cancelled = False
+
+    # Output goes to temp files so a chatty render can never block on a full pipe
+    with tempfile.TemporaryFile(mode="w+") as out_f, tempfile.TemporaryFile(mode="w+") as err_f:
+        render = _Render(subprocess.Popen(
+            _limited_command(cmd, limits),
+            stdout=out_f,
+            stderr=err_f,
+            text=True,
+            cwd=cwd,
+            start_new_session=_PROCESS_GROUPS,
+        ))
+
+        while not render.exited():
+            elapsed = time.time() - start_time
+            if limits.wall_seconds and elapsed > limits.wall_seconds:
+                timed_out = True
+            elif cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+            if timed_out or cancelled:
+                logger.warning(f"{'Cancelling' if cancelled else 'Timing out'} render (pid {render.process.pid}) after {elapsed:.1f}s")
+                render.stop()
+                break
+            time.sleep(0.1)
+
+        # Make sure nothing the render forked outlives it, then collect its status and usage
+        render.signal(force=True)
+        render.reap()
+        process, rusage = render.process, render.rusage
+
+        out_f.seek(0)
+        err_f.seek(0)
+        stdout = out_f.read()
+        stderr = err_f.read()
+
+    wall_seconds = time.time() - start_time
+    usage = {"wall_seconds": round(wall_seconds, 3)}
+    if rusage is not None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        maxrss_kb = rusage.ru_maxrss / 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+        usage.update({
+            "user_cpu_seconds": round(rusage.ru_utime, 3),
+            "system_cpu_seconds": round(rusage.ru_stime, 3),
+            "cpu_seconds": round(rusage.ru_utime + rusage.ru_stime, 3),
+            "max_rss_mb": round(maxrss_kb / 1024, 1),
+        })
+
+    breach = classify_breach(process.returncode, stderr, timed_out, cancelled,
+                             cpu_seconds=usage.get("cpu_seconds"), cpu_limit=limits.cpu_seconds)
+    if breach:
+        logger.warning(f"Render limit breached: {breach} ({usage})")
+    else:
+        logger.info(f"Render resource usage: {usage}")
+
+    return {
+        "returncode": process.returncode,
+        "stdout": stdout,
+        "stderr": stderr,
+        "resource_usage": usage,
+        "limits": limits.to_dict(),
+        "limit_breach": breach,
+        "timed_out": timed_out,
+        "cancelled": cancelled,
+        "command": " ".join(cmd),
+    }
+
+
+def limit_error_analysis(breach: str, usage: Dict[str, Any], limits: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the error_analysis dict FixErrors expects for a limit breach."""
+    return {
+        "error_type": breach,
+        "error_description": LIMIT_ERROR_DESCRIPTIONS.get(breach, "Render exceeded a resource limit"),
+        "line_number": None,
+        "resource_usage": usage,
+        "limits": limits,
+    }
@@ -0,0 +1,8 @@
+"""
+Shared text-to-speech helpers used by the video agent and the mock videos.
+"""
+from .cache import AudioCache, cache_key, get_audio_cache
+from .client import get_tts_client, set_tts_client, synthesize_speech, synthesize_batch
+from .concat import concat_audio
+from .duration import audio_duration
+from .timing import split_sentences, narration_timing, timing_instructions
@@ -0,0 +1,173 @@
+"""
+Content-addressed cache for synthesized narration audio.
+
+Audio is stored under a hash of the normalized text and every parameter that
+changes the output (language, voice, encoding), so the same narration is only
+synthesized once no matter which tool or scene asks for it. Entries are
+written atomically and the cache is kept under a size budget by evicting the
+least recently used entries.
+
+Configuration:
+    TTS_CACHE_DIR: Cache directory (default: ~/.cache/animind/tts)
+    TTS_CACHE_MAX_MB: Size budget in MB (default: 1024)
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import unicodedata
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "animind", "tts")
+DEFAULT_MAX_MB = 1024
+
+
+def normalize_text(text: str) -> str:
+    """Normalize narration so formatting-only differences hit the same entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(text: str, language_code: str, voice: str, encoding: str) -> str:
+    """Hash of everything that determines the synthesized audio.
+
+    Args:
+        text: Narration text
+        language_code: Language code like "en-US"
+        voice: Voice name, or the gender when no name is given
+        encoding: Audio encoding like "MP3" or "LINEAR16"
+    """
+    payload = json.dumps([CACHE_VERSION, normalize_text(text), language_code, voice, encoding.upper()])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Size-bounded, least-recently-used audio cache on disk."""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of the cached audio, or None. A hit marks the entry as recently used."""
+        path = self.entry_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def read(self, key: str) -> Optional[bytes]:
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted between the lookup and the read
+            return None
+
+    def copy_to(self, key: str, output_path: str) -> bool:
+        """Copy the cached audio to output_path. Returns False on a miss."""
+        path = self.get(key)
+        if path is None:
+            return False
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        try:
+            shutil.copyfile(path, output_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, key: str, audio: bytes) -> str:
+        """Store audio under key and return the entry path."""
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write next to the entry and rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            if self._size is not None:
+                self._size += len(audio)
+            self._evict()
+        return path
+
+    def put_file(self, key: str, source_path: str) -> str:
+        with open(source_path, "rb") as f:
+            return self.put(key, f.read())
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits its budget."""
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        if self._size <= self.max_bytes:
+            return
+
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._size = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            logger.debug(f"Evicted TTS cache entry {os.path.basename(path)} ({size} bytes)")
+
+    def stats(self) -> Dict[str, Any]:
+        entries = list(self._entries())
+        return {
+            "directory": self.directory,
+            "entries": len(entries),
+            "size_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_audio_cache() -> AudioCache:
+    """The process-wide cache configured from TTS_CACHE_DIR and TTS_CACHE_MAX_MB."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = AudioCache(
+                directory=os.getenv("TTS_CACHE_DIR", DEFAULT_CACHE_DIR),
+                max_bytes=int(float(os.getenv("TTS_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024),
+            )
+        return _default_cache
+
@@ -0,0 +1,192 @@
+"""
+Google Cloud Text-to-Speech synthesis backed by the shared audio cache.
+
+A single TextToSpeechClient is created per process and reused for every
+request, so the gRPC channel and credentials are set up once. Long narrations
+can be synthesized with synthesize_batch(), which splits them at sentence
+boundaries, synthesizes the sentences concurrently and joins the audio
+without re-encoding.
+
+Configuration:
+    TTS_EMULATOR_HOST: host:port of a local stand-in TTS server; when set the
+        client connects to it over an insecure channel without credentials
+    TTS_BATCH_WORKERS: Concurrent requests per batch (default: 4)
+"""
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from .cache import cache_key, get_audio_cache
+from .concat import concat_audio
+from .duration import audio_duration
+from .timing import split_sentences
+
+logger = logging.getLogger(__name__)
+
+GENDERS = ("MALE", "FEMALE", "NEUTRAL")
+# Only formats concat_audio can join and audio_duration can measure
+ENCODINGS = {"MP3": "MP3", "WAV": "LINEAR16", "LINEAR16": "LINEAR16"}
+
+DEFAULT_BATCH_WORKERS = int(os.getenv("TTS_BATCH_WORKERS", "4"))
+# The API rejects inputs over 5000 bytes of UTF-8, which can be as few as 1250 characters
+MAX_CHUNK_BYTES = 5000
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_tts_client():
+    """The process-wide TextToSpeechClient, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google.cloud import texttospeech
+
+            emulator_host = os.getenv("TTS_EMULATOR_HOST")
+            if emulator_host:
+                import grpc
+                from google.cloud.texttospeech_v1.services.text_to_speech.transports import TextToSpeechGrpcTransport
+
+                logger.info(f"Using the TTS emulator at {emulator_host}")
+                _client = texttospeech.TextToSpeechClient(
+                    transport=TextToSpeechGrpcTransport(channel=grpc.insecure_channel(emulator_host))
+                )
+            else:
+                _client = texttospeech.TextToSpeechClient()
+        return _client
+
+
+def set_tts_client(client) -> None:
+    """Replace the process-wide client, e.g. with a stand-in in tests. None resets it."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def _encoding(audio_format: str) -> str:
+    """The API encoding for audio_format; checked before anything is synthesized."""
+    encoding = ENCODINGS.get(audio_format.upper())
+    if encoding is None:
+        raise ValueError(f"Unsupported audio format {audio_format!r}, use MP3 or WAV")
+    return encoding
+
+
+def _synthesize(text: str, language_code: str, voice_name: Optional[str], voice_gender: str,
+                audio_format: str) -> Tuple[bytes, bool]:
+    """Return the audio for text and whether it came from the cache."""
+    encoding = _encoding(audio_format)
+    cache = get_audio_cache()
+    key = cache_key(text, language_code, voice_name or voice_gender, audio_format)
+    audio = cache.read(key)
+    if audio is not None:
+        return audio, True
+
+    from google.cloud import texttospeech
+
+    voice = texttospeech.VoiceSelectionParams(
+        language_code=language_code,
+        name=voice_name,
+    ) if voice_name else texttospeech.VoiceSelectionParams(
+        language_code=language_code,
+        ssml_gender=getattr(texttospeech.SsmlVoiceGender, voice_gender if voice_gender in GENDERS else "NEUTRAL")
+    )
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=getattr(texttospeech.AudioEncoding, encoding)
+    )
+    response = get_tts_client().synthesize_speech(
+        input=texttospeech.SynthesisInput(text=text), voice=voice, audio_config=audio_config
+    )
+
+    cache.put(key, response.audio_content)
+    return response.audio_content, False
+
+
+def synthesize_speech(text: str,
+                      language_code: str = "en-US",
+                      voice_name: Optional[str] = None,
+                      voice_gender: str = "NEUTRAL",
+                      audio_format: str = "MP3") -> bytes:
+    """Synthesize text with Google Cloud TTS, reusing cached audio when possible.
+
+    Args:
+        text: The text to synthesize
+        language_code: Language code like "en-US"
+        voice_name: Specific voice like "en-US-Neural2-F"; the gender is used when not given
+        voice_gender: Voice gender (MALE, FEMALE, or NEUTRAL)
+        audio_format: Audio format (MP3 or WAV)
+
+    Returns:
+        The audio file contents
+    """
+    return _synthesize(text, language_code, voice_name, voice_gender, audio_format)[0]
+
+
+def split_chunks(text: str, max_bytes: int = MAX_CHUNK_BYTES) -> List[str]:
+    """Split narration into sentences, breaking sentences over max_bytes of UTF-8 at words."""
+    chunks = []
+    for sentence in split_sentences(text):
+        while len(sentence.encode("utf-8")) > max_bytes:
+            # The longest prefix that fits; a character cut in half by the byte limit is dropped
+            fits = len(sentence.encode("utf-8")[:max_bytes].decode("utf-8", errors="ignore"))
+            cut = sentence.rfind(" ", 0, fits)
+            cut = cut if cut > 0 else fits
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if sentence:
+            chunks.append(sentence)
+    return chunks
+
+
+def synthesize_batch(text: str,
+                     language_code: str = "en-US",
+                     voice_name: Optional[str] = None,
+                     voice_gender: str = "NEUTRAL",
+                     audio_format: str = "MP3",
+                     max_workers: int = DEFAULT_BATCH_WORKERS) -> Dict[str, Any]:
+    """Synthesize a long narration sentence by sentence, concurrently, and join the audio.
+
+    Every sentence is cached on its own, so narrations that share sentences
+    (or the per-sentence timing measured before code generation) reuse audio.
+
+    Args:
+        text: The narration to synthesize
+        language_code: Language code like "en-US"
+        voice_name: Specific voice like "en-US-Neural2-F"; the gender is used when not given
+        voice_gender: Voice gender (MALE, FEMALE, or NEUTRAL)
+        audio_format: Audio format (MP3 or WAV)
+        max_workers: Maximum concurrent requests
+
+    Returns:
+        Dict with the joined audio_content, the chunks (text and seconds),
+        duration_seconds and cache_hit (True if no chunk had to be synthesized)
+
+    Raises:
+        ValueError: If the text is empty or audio_format is not MP3 or WAV
+    """
+    _encoding(audio_format)
+    chunks = split_chunks(text)
+    if not chunks:
+        raise ValueError("Nothing to synthesize")
+
+    def synthesize(chunk):
+        return _synthesize(chunk, language_code, voice_name, voice_gender, audio_format)
+
+    if len(chunks) == 1:
+        results = [synthesize(chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)), thread_name_prefix="tts-batch") as pool:
+            results = list(pool.map(synthesize, chunks))
+
+    audio = concat_audio([chunk_audio for chunk_audio, _ in results])
+    chunk_info = [
+        {"text": chunk, "seconds": round(audio_duration(chunk_audio), 3)}
+        for chunk, (chunk_audio, _) in zip(chunks, results)
+    ]
+    return {
+        "audio_content": audio,
+        "chunks": chunk_info,
+        "duration_seconds": audio_duration(audio),
+        "cache_hit": all(hit for _, hit in results),
+    }
@@ -0,0 +1,71 @@
+"""
+Lossless concatenation of synthesized audio chunks.
+
+MP3 chunks are joined frame by frame: ID3 tags and Xing/Info metadata frames
+are dropped and the audio frames are copied as they are, so nothing is
+re-encoded. WAV chunks are joined by concatenating their PCM data under a new
+header; all chunks must share the same format.
+"""
+import struct
+from typing import List, Tuple
+
+from .duration import iter_mp3_frames, is_info_frame
+
+
+def _mp3_audio_frames(data: bytes) -> bytes:
+    frames = []
+    for index, (offset, header) in enumerate(iter_mp3_frames(data)):
+        if index == 0 and is_info_frame(data, offset, header):
+            # Its frame count describes this chunk only; without it players count the frames
+            continue
+        frames.append(data[offset:offset + header.length])
+    if not frames:
+        raise ValueError("Audio chunk is neither MP3 nor WAV")
+    return b"".join(frames)
+
+
+def _wav_parts(data: bytes) -> Tuple[bytes, bytes]:
+    """Return the fmt chunk body and the PCM data of a WAV file."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file")
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        chunk_size = struct.unpack("<I", data[offset + 4:offset + 8])[0]
+        if chunk_id == b"fmt ":
+            fmt = data[offset + 8:offset + 8 + chunk_size]
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            size = chunk_size if 0 < chunk_size < 0xFFFFFFFF else len(data) - offset - 8
+            return fmt, data[offset + 8:offset + 8 + size]
+        offset += 8 + chunk_size + (chunk_size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+def _concat_wav(chunks: List[bytes]) -> bytes:
+    parts = [_wav_parts(chunk) for chunk in chunks]
+    fmt = parts[0][0]
+    if any(part_fmt != fmt for part_fmt, _ in parts[1:]):
+        raise ValueError("WAV chunks have different formats")
+    pcm = b"".join(pcm for _, pcm in parts)
+    header = (b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + (len(fmt) & 1) + 8 + len(pcm)) + b"WAVE" +
+              b"fmt " + struct.pack("<I", len(fmt)) + fmt + (b"\x00" if len(fmt) & 1 else b"") +
+              b"data" + struct.pack("<I", len(pcm)))
+    return header + pcm
+
+
+def concat_audio(chunks: List[bytes]) -> bytes:
+    """Join MP3 or WAV chunks into one file without re-encoding.
+
+    Raises:
+        ValueError: If a chunk is neither MP3 nor WAV, or WAV chunks differ in format
+    """
+    if not chunks:
+        return b""
+    if len(chunks) == 1:
+        return chunks[0]
+    if chunks[0][:4] == b"RIFF":
+        return _concat_wav(chunks)
+    return b"".join(_mp3_audio_frames(chunk) for chunk in chunks)
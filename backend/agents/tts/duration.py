@@ -0,0 +1,171 @@
+"""
+Exact duration of synthesized audio, read from the file headers.
+
+MP3 duration comes from walking the MPEG frame headers (or the frame count in
+a Xing/Info header when there is one, minus the encoder delay and padding from
+the LAME tag). WAV duration comes from the fmt and data chunks. No ffprobe
+process is started.
+"""
+import struct
+from typing import Union
+
+# Bitrates in kbps by (MPEG version is 1, layer)
+_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# Sample rates by the version bits (0: MPEG 2.5, 2: MPEG 2, 3: MPEG 1)
+_SAMPLE_RATES = {
+    0: [11025, 12000, 8000],
+    2: [22050, 24000, 16000],
+    3: [44100, 48000, 32000],
+}
+
+
+class _FrameHeader:
+    """Decoded 4-byte MPEG audio frame header."""
+
+    def __init__(self, version_bits: int, layer: int, bitrate: int, sample_rate: int, padding: int, mono: bool):
+        self.mpeg1 = version_bits == 3
+        self.layer = layer
+        self.sample_rate = sample_rate
+        self.mono = mono
+        if layer == 1:
+            self.samples = 384
+            self.length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+        else:
+            self.samples = 1152 if (layer == 2 or self.mpeg1) else 576
+            self.length = self.samples // 8 * bitrate * 1000 // sample_rate + padding
+
+    @property
+    def side_info_size(self) -> int:
+        if self.mpeg1:
+            return 17 if self.mono else 32
+        return 9 if self.mono else 17
+
+
+def _parse_frame_header(data: bytes, offset: int):
+    """Return the frame header at offset, or None if there is no valid frame there."""
+    if offset + 4 > len(data) or data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    version_bits = (b1 >> 3) & 0x3
+    layer = 4 - ((b1 >> 1) & 0x3)
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x3
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        # Reserved values or free-format bitrate, not a frame we can size
+        return None
+    bitrate = _BITRATES[(version_bits == 3, layer)][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+    return _FrameHeader(version_bits, layer, bitrate, sample_rate, (b2 >> 1) & 0x1, (b3 >> 6) == 3)
+
+
+def _skip_id3v2(data: bytes) -> int:
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _xing_duration(data: bytes, offset: int, header: _FrameHeader):
+    """Duration from the Xing/Info frame at offset, or None if it has no frame count."""
+    xing = offset + 4 + header.side_info_size
+    flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+    if not flags & 0x1:
+        return None
+    frames = struct.unpack(">I", data[xing + 8:xing + 12])[0]
+    total_samples = frames * header.samples
+
+    # The LAME tag after the Xing fields records the encoder delay and padding
+    lame = xing + 8 + 4 + (4 if flags & 0x2 else 0) + (100 if flags & 0x4 else 0) + (4 if flags & 0x8 else 0)
+    if data[lame:lame + 4] in (b"LAME", b"Lavf", b"Lavc") and len(data) >= lame + 24:
+        b0, b1, b2 = data[lame + 21], data[lame + 22], data[lame + 23]
+        delay = (b0 << 4) | (b1 >> 4)
+        padding = ((b1 & 0x0F) << 8) | b2
+        total_samples = max(0, total_samples - delay - padding)
+    return total_samples / header.sample_rate
+
+
+def iter_mp3_frames(data: bytes):
+    """Yield (offset, header) for every MPEG audio frame, skipping tags and junk."""
+    offset = _skip_id3v2(data)
+    end = len(data) - 128 if data[-128:-125] == b"TAG" else len(data)
+    while offset + 4 <= end:
+        header = _parse_frame_header(data, offset)
+        if header is None or header.length <= 0:
+            # Lost sync (junk or a truncated frame), scan for the next frame
+            offset += 1
+            continue
+        yield offset, header
+        offset += header.length
+
+
+def is_info_frame(data: bytes, offset: int, header: _FrameHeader) -> bool:
+    """True for a Xing/Info metadata frame, which holds no audio."""
+    xing = offset + 4 + header.side_info_size
+    return data[xing:xing + 4] in (b"Xing", b"Info")
+
+
+def mp3_duration(data: bytes) -> float:
+    """Duration in seconds of MP3 data."""
+    total_samples = 0
+    sample_rate = None
+
+    for index, (offset, header) in enumerate(iter_mp3_frames(data)):
+        if index == 0 and is_info_frame(data, offset, header):
+            duration = _xing_duration(data, offset, header)
+            if duration is not None:
+                return duration
+            # An Info frame without a frame count is silent metadata, do not count it
+            continue
+        total_samples += header.samples
+        sample_rate = header.sample_rate
+
+    if sample_rate is None:
+        raise ValueError("No MPEG audio frames found")
+    return total_samples / sample_rate
+
+
+def wav_duration(data: bytes) -> float:
+    """Duration in seconds of RIFF/WAVE data."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file")
+    offset = 12
+    byte_rate = None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        chunk_size = struct.unpack("<I", data[offset + 4:offset + 8])[0]
+        if chunk_id == b"fmt ":
+            byte_rate = struct.unpack("<I", data[offset + 16:offset + 20])[0]
+        elif chunk_id == b"data":
+            if not byte_rate:
+                raise ValueError("WAV data chunk before fmt chunk")
+            # Streams written before their length is known use 0 or 0xFFFFFFFF, fall back to the file size
+            size = chunk_size if 0 < chunk_size < 0xFFFFFFFF else len(data) - offset - 8
+            return min(size, len(data) - offset - 8) / byte_rate
+        # Chunks are word aligned
+        offset += 8 + chunk_size + (chunk_size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+def audio_duration(source: Union[str, bytes]) -> float:
+    """Exact duration in seconds of an MP3 or WAV file or its bytes.
+
+    Raises:
+        ValueError: If the data is neither MP3 nor WAV
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            data = f.read()
+    else:
+        data = source
+    if data[:4] == b"RIFF":
+        return wav_duration(data)
+    return mp3_duration(data)
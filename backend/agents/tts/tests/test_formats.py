@@ -0,0 +1,63 @@
+"""
+Audio formats accepted by synthesize_batch: WAV chunks are joined and
+measured exactly, and formats that cannot be joined are refused before
+anything is synthesized.
+"""
+import io
+import os
+import sys
+import wave
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from tts import client
+from tts.cache import AudioCache, cache_key
+
+SAMPLE_RATE = 16000
+
+
+def _wav(seconds: float) -> bytes:
+    out = io.BytesIO()
+    with wave.open(out, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(b"\0\0" * int(SAMPLE_RATE * seconds))
+    return out.getvalue()
+
+
+class _NoClient:
+    def synthesize_speech(self, **kwargs):
+        raise AssertionError("The TTS API must not be called")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = AudioCache(str(tmp_path))
+    monkeypatch.setattr(client, "get_audio_cache", lambda: cache)
+    client.set_tts_client(_NoClient())
+    yield cache
+    client.set_tts_client(None)
+
+
+def test_wav_chunks_are_joined_and_measured(cache):
+    sentences = {"The first sentence.": 0.5, "The second one is longer.": 1.25}
+    for sentence, seconds in sentences.items():
+        cache.put(cache_key(sentence, "en-US", "NEUTRAL", "WAV"), _wav(seconds))
+
+    result = client.synthesize_batch(" ".join(sentences), audio_format="WAV")
+
+    assert result["cache_hit"]
+    assert [chunk["text"] for chunk in result["chunks"]] == list(sentences)
+    assert [chunk["seconds"] for chunk in result["chunks"]] == list(sentences.values())
+    assert result["duration_seconds"] == pytest.approx(1.75)
+    with wave.open(io.BytesIO(result["audio_content"])) as f:
+        assert f.getnframes() == int(SAMPLE_RATE * 1.75)
+
+
+@pytest.mark.parametrize("audio_format", ["OGG_OPUS", "FLAC"])
+def test_unsupported_formats_are_refused_before_synthesis(cache, audio_format):
+    with pytest.raises(ValueError, match="Unsupported audio format"):
+        client.synthesize_batch("Nothing here is synthesized.", audio_format=audio_format)
@@ -0,0 +1,55 @@
+"""
+Per-sentence narration timing.
+
+Each sentence of a narration is synthesized on its own (through the audio
+cache, so the audio is reused when the narration is spoken later) and its
+exact duration is read from the audio headers. Code generation uses the result
+as timing constraints so the animation matches the narration on the first
+render.
+"""
+import re
+from typing import Callable, Dict, Any, List
+
+from .cache import normalize_text
+from .duration import audio_duration
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split narration into sentences at ., ! and ? followed by a new sentence."""
+    text = normalize_text(text)
+    return [sentence for sentence in _SENTENCE_END.split(text) if sentence] if text else []
+
+
+def narration_timing(text: str, synthesize: Callable[[str], bytes]) -> Dict[str, Any]:
+    """Measure how long each sentence of the narration takes to speak.
+
+    Args:
+        text: Narration text
+        synthesize: Function that returns the audio bytes for one sentence
+
+    Returns:
+        Dict with the sentences (text and seconds) and the total_seconds
+    """
+    sentences = [
+        {"text": sentence, "seconds": round(audio_duration(synthesize(sentence)), 3)}
+        for sentence in split_sentences(text)
+    ]
+    return {
+        "sentences": sentences,
+        "total_seconds": round(sum(s["seconds"] for s in sentences), 3),
+    }
+
+
+def timing_instructions(timing: Dict[str, Any]) -> str:
+    """Prompt section that asks the generated code to follow the narration timing."""
+    lines = [
+        "The narration below has already been recorded. Time the animation to it: the run_time and wait",
+        "calls for each sentence must add up to that sentence's duration, and the whole scene must last",
+        f"{timing['total_seconds']:.2f} seconds. Keep the narration text exactly as given.",
+        "",
+    ]
+    for i, sentence in enumerate(timing["sentences"], start=1):
+        lines.append(f"{i}. ({sentence['seconds']:.2f}s) {sentence['text']}")
+    return "\n".join(lines)
@@ -0,0 +1,256 @@
+"""
+Single-pass assembly of the final video.
+
+Instead of muxing every scene into its own MP4 and concatenating those in a
+second ffmpeg run, the assembler builds one filter graph over every scene's
+rendered video and narration audio. Each scene is stretched to the longer of
+its video and its narration (the last frame is held while the narration
+finishes, silence fills in after it ends), scaled to a common frame size and
+concatenated, and ffmpeg writes the final file directly with no intermediate
+files.
+
+Durations come from the MP4 movie header and the audio headers, so no ffprobe
+process is started.
+"""
+import os
+import time
+import struct
+import logging
+import subprocess
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from tts import audio_duration
+
+logger = logging.getLogger(__name__)
+
+AUDIO_RATE = 48000
+# Containers that hold the boxes we need to read
+_CONTAINER_BOXES = {b"moov", b"trak"}
+
+
+@dataclass
+class Segment:
+    """One scene of the final video: its rendered animation and optional narration."""
+    video: str
+    audio: Optional[str] = None
+    title: str = ""
+
+
+def _boxes(data: bytes, start: int, end: int):
+    """Yield (type, body start, body end) for the ISO BMFF boxes in data[start:end]."""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack(">I4s", data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset + header, min(offset + size, end)
+        offset += size
+
+
+def _read_moov(path: str) -> bytes:
+    """Read the moov box of an MP4 file without loading the media data."""
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            header = f.read(16)
+            size, box_type = struct.unpack(">I4s", header[:8])
+            if size == 1:
+                size = struct.unpack(">Q", header[8:16])[0]
+            elif size == 0:
+                size = file_size - offset
+            if size < 8:
+                break
+            if box_type == b"moov":
+                f.seek(offset)
+                return f.read(size)
+            offset += size
+    raise ValueError(f"No moov box in {path}")
+
+
+def mp4_info(path: str) -> Dict[str, Any]:
+    """Duration and frame size of an MP4 file, read from its mvhd and tkhd boxes.
+
+    Returns:
+        Dict with duration_seconds and the width and height of the first video
+        track (None when there is no video track)
+
+    Raises:
+        ValueError: If the file has no movie header
+    """
+    moov = _read_moov(path)
+    info = {"duration_seconds": None, "width": None, "height": None}
+
+    def walk(start, end):
+        for box_type, body, body_end in _boxes(moov, start, end):
+            if box_type == b"mvhd":
+                if moov[body] == 1:
+                    timescale, duration = struct.unpack(">IQ", moov[body + 20:body + 32])
+                else:
+                    timescale, duration = struct.unpack(">II", moov[body + 12:body + 20])
+                info["duration_seconds"] = duration / timescale if timescale else None
+            elif box_type == b"tkhd" and info["width"] is None:
+                # Width and height are 16.16 fixed point at the end of the box; audio tracks have 0
+                width, height = struct.unpack(">II", moov[body_end - 8:body_end])
+                if width and height:
+                    info["width"], info["height"] = width >> 16, height >> 16
+            elif box_type in _CONTAINER_BOXES:
+                walk(body, body_end)
+
+    walk(8, len(moov))
+    if info["duration_seconds"] is None:
+        raise ValueError(f"No movie header in {path}")
+    return info
+
+
+def segment_durations(segments: List[Segment]) -> List[Tuple[float, Optional[float], float]]:
+    """(video seconds, audio seconds, output seconds) for every segment."""
+    durations = []
+    for segment in segments:
+        video_seconds = mp4_info(segment.video)["duration_seconds"]
+        audio_seconds = audio_duration(segment.audio) if segment.audio else None
+        durations.append((video_seconds, audio_seconds, max(video_seconds, audio_seconds or 0)))
+    return durations
+
+
+def build_assembly_command(segments: List[Segment],
+                           output_path: str,
+                           durations: List[Tuple[float, Optional[float], float]],
+                           frame_size: Optional[Tuple[int, int]] = None,
+                           fps: Optional[int] = None) -> List[str]:
+    """The single ffmpeg command that pads, trims and concatenates every segment.
+
+    Args:
+        segments: Scenes in playback order
+        output_path: Final video path
+        durations: segment_durations() of the segments
+        frame_size: (width, height) every scene is scaled and letterboxed to
+        fps: Common frame rate, or None to keep each scene's own
+
+    Returns:
+        The ffmpeg argument list
+    """
+    command = ["ffmpeg", "-y"]
+    filters = []
+    concat_inputs = []
+    input_index = 0
+
+    for i, (segment, (video_seconds, audio_seconds, seconds)) in enumerate(zip(segments, durations)):
+        command += ["-i", segment.video]
+        video_input = input_index
+        input_index += 1
+
+        video_chain = []
+        if frame_size:
+            width, height = frame_size
+            video_chain += [f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+                            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2"]
+        video_chain.append("setsar=1")
+        if fps:
+            video_chain.append(f"fps={fps}")
+        video_chain.append("format=yuv420p")
+        if seconds > video_seconds:
+            # Hold the last frame until the narration ends
+            video_chain.append(f"tpad=stop_mode=clone:stop_duration={seconds - video_seconds:.3f}")
+        video_chain += [f"trim=duration={seconds:.3f}", "setpts=PTS-STARTPTS"]
+        filters.append(f"[{video_input}:v]{','.join(video_chain)}[v{i}]")
+
+        audio_format = f"aresample={AUDIO_RATE},aformat=sample_fmts=fltp:channel_layouts=stereo"
+        if segment.audio:
+            command += ["-i", segment.audio]
+            audio_input = input_index
+            input_index += 1
+            # Silence after the narration, cut at the scene length
+            filters.append(f"[{audio_input}:a]{audio_format},apad,atrim=duration={seconds:.3f},"
+                           f"asetpts=PTS-STARTPTS[a{i}]")
+        else:
+            filters.append(f"anullsrc=channel_layout=stereo:sample_rate={AUDIO_RATE},"
+                           f"atrim=duration={seconds:.3f},{audio_format}[a{i}]")
+        concat_inputs.append(f"[v{i}][a{i}]")
+
+    filters.append(f"{''.join(concat_inputs)}concat=n={len(segments)}:v=1:a=1[v][a]")
+    command += [
+        "-filter_complex", ";".join(filters),
+        "-map", "[v]", "-map", "[a]",
+        "-c:v", "libx264", "-preset", "medium", "-crf", "20",
+        "-c:a", "aac", "-b:a", "192k",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+    return command
+
+
+def assemble_video(segments: List[Segment], output_path: str, fps: Optional[int] = None) -> Dict[str, Any]:
+    """Assemble the scenes and their narration into the final video with one ffmpeg run.
+
+    Args:
+        segments: Scenes in playback order
+        output_path: Where the final video is written
+        fps: Common frame rate, or None to keep each scene's own
+
+    Returns:
+        Dict with output_path, duration_seconds, the per-scene durations and success
+    """
+    if not segments:
+        return {"success": False, "error": "No scenes to assemble"}
+
+    missing = [path for segment in segments for path in (segment.video, segment.audio)
+               if path and not os.path.isfile(path)]
+    if missing:
+        return {"success": False, "error": f"Missing input files: {', '.join(missing)}"}
+
+    try:
+        durations = segment_durations(segments)
+        first = mp4_info(segments[0].video)
+    except (OSError, ValueError, struct.error) as e:
+        return {"success": False, "error": f"Could not read scene durations: {e}"}
+
+    frame_size = (first["width"], first["height"]) if first["width"] else None
+    command = build_assembly_command(segments, output_path, durations, frame_size=frame_size, fps=fps)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    started = time.time()
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "stderr": e.stderr.decode("utf-8", errors="replace")
+        }
+    except FileNotFoundError:
+        return {"success": False, "error": "ffmpeg is not installed"}
+
+    logger.info(f"Assembled {len(segments)} scenes into {output_path} in {time.time() - started:.1f}s")
+    return {
+        "output_path": output_path,
+        "duration_seconds": round(sum(seconds for _, _, seconds in durations), 3),
+        "scenes": [
+            {"title": segment.title, "video_seconds": round(video_seconds, 3),
+             "audio_seconds": round(audio_seconds, 3) if audio_seconds is not None else None,
+             "seconds": round(seconds, 3)}
+            for segment, (video_seconds, audio_seconds, seconds) in zip(segments, durations)
+        ],
+        "success": True
+    }
+
+
+def segments_from_outputs(scene_outputs: Dict[str, Any]) -> List[Segment]:
+    """Segments for every scene with a video, in scene order, from SceneExecutor.run() outputs."""
+    names = sorted((name for name in scene_outputs if name.startswith("scene") and name[5:].isdigit()),
+                   key=lambda name: int(name[5:]))
+    return [
+        Segment(video=scene_outputs[name]["video"], audio=scene_outputs[name].get("audio"),
+                title=scene_outputs[name].get("title", ""))
+        for name in names
+        if scene_outputs[name].get("video")
+    ]
+
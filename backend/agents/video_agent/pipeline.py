@@ -0,0 +1,157 @@
+"""
+Pipelined scene executor for the video agent.
+
+Every scene gets its own worker: it renders the scene's animation and collects
+its narration, which is synthesized on a separate bounded pool from the moment
+the scene is submitted. Scene workers run concurrently under a cap, so several
+LLM code-generation conversations and renders proceed at once instead of one
+tool call at a time. Scenes can be submitted one at a time while the plan is
+still being written (see stages.StreamingPlanStage). Scenes are not muxed one
+by one: the final assembly (assembly.py) combines every scene's video and
+audio in a single ffmpeg pass.
+
+All scenes report into the video's budget (see the budget package): once it
+is spent, scenes that have not started rendering are skipped instead of
+running a code-generation conversation the job cannot pay for.
+
+Configuration:
+    VIDEO_AGENT_SCENE_WORKERS: Scenes generated at once (default: 2)
+    VIDEO_AGENT_TTS_WORKERS: Concurrent narration requests (default: 4)
+"""
+import os
+import time
+import logging
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional
+
+from budget import Budget, use_budget
+from .plan import Scene
+from .tools.tts_tools import generate_speech
+from .tools.video_tools import generate_animation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCENE_WORKERS = int(os.getenv("VIDEO_AGENT_SCENE_WORKERS", "2"))
+DEFAULT_TTS_WORKERS = int(os.getenv("VIDEO_AGENT_TTS_WORKERS", "4"))
+
+
+class SceneExecutor:
+    """Runs a worker per scene (animation and narration) with a cap on concurrent scenes."""
+
+    def __init__(self, output_dir: str = "output",
+                 scene_workers: int = DEFAULT_SCENE_WORKERS,
+                 tts_workers: int = DEFAULT_TTS_WORKERS,
+                 budget: Optional[Budget] = None):
+        self.output_dir = output_dir
+        self.scene_workers = max(1, scene_workers)
+        self.tts_workers = tts_workers
+        self.budget = budget
+
+    def _speech(self, index: int, scene: Scene) -> Dict[str, Any]:
+        started = time.time()
+        result = generate_speech(scene.narration.strip(),
+                                 output_path=os.path.join(self.output_dir, "audio", f"scene{index}.mp3"))
+        result["elapsed_seconds"] = round(time.time() - started, 3)
+        return result
+
+    def _animation(self, index: int, scene: Scene) -> Dict[str, Any]:
+        started = time.time()
+        # Scene workers are pool threads, so the budget is made active in each of them
+        with use_budget(self.budget) if self.budget is not None else nullcontext():
+            result = generate_animation(scene.animation_plan.strip() or scene.description,
+                                        output_dir=os.path.join(self.output_dir, "animations", f"scene{index}"))
+        result["elapsed_seconds"] = round(time.time() - started, 3)
+        return result
+
+    def _scene_worker(self, index: int, scene: Scene, speech) -> Dict[str, Any]:
+        """Render one scene and wait for its narration; returns the scene's output entry."""
+        scene_output = {"title": scene.title, "video": None, "audio": None}
+
+        exhausted = self.budget.exhausted_reason() if self.budget is not None else None
+        try:
+            if exhausted:
+                logger.warning(f"Scene {index} skipped: budget {exhausted}")
+                result = {"error": f"Skipped: budget {exhausted}"}
+            else:
+                result = self._animation(index, scene)
+        except Exception as e:
+            logger.error(f"Scene {index} video failed: {e}")
+            result = {"error": str(e)}
+        scene_output["video_seconds"] = result.get("elapsed_seconds")
+        if result.get("video_path"):
+            scene_output["video"] = result["video_path"]
+            scene_output["code"] = result.get("code_path")
+        else:
+            scene_output["video_error"] = result.get("error") or result.get("execution_result", "failed")
+
+        if speech is not None:
+            try:
+                result = speech.result()
+            except Exception as e:
+                logger.error(f"Scene {index} audio failed: {e}")
+                result = {"error": str(e)}
+            scene_output["audio_seconds"] = result.get("elapsed_seconds")
+            if result.get("success"):
+                scene_output["audio"] = result["output_path"]
+                scene_output["audio_cache_hit"] = result.get("cache_hit", False)
+            else:
+                scene_output["audio_error"] = result.get("error", "failed")
+        return scene_output
+
+    def start(self) -> None:
+        """Open the worker pools; scenes can then be submitted one by one as they are planned."""
+        self._started = time.time()
+        self._titles = {}
+        self._workers = {}  # future -> scene index
+        self._scene_pool = ThreadPoolExecutor(max_workers=self.scene_workers, thread_name_prefix="scene")
+        # Narration is cheap and network bound, so it starts right away rather than waiting for a scene worker
+        self._tts_pool = ThreadPoolExecutor(max_workers=self.tts_workers, thread_name_prefix="tts")
+
+    def submit(self, index: int, scene: Scene) -> None:
+        """Start the narration and queue the worker of scene number index."""
+        self._titles[index] = scene.title
+        speech = self._tts_pool.submit(self._speech, index, scene) if scene.narration.strip() else None
+        self._workers[self._scene_pool.submit(self._scene_worker, index, scene, speech)] = index
+
+    def finish(self) -> Dict[str, Any]:
+        """Wait for every submitted scene and return the outputs keyed "scene1", "scene2", ...
+
+        Returns:
+            Dict with one entry per scene (title, video, audio and any errors)
+            plus a "timing" entry
+        """
+        results = {}
+        try:
+            for future in as_completed(self._workers):
+                index = self._workers[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    logger.error(f"Scene {index} failed: {e}")
+                    results[index] = {"title": self._titles[index], "video": None, "audio": None,
+                                      "video_error": str(e)}
+        finally:
+            self._scene_pool.shutdown(wait=True)
+            self._tts_pool.shutdown(wait=True)
+
+        outputs = {f"scene{index}": results[index] for index in sorted(results)}
+        scene_outputs = list(outputs.values())
+        outputs["timing"] = {
+            "total_seconds": round(time.time() - self._started, 3),
+            "render_seconds": round(sum(o.get("video_seconds") or 0 for o in scene_outputs), 3),
+            "tts_seconds": round(sum(o.get("audio_seconds") or 0 for o in scene_outputs), 3),
+            "scene_workers": self.scene_workers,
+        }
+        if self.budget is not None:
+            outputs["budget"] = self.budget.summary()
+        logger.info(f"Generated {len(scene_outputs)} scenes: {outputs['timing']}")
+        return outputs
+
+    def run(self, scenes: List[Scene]) -> Dict[str, Any]:
+        """Produce every scene of a complete plan; see finish() for the outputs."""
+        self.start()
+        for i, scene in enumerate(scenes, start=1):
+            self.submit(i, scene)
+        return self.finish()
+
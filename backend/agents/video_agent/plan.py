@@ -0,0 +1,138 @@
+"""
+Animation plan structure and parsing.
+"""
+from typing import List
+from dataclasses import dataclass
+
+@dataclass
+class Scene:
+    """Scene structure for the animation plan."""
+    title: str
+    description: str
+    animation_plan: str
+    narration: str
+
+def _is_scene_marker(line: str) -> bool:
+    return line.startswith("SCENE ") or line.startswith("## SCENE ")
+
+class IncrementalPlanParser:
+    """
+    Parses an animation plan as it is streamed.
+    
+    Feed text chunks as they arrive; every scene is returned as soon as it is
+    complete, which is when the next scene marker starts (its narration has
+    closed) or the stream ends.
+    """
+    
+    def __init__(self):
+        self._buffer = ""
+        self._scene = None
+        self._section = None
+    
+    def feed(self, chunk: str) -> List[Scene]:
+        """
+        Add streamed text and return the scenes it completed.
+        
+        Args:
+            chunk: The next piece of the plan text
+            
+        Returns:
+            List of Scene objects completed by this chunk
+        """
+        completed = []
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            self._add_line(line.strip(), completed)
+        
+        # A scene marker at the start of the partial line closes the previous scene's narration
+        if self._scene and self._scene.narration and _is_scene_marker(self._buffer.lstrip()):
+            completed.append(self._scene)
+            self._scene = None
+            self._section = None
+        return completed
+    
+    def close(self) -> List[Scene]:
+        """
+        End the stream and return the last scene, if any.
+        
+        Returns:
+            List of Scene objects completed by the end of the stream
+        """
+        completed = []
+        self._add_line(self._buffer.strip(), completed)
+        self._buffer = ""
+        if self._scene:
+            completed.append(self._scene)
+            self._scene = None
+        return completed
+    
+    def _add_line(self, line: str, completed: List[Scene]):
+        if not line:
+            return
+        current_scene = self._scene
+        
+        # Check if this is a scene marker
+        if _is_scene_marker(line):
+            # Save the previous scene if it exists
+            if current_scene:
+                completed.append(current_scene)
+            
+            # Start a new scene
+            self._scene = Scene(
+                title="",
+                description="",
+                animation_plan="",
+                narration=""
+            )
+            self._section = "title"
+            
+            # Extract title if available
+            if ":" in line:
+                self._scene.title = line.split(":", 1)[1].strip()
+            
+        # Check for section headers
+        elif current_scene and line.lower().startswith("title:"):
+            self._section = "title"
+            if len(line) > 6:
+                current_scene.title = line[6:].strip()
+        elif current_scene and line.lower().startswith("description:"):
+            self._section = "description"
+            if len(line) > 12:
+                current_scene.description = line[12:].strip()
+        elif current_scene and (line.lower().startswith("animation plan:") or line.lower().startswith("animation:") or line.lower().startswith("## animation")):
+            self._section = "animation_plan"
+            if ":" in line:
+                remainder = line.split(":", 1)[1].strip()
+                if remainder:
+                    current_scene.animation_plan = remainder + "\n"
+        elif current_scene and (line.lower().startswith("narration:") or line.lower().startswith("script:") or line.lower().startswith("## narration")):
+            self._section = "narration"
+            if ":" in line:
+                remainder = line.split(":", 1)[1].strip()
+                if remainder:
+                    current_scene.narration = remainder + "\n"
+        
+        # Add content to the current section
+        elif current_scene and self._section:
+            if self._section == "title":
+                current_scene.title += " " + line
+            elif self._section == "description":
+                current_scene.description += " " + line if current_scene.description else line
+            elif self._section == "animation_plan":
+                current_scene.animation_plan += line + "\n"
+            elif self._section == "narration":
+                current_scene.narration += line + "\n"
+
+def parse_animation_plan(plan_text: str) -> List[Scene]:
+    """
+    Parse the animation plan text into Scene objects.
+    
+    Args:
+        plan_text: The raw text of the animation plan
+        
+    Returns:
+        List of Scene objects
+    """
+    parser = IncrementalPlanParser()
+    return parser.feed(plan_text.strip()) + parser.close()
@@ -0,0 +1,184 @@
+"""
+Non-LLM stages of the video generation pipeline.
+
+StreamingPlanStage runs the planner with streaming output and hands every
+scene to the SceneExecutor as soon as the incremental parser completes it, so
+the first scenes render while the model is still writing the rest of the plan.
+
+Stitching known file paths needs no reasoning, so the final assembly runs as a
+plain ADK agent inside the SequentialAgent instead of an LlmAgent with tools:
+it reads the structured scene outputs from the session state, validates every
+file and calls the assembly engine directly.
+"""
+import os
+import json
+import struct
+import asyncio
+import logging
+from typing import AsyncGenerator, Dict, Any, List, Tuple
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from budget import get_budget
+from tts import audio_duration
+from .plan import IncrementalPlanParser
+from .pipeline import SceneExecutor
+from .assembly import Segment, assemble_video, mp4_info, segments_from_outputs
+
+logger = logging.getLogger(__name__)
+
+
+def _event_text(event: Event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text or "" for part in event.content.parts if not getattr(part, "thought", False))
+
+
+class StreamingPlanStage(BaseAgent):
+    """Streams the plan from the planner and generates each scene as soon as it is complete."""
+
+    planner: LlmAgent
+
+    def __init__(self, name: str, planner: LlmAgent, description: str = ""):
+        super().__init__(name=name, planner=planner, sub_agents=[planner], description=description)
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        parser = IncrementalPlanParser()
+        budget = get_budget(ctx.session.state)
+        executor = SceneExecutor(output_dir=ctx.session.state.get("output_dir", "output"), budget=budget)
+        executor.start()
+        submitted = 0
+        streamed = False
+
+        def submit(scenes):
+            nonlocal submitted
+            for scene in scenes:
+                submitted += 1
+                logger.info(f"Scene {submitted} planned, starting its narration and render: {scene.title}")
+                executor.submit(submitted, scene)
+
+        try:
+            async for event in self.planner.run_async(ctx):
+                text = _event_text(event)
+                if event.partial:
+                    streamed = True
+                    submit(parser.feed(text))
+                elif text and not streamed:
+                    # Not streaming: the whole plan arrives in one event
+                    submit(parser.feed(text))
+                yield event
+            submit(parser.close())
+        finally:
+            # Renders and TTS already started are waited for even if the planner failed
+            outputs = await asyncio.to_thread(executor.finish)
+
+        if not submitted:
+            message = "The animation plan has no scenes"
+            logger.error(message)
+        else:
+            timing = outputs["timing"]
+            message = (f"Generated {submitted} scenes in {timing['total_seconds']:.1f}s "
+                       f"(render {timing['render_seconds']:.1f}s, TTS {timing['tts_seconds']:.1f}s)")
+
+        yield Event(
+            author=self.name,
+            invocation_id=ctx.invocation_id,
+            content=types.Content(role="model", parts=[types.Part(text=message)]),
+            actions=EventActions(state_delta={"scene_results": outputs, "scene_outputs": outputs,
+                                              "budget_id": budget.job_id, "budget": budget.summary()}),
+        )
+
+
+def _parse_summary(summary: Any) -> Dict[str, Any]:
+    """The scene generator's text summary as a dict, or {} if it is not JSON."""
+    if isinstance(summary, dict):
+        return summary
+    if not isinstance(summary, str):
+        return {}
+    text = summary.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def collect_scene_outputs(state) -> Dict[str, Any]:
+    """Merge the structured scene results with the scene_outputs summary.
+
+    The summary (a dict, or JSON text written by an LLM agent) only fills in
+    scenes that the structured results have no video or audio for, e.g. scenes
+    redone by hand with the individual tools.
+    """
+    outputs = {name: dict(output) for name, output in (state.get("scene_results") or {}).items()
+               if isinstance(output, dict)}
+    for name, output in _parse_summary(state.get("scene_outputs")).items():
+        if not isinstance(output, dict):
+            continue
+        merged = outputs.setdefault(name, {})
+        for key in ("title", "video", "audio"):
+            if not merged.get(key) and output.get(key):
+                merged[key] = output[key]
+    return outputs
+
+
+def validate_segments(segments: List[Segment]) -> Tuple[List[Segment], List[str]]:
+    """Drop scenes whose video cannot be read and narration that cannot be read.
+
+    Returns:
+        Tuple of (usable segments, problems found)
+    """
+    usable, problems = [], []
+    for segment in segments:
+        try:
+            if not os.path.getsize(segment.video):
+                raise ValueError("empty file")
+            mp4_info(segment.video)
+        except (OSError, ValueError, struct.error) as e:
+            problems.append(f"Skipped {segment.title or segment.video}: unreadable video {segment.video} ({e})")
+            continue
+        if segment.audio:
+            try:
+                audio_duration(segment.audio)
+            except (OSError, ValueError, struct.error) as e:
+                problems.append(f"{segment.title or segment.video} has no narration: unreadable audio "
+                                f"{segment.audio} ({e})")
+                segment = Segment(video=segment.video, title=segment.title)
+        usable.append(segment)
+    return usable, problems
+
+
+class FinalAssemblyStage(BaseAgent):
+    """Assembles the scenes into the final video without calling a model."""
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        state = ctx.session.state
+        segments, problems = validate_segments(segments_from_outputs(collect_scene_outputs(state)))
+        for problem in problems:
+            logger.warning(problem)
+
+        output_path = os.path.join(state.get("output_dir", "output"), "final_video.mp4")
+        # ffmpeg blocks, keep the event loop free meanwhile
+        result = await asyncio.to_thread(assemble_video, segments, output_path)
+        result["problems"] = problems
+
+        if result["success"]:
+            message = f"Final video: {output_path} ({len(segments)} scenes, {result['duration_seconds']:.1f}s)"
+        else:
+            logger.error(f"Final assembly failed: {result['error']}")
+            message = f"Final assembly failed: {result['error']}"
+
+        yield Event(
+            author=self.name,
+            invocation_id=ctx.invocation_id,
+            content=types.Content(role="model", parts=[types.Part(text=message)]),
+            actions=EventActions(state_delta={
+                "final_output": output_path if result["success"] else "",
+                "final_assembly": {key: value for key, value in result.items() if key != "stderr"},
+            }),
+        )
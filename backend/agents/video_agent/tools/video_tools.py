@@ -22,18 +22,22 @@ def generate_animation(prompt: str,
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
     
-    # Generate the animation using robust_manim_agent
-    result = generate_manim_animation(prompt)
+    # Generate the animation using robust_manim_agent; scenes are generated concurrently,
+    # so each one renders in its own directory
+    result = generate_manim_animation(prompt, output_dir=output_dir)
     
     # Save the generated code to a file
     code_path = os.path.join(output_dir, "animation_code.py")
     with open(code_path, "w") as f:
         f.write(result["code"])
     
+    execution_result = result["execution_result"]
+    success = execution_result.get("status") == "success"
     return {
         "code_path": code_path,
-        "execution_result": result["execution_result"],
-        "success": "Error" not in result["execution_result"],
+        "execution_result": execution_result,
+        "success": success,
+        "error": None if success else execution_result.get("message", "Animation did not render"),
         "video_path": result.get("video_path", None)  # The path to the generated video
     }
 
@@ -0,0 +1,5 @@
+"""
+Per-session workspaces shared by the agents' file tools.
+"""
+from .buffer import LineBuffer
+from .workspace import Workspace, get_workspace, release_workspace
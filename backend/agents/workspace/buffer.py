@@ -0,0 +1,197 @@
+"""
+In-memory, line-indexed edit buffer for the files an agent works on.
+
+The file tools used to re-read the whole file to number its lines for every
+read_file call, and re-read and rewrite it for every range edit. A LineBuffer
+keeps the file as a list of lines instead: a range replacement only touches
+the replaced lines, a numbered view formats just the requested range, and the
+file is written back to disk only when something (a Manim render) needs it.
+
+Every edit is a new version. Instead of copying the file for each version,
+the buffer keeps an undo log of the replaced lines, so taking a snapshot is
+free and any earlier version can be rebuilt to diff against or roll back to.
+"""
+import os
+import stat
+import difflib
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+_new_file_mode: Optional[int] = None
+_new_file_mode_lock = threading.Lock()
+
+
+def _default_file_mode() -> int:
+    """Permission bits a new file gets under the process umask.
+
+    os.umask() can only read the umask by setting it, which would briefly change it for every
+    thread in the process, so the mode of a freshly created file is read instead, once.
+    """
+    global _new_file_mode
+    with _new_file_mode_lock:
+        if _new_file_mode is None:
+            probe_dir = tempfile.mkdtemp()
+            try:
+                probe = os.path.join(probe_dir, "probe")
+                os.close(os.open(probe, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+                _new_file_mode = stat.S_IMODE(os.stat(probe).st_mode)
+                os.unlink(probe)
+            finally:
+                os.rmdir(probe_dir)
+        return _new_file_mode
+
+
+def _file_mode(path: str) -> int:
+    """Permission bits of an existing file, or those a new file gets under the umask."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return _default_file_mode()
+
+
+class LineBuffer:
+    """Lines of one file, with versioned edits and deferred write-through."""
+
+    def __init__(self, path: str, text: str = ""):
+        self.path = path
+        self._lines: List[str] = text.splitlines(True)
+        # (start index, removed lines, inserted line count) per edit; version N is after N edits
+        self._edits: List[Tuple[int, List[str], int]] = []
+        self._saved_version: Optional[int] = None
+        self.labels: Dict[str, int] = {}
+        self.lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: str) -> "LineBuffer":
+        """A buffer holding the file's current content, marked as saved."""
+        with open(path, "r") as f:
+            buffer = cls(path, f.read())
+        buffer._saved_version = 0
+        return buffer
+
+    @property
+    def version(self) -> int:
+        return len(self._edits)
+
+    @property
+    def line_count(self) -> int:
+        return len(self._lines)
+
+    @property
+    def dirty(self) -> bool:
+        """Whether the buffer has changes that are not on disk yet."""
+        return self._saved_version != self.version
+
+    def text(self) -> str:
+        with self.lock:
+            return "".join(self._lines)
+
+    def numbered(self, start_line: int = 1, end_line: Optional[int] = None) -> str:
+        """Lines start_line..end_line (1-indexed, inclusive) prefixed with their numbers."""
+        with self.lock:
+            end_line = self.line_count if end_line is None else min(end_line, self.line_count)
+            start_line = max(start_line, 1)
+            return "".join(f"{i:4d} | {line}"
+                           for i, line in enumerate(self._lines[start_line - 1:end_line], start_line))
+
+    def _apply(self, start: int, end: int, new_lines: List[str]) -> int:
+        removed = self._lines[start:end]
+        self._lines[start:end] = new_lines
+        self._edits.append((start, removed, len(new_lines)))
+        return self.version
+
+    def replace(self, start_line: int, end_line: int, content: str) -> int:
+        """Replace lines start_line..end_line (1-indexed, inclusive) with content.
+
+        end_line may be start_line - 1 to insert before start_line without
+        replacing anything.
+
+        Returns:
+            The new version
+
+        Raises:
+            ValueError: If the range is outside the buffer
+        """
+        with self.lock:
+            if start_line < 1 or start_line > self.line_count + 1:
+                raise ValueError(f"Invalid start_line: {start_line}. Valid range is 1 to {self.line_count + 1}.")
+            if end_line < start_line - 1 or end_line > self.line_count:
+                raise ValueError(f"Invalid end_line: {end_line}. Must be between {start_line - 1} "
+                                 f"and {self.line_count}.")
+            # Ensure new content ends with newline
+            if content and not content.endswith("\n"):
+                content += "\n"
+            return self._apply(start_line - 1, end_line, content.splitlines(True))
+
+    def set_text(self, text: str) -> int:
+        """Replace the whole content as one edit. Returns the new version."""
+        with self.lock:
+            return self._apply(0, self.line_count, text.splitlines(True))
+
+    def snapshot(self, label: Optional[str] = None) -> int:
+        """The current version, optionally remembered under a label. Costs nothing to take."""
+        with self.lock:
+            if label:
+                self.labels[label] = self.version
+            return self.version
+
+    def lines_at(self, version: int) -> List[str]:
+        """The lines as they were at an earlier version."""
+        with self.lock:
+            if not 0 <= version <= self.version:
+                raise ValueError(f"Unknown version {version}; the buffer is at version {self.version}")
+            lines = list(self._lines)
+            for start, removed, inserted in reversed(self._edits[version:]):
+                lines[start:start + inserted] = removed
+            return lines
+
+    def text_at(self, version: int) -> str:
+        return "".join(self.lines_at(version))
+
+    def diff(self, from_version: int, to_version: Optional[int] = None) -> str:
+        """Unified diff between two versions (to the current one by default)."""
+        with self.lock:
+            to_version = self.version if to_version is None else to_version
+            return "".join(difflib.unified_diff(
+                self.lines_at(from_version), self.lines_at(to_version),
+                fromfile=f"{self.path}@{from_version}", tofile=f"{self.path}@{to_version}"))
+
+    def rollback(self, version: int) -> int:
+        """Restore the content of an earlier version.
+
+        The rollback is recorded as a new edit, so it can be diffed and undone too.
+
+        Returns:
+            The new version
+        """
+        with self.lock:
+            return self._apply(0, self.line_count, self.lines_at(version))
+
+    def flush(self) -> bool:
+        """Write the buffer to disk if it changed since the last write.
+
+        The file is replaced atomically, so a render never reads a half-written file.
+
+        Returns:
+            Whether the file was written
+        """
+        with self.lock:
+            if not self.dirty:
+                return False
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".buffer-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.writelines(self._lines)
+                # mkstemp creates the file as 0600; keep the mode the file had (or would get when created)
+                os.chmod(tmp_path, _file_mode(self.path))
+                os.replace(tmp_path, self.path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._saved_version = self.version
+            return True
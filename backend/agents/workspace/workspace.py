@@ -0,0 +1,209 @@
+"""
+Per-session workspaces for the agents' file tools.
+
+The file tools used to remember the active file in a module-global, so two
+agent sessions running in one server process overwrote each other's target
+file. A Workspace holds everything one session needs instead: the files it
+created with their in-memory edit buffers, the active file, its own Manim
+media directory, the last render and a history of file operations.
+
+Workspaces live in a process-wide registry and are found through an id kept
+in the session state (the ADK tool_context.state, or a PocketFlow `shared`
+dict), so tools only need the state they are already given.
+
+Configuration:
+    WORKSPACE_DIR: Directory the per-workspace media directories go under (default: workspaces)
+    WORKSPACE_MAX_ACTIVE: Workspaces kept before idle ones are dropped (default: 256)
+    WORKSPACE_IDLE_SECONDS: Seconds without use after which a workspace counts as idle (default: 3600)
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+from .buffer import LineBuffer
+
+logger = logging.getLogger(__name__)
+
+# Session state key holding the workspace id
+STATE_KEY = "workspace_id"
+DEFAULT_WORKSPACE_DIR = "workspaces"
+DEFAULT_MAX_ACTIVE = 256
+DEFAULT_IDLE_SECONDS = 3600
+
+
+class Workspace:
+    """Files, edit buffers, media directory, render cache and history of one agent session."""
+
+    def __init__(self, workspace_id: str, root: Optional[str] = None):
+        self.id = workspace_id
+        self.root = root or os.path.join(os.getenv("WORKSPACE_DIR", DEFAULT_WORKSPACE_DIR), workspace_id)
+        self.media_dir = os.path.join(self.root, "media")
+        self.files: List[str] = []
+        self.buffers: Dict[str, LineBuffer] = {}
+        self.current_file: Optional[str] = None
+        # Whether the active file changed since it was last rendered, and that render's result
+        self.render_pending = False
+        self.last_render: Optional[Dict[str, Any]] = None
+        self.history: List[Dict[str, Any]] = []
+        self.last_used = time.monotonic()
+        self.lock = threading.RLock()
+
+    def resolve(self, filepath: Optional[str] = None) -> Optional[str]:
+        """The given path, or the active file when no path is given."""
+        return filepath if filepath is not None else self.current_file
+
+    def buffer(self, filepath: Optional[str] = None) -> LineBuffer:
+        """The edit buffer of a file (the active one by default), loaded from disk on first use.
+
+        Raises:
+            ValueError: If no path is given and there is no active file
+            FileNotFoundError: If the file has no buffer and does not exist
+        """
+        filepath = self.resolve(filepath)
+        if filepath is None:
+            raise ValueError("No file has been created yet. Use create_file first.")
+        with self.lock:
+            buffer = self.buffers.get(filepath)
+            if buffer is None:
+                buffer = self.buffers[filepath] = LineBuffer.load(filepath)
+            return buffer
+
+    def open_buffer(self, filepath: str, content: str) -> LineBuffer:
+        """Set a file's content in its buffer, creating the buffer if needed. Nothing is written yet."""
+        with self.lock:
+            buffer = self.buffers.get(filepath)
+            if buffer is None:
+                buffer = self.buffers[filepath] = LineBuffer(filepath)
+            buffer.set_text(content)
+            return buffer
+
+    def flush(self, filepath: Optional[str] = None) -> bool:
+        """Write a file's pending edits (every file's by default) to disk.
+
+        Returns:
+            Whether anything was written
+        """
+        with self.lock:
+            if filepath is None:
+                buffers = list(self.buffers.values())
+            else:
+                buffers = [self.buffers[filepath]] if filepath in self.buffers else []
+            # Flush every buffer, not just up to the first one that had changes
+            return any([buffer.flush() for buffer in buffers])
+
+    def record(self, action: str, filepath: str, **details) -> None:
+        """Add a file operation to the history."""
+        with self.lock:
+            self.history.append({"action": action, "filepath": filepath, "time": time.time(), **details})
+
+    def file_created(self, filepath: str) -> None:
+        """Track a new file and make it the active one."""
+        with self.lock:
+            if filepath not in self.files:
+                self.files.append(filepath)
+            self.current_file = filepath
+            self.render_pending = filepath.endswith(".py")
+            self.record("create", filepath)
+
+    def file_edited(self, filepath: str, **details) -> None:
+        """Record an edit and mark the active Python file for rendering."""
+        with self.lock:
+            if filepath == self.current_file and filepath.endswith(".py"):
+                self.render_pending = True
+            self.record("edit", filepath, **details)
+
+    def render_finished(self, result: Dict[str, Any]) -> None:
+        """Keep the result of rendering the active file."""
+        with self.lock:
+            self.last_render = result
+            self.render_pending = False
+            self.record("render", self.current_file or "", status=result.get("status"))
+
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "id": self.id,
+                "media_dir": self.media_dir,
+                "files": list(self.files),
+                "current_file": self.current_file,
+                "render_pending": self.render_pending,
+                "operations": len(self.history),
+            }
+
+
+_workspaces: "OrderedDict[str, Workspace]" = OrderedDict()
+_registry_lock = threading.Lock()
+_DEFAULT_ID = "default"
+
+
+def _evict_idle() -> None:
+    """Drop idle workspaces, least recently used first, while there are more than the cap.
+
+    Workspaces still in use are never dropped, even above the cap: a running session would lose
+    its unflushed edits and find an empty workspace under its id. Call with _registry_lock held.
+    """
+    max_active = int(os.getenv("WORKSPACE_MAX_ACTIVE", DEFAULT_MAX_ACTIVE))
+    idle_seconds = float(os.getenv("WORKSPACE_IDLE_SECONDS", DEFAULT_IDLE_SECONDS))
+    now = time.monotonic()
+    while len(_workspaces) > max_active:
+        evicted_id, workspace = next(iter(_workspaces.items()))
+        if now - workspace.last_used < idle_seconds:
+            # The registry is in recency order, so every other workspace is in use too
+            logger.warning(f"{len(_workspaces)} workspaces are in use, more than WORKSPACE_MAX_ACTIVE={max_active}")
+            return
+        del _workspaces[evicted_id]
+        try:
+            # Keep the edits the session never rendered
+            workspace.flush()
+        except OSError as e:
+            logger.warning(f"Could not flush idle workspace {evicted_id} before dropping it: {e}")
+        logger.warning(f"Dropped idle workspace {evicted_id}")
+
+
+def get_workspace(state=None) -> Workspace:
+    """The workspace bound to a session state, created on first use.
+
+    Args:
+        state: The ADK tool_context.state or a PocketFlow `shared` dict. Without
+            one, the process-wide default workspace is returned, which is only
+            meant for scripts running a single session.
+
+    Returns:
+        The session's Workspace
+    """
+    if state is None:
+        workspace_id = _DEFAULT_ID
+    else:
+        workspace_id = state.get(STATE_KEY)
+        if not workspace_id:
+            workspace_id = uuid.uuid4().hex
+            state[STATE_KEY] = workspace_id
+
+    with _registry_lock:
+        workspace = _workspaces.get(workspace_id)
+        if workspace is None:
+            workspace = _workspaces[workspace_id] = Workspace(workspace_id)
+            _evict_idle()
+        else:
+            workspace.last_used = time.monotonic()
+            _workspaces.move_to_end(workspace_id)
+        return workspace
+
+
+def release_workspace(state=None) -> None:
+    """Forget a session's workspace once the session is over.
+
+    Edits that were never rendered are written to disk first; files on disk are kept.
+    """
+    workspace_id = _DEFAULT_ID if state is None else state.get(STATE_KEY)
+    with _registry_lock:
+        workspace = _workspaces.pop(workspace_id, None)
+    if workspace is not None:
+        try:
+            workspace.flush()
+        except OSError as e:
+            logger.warning(f"Could not flush workspace {workspace_id} when releasing it: {e}")
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark of the SSE decoder against the previous /chat line parser.
+
+Builds a synthetic chat completion stream (JSON deltas with multi-byte
+characters, like the OpenRouter stream /chat proxies), cuts it into chunks
+and times decoding it with both parsers. The previous parser appended every
+chunk to a string, sliced the string after every line and decoded each chunk
+on its own; it is kept here only for comparison. It decodes with
+errors="replace" so it runs to the end: the number of events it mangles
+because a character was split across chunks is reported as "corrupted".
+
+Usage (from the backend directory):
+    python benchmark/sse_parser.py
+    python benchmark/sse_parser.py --events 50000 --chunk-size 1024 --repeat 5
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sse import iter_sse
+
+
+def build_stream(events: int, delta_chars: int) -> bytes:
+    """A chat completion stream of events deltas, terminated by [DONE]."""
+    text = ("Zeta ζ → ∑ 🎬 " * delta_chars)[:delta_chars]
+    lines = [": OPENROUTER PROCESSING\n\n"]
+    for i in range(events):
+        delta = {"choices": [{"index": 0, "delta": {"content": f"{i} {text}"}}]}
+        lines.append(f"data: {json.dumps(delta, ensure_ascii=False)}\n\n")
+    lines.append("data: [DONE]\n\n")
+    return "".join(lines).encode("utf-8")
+
+
+def split_chunks(data: bytes, chunk_size: int) -> List[bytes]:
+    """data in chunk_size byte chunks, or one chunk per event when chunk_size is 0."""
+    if chunk_size == 0:
+        return [event + b"\n\n" for event in data.split(b"\n\n") if event]
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+def legacy_parse(chunks: List[bytes]) -> List[str]:
+    """The line parser /chat used before sse.SSEDecoder."""
+    out = []
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk.decode("utf-8", errors="replace")
+        while True:
+            line_end = buffer.find("\n")
+            if line_end == -1:
+                break
+            line = buffer[:line_end].strip()
+            buffer = buffer[line_end + 1:]
+            if line.startswith("data: "):
+                out.append(line[6:])
+    return out
+
+
+def decoder_parse(chunks: List[bytes]) -> List[str]:
+    return [event.data for event in iter_sse(chunks)]
+
+
+def time_parser(parse: Callable[[List[bytes]], List[str]], chunks: List[bytes], repeat: int):
+    best = float("inf")
+    result = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = parse(chunks)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SSE decoder against the previous /chat parser")
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="Stream sizes in events (default: 1000 10000 50000)")
+    parser.add_argument("--delta-chars", type=int, default=40, help="Characters of content per event (default: 40)")
+    parser.add_argument("--chunk-size", type=int, default=1024,
+                        help="Bytes per chunk, 0 for one chunk per event (default: 1024)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the best is kept (default: 3)")
+    args = parser.parse_args()
+
+    print(f"{'events':>8} {'MB':>7} {'legacy s':>10} {'decoder s':>10} {'speedup':>8} {'corrupted':>10}")
+    for events in args.events:
+        data = build_stream(events, args.delta_chars)
+        chunks = split_chunks(data, args.chunk_size)
+        legacy_seconds, legacy = time_parser(legacy_parse, chunks, args.repeat)
+        decoder_seconds, decoded = time_parser(decoder_parse, chunks, args.repeat)
+
+        expected = decoder_parse([data])
+        if decoded != expected:
+            print(f"Decoder output differs from a single-chunk decode for {events} events")
+            return 1
+        corrupted = sum(1 for got, want in zip(legacy, expected) if got != want)
+        print(f"{events:>8} {len(data) / 1e6:>7.2f} {legacy_seconds:>10.4f} {decoder_seconds:>10.4f} "
+              f"{legacy_seconds / decoder_seconds:>7.1f}x {corrupted:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
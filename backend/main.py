@@ -1,20 +1,55 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, JSONResponse
-import requests
+from contextlib import asynccontextmanager
+import asyncio
+import httpx
 import json
 import os
 from pydantic import BaseModel
 import logging
 from dotenv import load_dotenv
 
+from sse import aiter_sse
+
 load_dotenv()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+# Upstream connection pool shared by every /chat stream
+CHAT_MAX_CONNECTIONS = int(os.getenv("CHAT_MAX_CONNECTIONS", "100"))
+CHAT_MAX_KEEPALIVE = int(os.getenv("CHAT_MAX_KEEPALIVE", "20"))
+CHAT_KEEPALIVE_EXPIRY = float(os.getenv("CHAT_KEEPALIVE_EXPIRY", "30"))
+# Seconds to connect, to wait for the next chunk, and to wait for a free pooled connection
+CHAT_CONNECT_TIMEOUT = float(os.getenv("CHAT_CONNECT_TIMEOUT", "10"))
+CHAT_READ_TIMEOUT = float(os.getenv("CHAT_READ_TIMEOUT", "60"))
+CHAT_POOL_TIMEOUT = float(os.getenv("CHAT_POOL_TIMEOUT", "5"))
+# Streams proxied at once; further requests wait up to CHAT_POOL_TIMEOUT, then get an error
+CHAT_MAX_STREAMS = int(os.getenv("CHAT_MAX_STREAMS", str(CHAT_MAX_CONNECTIONS)))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One keep-alive pool for the server's lifetime, so streams reuse connections instead of
+    # doing a TCP and TLS handshake each
+    app.state.http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=CHAT_MAX_CONNECTIONS,
+                            max_keepalive_connections=CHAT_MAX_KEEPALIVE,
+                            keepalive_expiry=CHAT_KEEPALIVE_EXPIRY),
+        timeout=httpx.Timeout(connect=CHAT_CONNECT_TIMEOUT, read=CHAT_READ_TIMEOUT,
+                              write=CHAT_CONNECT_TIMEOUT, pool=CHAT_POOL_TIMEOUT),
+    )
+    app.state.chat_streams = asyncio.Semaphore(CHAT_MAX_STREAMS)
+    try:
+        yield
+    finally:
+        await app.state.http_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -49,8 +84,10 @@ async def chat(request: ChatRequest):
             
         logger.info(f"Processing chat request with message: {request.message[:30]}...")
         
-        def generate():
-            url = "https://openrouter.ai/api/v1/chat/completions"
+        client = app.state.http_client
+        streams = app.state.chat_streams
+
+        async def generate():
             headers = {
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json"
@@ -65,51 +102,48 @@ async def chat(request: ChatRequest):
             logger.info(f"Sending request to OpenRouter API with model: {payload['model']}")
             
             try:
-                with requests.post(url, headers=headers, json=payload, stream=True) as r:
+                await asyncio.wait_for(streams.acquire(), timeout=CHAT_POOL_TIMEOUT)
+            except asyncio.TimeoutError:
+                error_msg = f"Too many concurrent chat streams (limit {CHAT_MAX_STREAMS}), try again later"
+                logger.warning(error_msg)
+                yield json.dumps({"error": error_msg})
+                return
+
+            try:
+                # The upstream body is read only as fast as the client consumes the response
+                async with client.stream("POST", OPENROUTER_URL, headers=headers, json=payload) as r:
                     if r.status_code != 200:
+                        await r.aread()
                         error_msg = f"OpenRouter API returned status code {r.status_code}"
                         logger.error(error_msg)
                         yield json.dumps({"error": error_msg, "details": r.text})
                         return
                         
                     logger.info("Successfully connected to OpenRouter API, streaming response")
-                    buffer = ""
-                    for chunk in r.iter_content(chunk_size=1024, decode_unicode=False):
-                        if chunk:
-                            chunk_text = chunk.decode('utf-8')
-                            buffer += chunk_text
-                            while True:
-                                try:
-                                    # Find the next complete SSE line
-                                    line_end = buffer.find('\n')
-                                    if line_end == -1:
-                                        break
-
-                                    line = buffer[:line_end].strip()
-                                    buffer = buffer[line_end + 1:]
-
-                                    if line.startswith('data: '):
-                                        data = line[6:]
-                                        if data == '[DONE]':
-                                            logger.info("Completed streaming response")
-                                            break
-
-                                        try:
-                                            data_obj = json.loads(data)
-                                            content = data_obj["choices"][0]["delta"].get("content")
-                                            if content:
-                                                yield content
-                                        except json.JSONDecodeError as e:
-                                            logger.error(f"Failed to parse JSON: {e}")
-                                            yield f"\nError parsing data: {data}\n"
-                                except Exception as e:
-                                    logger.error(f"Error processing chunk: {e}")
-                                    yield f"\nError processing response: {str(e)}\n"
-                                    break
-            except requests.RequestException as e:
+                    async for event in aiter_sse(r.aiter_bytes(chunk_size=1024)):
+                        data = event.data
+                        if data == '[DONE]':
+                            logger.info("Completed streaming response")
+                            break
+
+                        try:
+                            data_obj = json.loads(data)
+                            content = data_obj["choices"][0]["delta"].get("content")
+                            if content:
+                                yield content
+                        except json.JSONDecodeError as e:
+                            logger.error(f"Failed to parse JSON: {e}")
+                            yield f"\nError parsing data: {data}\n"
+                        except (KeyError, IndexError, TypeError) as e:
+                            logger.error(f"Error processing event: {e}")
+                            yield f"\nError processing response: {str(e)}\n"
+                            break
+            except httpx.HTTPError as e:
                 error_msg = f"Error connecting to OpenRouter API: {str(e)}"
                 logger.error(error_msg)
                 yield json.dumps({"error": error_msg})
+            finally:
+                streams.release()
                 
         return StreamingResponse(generate(), media_type="text/plain")
     except Exception as e:
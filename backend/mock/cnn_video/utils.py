@@ -1,13 +1,17 @@
 import os
+import sys
 import json
 from pathlib import Path
-from google.cloud import texttospeech
 from dotenv import load_dotenv
 import numpy as np
 from manim import *
 from manim_voiceover import VoiceoverScene
 from manim_voiceover.services.gtts import GTTSService
 
+# The shared TTS helpers live in backend/agents
+sys.path.append(str(Path(__file__).resolve().parents[2] / "agents"))
+from tts import cache_key, get_audio_cache, get_tts_client, synthesize_batch
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -15,8 +19,8 @@ load_dotenv()
 print(f"Google API Key: {os.environ.get('GOOGLE_API_KEY', 'Not found')[:10]}...")
 
 def get_google_tts_client():
-    """Get a Google Text-to-Speech client."""
-    return texttospeech.TextToSpeechClient()
+    """Get the shared Google Text-to-Speech client."""
+    return get_tts_client()
 
 def text_to_speech(text, output_file, language_code="en-US", voice_name="en-US-Neural2-F"):
     """Convert text to speech using Google Cloud TTS.
@@ -27,32 +31,34 @@ def text_to_speech(text, output_file, language_code="en-US", voice_name="en-US-N
         language_code: The language code.
         voice_name: The voice name.
     """
-    client = get_google_tts_client()
-    
-    synthesis_input = texttospeech.SynthesisInput(text=text)
-    
-    voice = texttospeech.VoiceSelectionParams(
-        language_code=language_code,
-        name=voice_name,
-    )
-    
-    audio_config = texttospeech.AudioConfig(
-        audio_encoding=texttospeech.AudioEncoding.MP3
-    )
-    
-    response = client.synthesize_speech(
-        input=synthesis_input, voice=voice, audio_config=audio_config
-    )
-    
-    # Make sure directory exists
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    # Sentences are synthesized concurrently and repeated narration is served from the shared audio cache
+    result = synthesize_batch(text, language_code=language_code, voice_name=voice_name, audio_format="MP3")
     
-    # Write the response to the output file.
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
     with open(output_file, "wb") as out:
-        out.write(response.audio_content)
+        out.write(result["audio_content"])
     
     return output_file
 
+class CachedGTTSService(GTTSService):
+    """GTTSService that reuses narration from the shared TTS cache across scenes and runs."""
+    
+    def generate_from_text(self, text, cache_dir=None, path=None, **kwargs):
+        if cache_dir is None:
+            cache_dir = self.cache_dir
+        
+        input_data = {"input_text": text, "service": "gtts", "config": {"lang": self.lang, "tld": self.tld}}
+        audio_path = path if path is not None else self.get_audio_basename(input_data) + ".mp3"
+        key = cache_key(text, self.lang, f"gtts-{self.tld}", "MP3")
+        cache = get_audio_cache()
+        
+        if cache.copy_to(key, str(Path(cache_dir) / audio_path)):
+            return {"input_text": text, "input_data": input_data, "original_audio": audio_path}
+        
+        result = super().generate_from_text(text, cache_dir=cache_dir, path=path, **kwargs)
+        cache.put_file(key, str(Path(cache_dir) / result["original_audio"]))
+        return result
+
 class CNNBaseScene(VoiceoverScene):
     """Base scene for CNN video with common utilities and styling."""
     
@@ -62,7 +68,7 @@ class CNNBaseScene(VoiceoverScene):
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.gtts_service = GTTSService()
+        self.gtts_service = CachedGTTSService()
         
         # Set up color scheme
         self.color_palette = {
@@ -0,0 +1,166 @@
+"""
+Incremental decoder for Server-Sent Events streams.
+
+Upstream streams arrive in arbitrary byte chunks: a line, or a multi-byte
+UTF-8 character, can be split across any number of them. SSEDecoder takes
+the chunks as they come and returns the complete events, following the
+event stream format of the HTML specification:
+
+- Lines end with "\\r\\n", "\\n" or "\\r", also when split across chunks.
+- "data" lines accumulate until a blank line dispatches the event; multiple
+  data lines are joined with "\\n".
+- "event", "id" and "retry" fields are kept; comments (":" lines) and
+  unknown fields are ignored.
+
+Bytes are decoded chunk by chunk, keeping the bytes of a character split at
+the end of a chunk for the next one. A partial line is kept as a list of
+fragments that is joined once, when its line ends, so the total work is
+linear in the size of the stream. "data:" lines and blank lines, nearly every
+line of a stream, are handled inline without a call per line.
+"""
+import re
+import codecs
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Iterator, List, Optional
+
+_LINE_END = re.compile(r"\r\n|\r|\n")
+
+
+@dataclass
+class SSEEvent:
+    """One dispatched event."""
+    data: str
+    event: str = "message"
+    id: Optional[str] = None
+    retry: Optional[int] = None
+
+
+class SSEDecoder:
+    """Turns byte chunks of an event stream into SSEEvents."""
+
+    def __init__(self):
+        # Bytes of a UTF-8 character split across chunks
+        self._pending = b""
+        self._partial: List[str] = []
+        # The last chunk ended with "\r": a "\n" starting the next one belongs to the same line end
+        self._after_cr = False
+        self._data: List[str] = []
+        self._event = ""
+        self._retry: Optional[int] = None
+        self.last_event_id: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """Decode a chunk and return the events it completes."""
+        data = self._pending + chunk if self._pending else chunk
+        # utf_8_decode stops before a character split at the end of the chunk; its bytes wait for the next one
+        text, consumed = codecs.utf_8_decode(data, "replace")
+        self._pending = data[consumed:]
+        return self._feed_text(text)
+
+    def close(self) -> List[SSEEvent]:
+        """Flush the decoder at the end of the stream.
+
+        A final line without a line end is processed, but an event without the
+        blank line that dispatches it is dropped, as the specification requires.
+        """
+        events = self._feed_text(codecs.utf_8_decode(self._pending, "replace", True)[0])
+        self._pending = b""
+        if self._partial:
+            line = "".join(self._partial)
+            self._partial = []
+            self._process_line(line)
+        self._data = []
+        self._event = ""
+        return events
+
+    def _feed_text(self, text: str) -> List[SSEEvent]:
+        if self._after_cr or "\r" in text:
+            lines = self._split_cr(text)
+        elif "\n" in text:
+            # Most streams end lines with "\n" only: split without the regular expression
+            lines = text.split("\n")
+            rest = lines.pop()
+            if self._partial:
+                # Join the fragments of a partial line only once the line is complete
+                self._partial.append(lines[0])
+                lines[0] = "".join(self._partial)
+                self._partial = []
+            if rest:
+                self._partial.append(rest)
+        else:
+            # A chunk that ends no line, common with small network reads
+            if text:
+                self._partial.append(text)
+            return []
+
+        events = []
+        data = self._data
+        for line in lines:
+            # "data: " lines and the blank lines that dispatch them are nearly every line of a stream
+            if line.startswith("data: "):
+                data.append(line[6:])
+            elif line:
+                self._process_line(line)
+            else:
+                if data:
+                    events.append(SSEEvent(data[0] if len(data) == 1 else "\n".join(data),
+                                           self._event or "message", self.last_event_id, self._retry))
+                    data = self._data = []
+                self._event = ""
+        return events
+
+    def _split_cr(self, text: str) -> List[str]:
+        """The complete lines in text when "\r" line ends are involved."""
+        lines = []
+        if not text:
+            return lines
+        start = 0
+        if self._after_cr and text[0] == "\n":
+            start = 1
+        self._after_cr = False
+        for match in _LINE_END.finditer(text, start):
+            self._partial.append(text[start:match.start()])
+            lines.append("".join(self._partial))
+            self._partial = []
+            start = match.end()
+        if start < len(text):
+            self._partial.append(text[start:])
+        elif text.endswith("\r"):
+            self._after_cr = True
+        return lines
+
+    def _process_line(self, line: str) -> None:
+        """A non-empty line other than "data: ..."."""
+        if line.startswith(":"):
+            return
+        field, sep, value = line.partition(":")
+        if sep and value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            if "\0" not in value:
+                self.last_event_id = value
+        elif field == "retry":
+            if value.isdigit():
+                self._retry = int(value)
+
+
+def iter_sse(chunks: Iterable[bytes]) -> Iterator[SSEEvent]:
+    """The events of a stream given as byte chunks."""
+    decoder = SSEDecoder()
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.close()
+
+
+async def aiter_sse(chunks) -> AsyncIterator[SSEEvent]:
+    """The events of a stream given as an async iterator of byte chunks, e.g. httpx's aiter_bytes()."""
+    decoder = SSEDecoder()
+    async for chunk in chunks:
+        for event in decoder.feed(chunk):
+            yield event
+    for event in decoder.close():
+        yield event